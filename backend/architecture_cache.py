@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import ARCHITECTURE_CACHE_DIR
+
+logger = logging.getLogger("deepwiki")
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "hits": 0,        # aynı commit + model: doküman olduğu gibi kullanıldı
+    "unchanged": 0,   # commit değişti ama analiz edilen dosyalar aynı
+    "updates": 0,     # önceki doküman + değişiklik özetiyle tek çağrıda güncellendi
+    "misses": 0,      # doküman baştan üretildi
+    "writes": 0,
+}
+
+
+def record_architecture_outcome(outcome: str) -> None:
+    with _lock:
+        _stats[outcome] += 1
+
+
+def _cache_path(repo_id: str) -> Path:
+    return ARCHITECTURE_CACHE_DIR / f"{repo_id}.json"
+
+
+def _read_entries(repo_id: str) -> Dict[str, Any]:
+    path = _cache_path(repo_id)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning("Ignoring unreadable architecture cache %s", path)
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def load_architecture_doc(repo_id: str, model: str) -> Optional[Dict[str, Any]]:
+    """
+    repo için model'in en son ürettiği High Level Architecture dokümanı:
+    {"commit", "markdown", "files", "created_at"}; yoksa None.
+    files, dokümanın üretildiği commit'teki yol -> blob hash eşlemesidir
+    (bkz. repo_analyzer.list_tracked_files).
+    """
+    return _read_entries(repo_id).get(model)
+
+
+def save_architecture_doc(
+    repo_id: str,
+    model: str,
+    commit: str,
+    markdown: str,
+    files: Dict[str, str],
+) -> None:
+    """
+    Dokümanı (repo, model) için son sürüm olarak yazar; model başına yalnızca
+    en yeni commit'in dokümanı tutulur. Yazım tmp dosya + rename ile atomiktir.
+    """
+    path = _cache_path(repo_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        entries = _read_entries(repo_id)
+        entries[model] = {
+            "commit": commit,
+            "markdown": markdown,
+            "files": files,
+            "created_at": time.time(),
+        }
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+        _stats["writes"] += 1
+
+
+def get_architecture_cache_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -1,29 +1,255 @@
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Iterator, AsyncIterator, Optional, Tuple
 
-from openai import OpenAI
 from .models import LLMConfig
+from .llm_clients import get_openai_client, get_async_openai_client, DEFAULT_OPENAI_BASE_URL
+from .llm_cache import make_cache_key, get_cached_completion, put_cached_completion
+from .llm_resilience import call_llm, acall_llm, call_llm_with_winner, acall_llm_with_winner
+from .llm_routing import resolve_stage, stage_semaphore, stage_async_semaphore
 
 
 class ChatClient:
     """
     LLMConfig'e göre OpenAI-compatible bir chat client.
     Şimdilik sadece provider='openai' destekleniyor.
+    Alttaki HTTP client process genelinde paylaşılır (bkz. llm_clients).
+    Çağrılar deadline, tekrar deneme ve hedge ile yapılır (bkz. llm_resilience).
+
+    stage verilirse model, max_tokens ve eşzamanlılık sınırı o aşamanın
+    yönlendirmesinden alınır (bkz. llm_routing).
     """
 
-    def __init__(self, config: LLMConfig):
-        if config.provider == "openai":
-            base_url = config.base_url or "https://api.openai.com/v1"
-            self.client = OpenAI(
-                base_url=base_url,
-                api_key=config.api_key,
+    def __init__(self, config: LLMConfig, stage: Optional[str] = None):
+        route = resolve_stage(config, stage)
+        self.client = get_openai_client(config)
+        self.model = route["chat_model"]
+        self.max_tokens = route["max_tokens"]
+        self.stage = stage
+        self._semaphore = stage_semaphore(stage)
+        # Hedge isteği ikincil endpoint'e / modele gidebilir
+        if config.hedge_base_url:
+            self.hedge_client = get_openai_client(
+                config.model_copy(update={"base_url": config.hedge_base_url})
             )
-            self.model = config.chat_model
         else:
-            raise NotImplementedError(f"Provider not supported yet: {config.provider}")
+            self.hedge_client = self.client
+        self.hedge_model = config.hedge_chat_model or self.model
+        # Aynı model adını sunan farklı endpoint'ler cache'i paylaşmasın diye anahtara girer
+        self.endpoint = f"{config.provider}|{config.base_url or DEFAULT_OPENAI_BASE_URL}"
+        self.hedge_endpoint = (
+            f"{config.provider}|{config.hedge_base_url}" if config.hedge_base_url else self.endpoint
+        )
+        # Aşamalar farklı uzunlukta cevap ürettiğinden gecikme dağılımı aşama başına tutulur
+        self.latency_key = f"{config.base_url or DEFAULT_OPENAI_BASE_URL}|{self.model}|{stage or '-'}"
+
+    def _request_kwargs(self, model: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"model": model, "messages": messages}
+        if self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens
+        return kwargs
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        return make_cache_key(self.model, messages, self.max_tokens, endpoint=self.endpoint)
+
+    def _cache_target(self, cache_key: str, winner: str, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        # Hedge başka bir modele / endpoint'e gittiyse cevap birincilin anahtarına yazılmaz
+        if winner == "hedge" and (self.hedge_model, self.hedge_endpoint) != (self.model, self.endpoint):
+            key = make_cache_key(self.hedge_model, messages, self.max_tokens, endpoint=self.hedge_endpoint)
+            return key, self.hedge_model
+        return cache_key, self.model
 
-    def chat(self, messages: List[Dict[str, str]]) -> str:
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
+    def _complete(self, client, model: str, messages: List[Dict[str, str]], timeout: float) -> str:
+        # SDK'nın kendi retry'ı kapalı; tekrar denemeler call_llm'de yapılır
+        response = client.with_options(max_retries=0, timeout=timeout).chat.completions.create(
+            **self._request_kwargs(model, messages)
         )
-        return response.choices[0].message.content
\ No newline at end of file
+        return response.choices[0].message.content
+
+    def _acquire(self) -> None:
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+
+    def _release(self) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def chat(self, messages: List[Dict[str, str]], use_cache: bool = True) -> str:
+        """
+        use_cache=True iken aynı (model, mesajlar) için daha önce alınmış cevap
+        cache'ten döner; yoksa LLM çağrılır ve cevap cache'e yazılır.
+        """
+        cache_key = self._cache_key(messages) if use_cache else None
+        if cache_key:
+            cached = get_cached_completion(cache_key)
+            if cached is not None:
+                return cached
+
+        self._acquire()
+        try:
+            content, winner = call_llm_with_winner(
+                self.latency_key,
+                lambda timeout: self._complete(self.client, self.model, messages, timeout),
+                hedge=lambda timeout: self._complete(self.hedge_client, self.hedge_model, messages, timeout),
+            )
+        finally:
+            self._release()
+
+        if cache_key:
+            put_cached_completion(*self._cache_target(cache_key, winner, messages), content)
+        return content
+
+    def chat_stream(self, messages: List[Dict[str, str]], use_cache: bool = True) -> Iterator[str]:
+        """
+        Cevabı stream=True ile ister ve gelen metin parçalarını sırayla yield eder.
+        Cache'te varsa cevap tek parça olarak döner; stream tamamlanınca cache'e yazılır.
+        Deadline ve tekrar deneme yalnızca stream açılırken uygulanır (ilk parçadan
+        sonra tekrar denemek kullanıcıya yinelenen metin gönderirdi); hedge yapılmaz.
+        """
+        cache_key = self._cache_key(messages) if use_cache else None
+        if cache_key:
+            cached = get_cached_completion(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        self._acquire()
+        try:
+            stream = call_llm(
+                self.latency_key + "|stream",
+                lambda timeout: self.client.with_options(max_retries=0, timeout=timeout).chat.completions.create(
+                    stream=True,
+                    **self._request_kwargs(self.model, messages),
+                ),
+            )
+        except Exception:
+            self._release()
+            raise
+        parts: List[str] = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            stream.close()
+            self._release()
+
+        if cache_key:
+            put_cached_completion(cache_key, self.model, "".join(parts))
+
+
+class AsyncChatClient:
+    """
+    ChatClient'ın asyncio sürümü: ağ beklemeleri event loop'ta yapılır, thread tutmaz.
+    Yönlendirme, cache, deadline / retry / hedge davranışı ChatClient ile aynıdır;
+    hedge'i kaybeden istek ayrıca iptal edilir.
+    """
+
+    def __init__(self, config: LLMConfig, stage: Optional[str] = None):
+        route = resolve_stage(config, stage)
+        self.client = get_async_openai_client(config)
+        self.model = route["chat_model"]
+        self.max_tokens = route["max_tokens"]
+        self.stage = stage
+        self._semaphore = stage_async_semaphore(stage)
+        if config.hedge_base_url:
+            self.hedge_client = get_async_openai_client(
+                config.model_copy(update={"base_url": config.hedge_base_url})
+            )
+        else:
+            self.hedge_client = self.client
+        self.hedge_model = config.hedge_chat_model or self.model
+        # Aynı model adını sunan farklı endpoint'ler cache'i paylaşmasın diye anahtara girer
+        self.endpoint = f"{config.provider}|{config.base_url or DEFAULT_OPENAI_BASE_URL}"
+        self.hedge_endpoint = (
+            f"{config.provider}|{config.hedge_base_url}" if config.hedge_base_url else self.endpoint
+        )
+        # Gecikme dağılımı senkron ChatClient ile aynı anahtarda toplanır
+        self.latency_key = f"{config.base_url or DEFAULT_OPENAI_BASE_URL}|{self.model}|{stage or '-'}"
+
+    def _request_kwargs(self, model: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"model": model, "messages": messages}
+        if self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens
+        return kwargs
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        return make_cache_key(self.model, messages, self.max_tokens, endpoint=self.endpoint)
+
+    def _cache_target(self, cache_key: str, winner: str, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        # Hedge başka bir modele / endpoint'e gittiyse cevap birincilin anahtarına yazılmaz
+        if winner == "hedge" and (self.hedge_model, self.hedge_endpoint) != (self.model, self.endpoint):
+            key = make_cache_key(self.hedge_model, messages, self.max_tokens, endpoint=self.hedge_endpoint)
+            return key, self.hedge_model
+        return cache_key, self.model
+
+    async def _complete(self, client, model: str, messages: List[Dict[str, str]], timeout: float) -> str:
+        response = await client.with_options(max_retries=0, timeout=timeout).chat.completions.create(
+            **self._request_kwargs(model, messages)
+        )
+        return response.choices[0].message.content
+
+    async def chat(self, messages: List[Dict[str, str]], use_cache: bool = True) -> str:
+        cache_key = self._cache_key(messages) if use_cache else None
+        if cache_key:
+            # Disk cache'i küçük dosya okumaları; yine de loop'u bloklamamak için thread'de
+            cached = await asyncio.to_thread(get_cached_completion, cache_key)
+            if cached is not None:
+                return cached
+
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            content, winner = await acall_llm_with_winner(
+                self.latency_key,
+                lambda timeout: self._complete(self.client, self.model, messages, timeout),
+                hedge=lambda timeout: self._complete(self.hedge_client, self.hedge_model, messages, timeout),
+            )
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+        if cache_key:
+            await asyncio.to_thread(
+                put_cached_completion, *self._cache_target(cache_key, winner, messages), content
+            )
+        return content
+
+    async def chat_stream(self, messages: List[Dict[str, str]], use_cache: bool = True) -> AsyncIterator[str]:
+        cache_key = self._cache_key(messages) if use_cache else None
+        if cache_key:
+            cached = await asyncio.to_thread(get_cached_completion, cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            stream = await acall_llm(
+                self.latency_key + "|stream",
+                lambda timeout: self.client.with_options(max_retries=0, timeout=timeout).chat.completions.create(
+                    stream=True,
+                    **self._request_kwargs(self.model, messages),
+                ),
+            )
+            parts: List[str] = []
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+        if cache_key:
+            await asyncio.to_thread(put_cached_completion, cache_key, self.model, "".join(parts))
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Proje temel dizinleri
@@ -6,6 +7,16 @@ STORAGE_DIR = BASE_DIR / "storage"
 REPO_DIR = STORAGE_DIR / "repos"
 FAISS_DIR = STORAGE_DIR / "faiss"
 WIKI_DIR = STORAGE_DIR / "wiki"
+# Export edilen / import için yüklenen tek dosyalık wiki bundle'ları
+BUNDLE_DIR = STORAGE_DIR / "bundles"
+# POST /api/wiki/bundle ile yüklenebilecek en büyük bundle
+BUNDLE_MAX_UPLOAD_BYTES = 1024 * 1024 * 1024
+# Import sırasında bir entry'nin ve tüm entry'lerin açılmış (zlib sonrası) boyut
+# sınırları; küçük ama çok iyi sıkışan entry'lerle bellek şişirilemez
+BUNDLE_MAX_ENTRY_BYTES = 1024 * 1024 * 1024
+BUNDLE_MAX_TOTAL_BYTES = 2 * 1024 * 1024 * 1024
+# Dizin özetlerinin (repo_analyzer.build_directory_rollup) git tree hash'ine göre cache'i
+REPO_SUMMARY_CACHE_DIR = STORAGE_DIR / "repo_summaries"
 
 # Chunk ayarları
 CHUNK_SIZE = 800
@@ -26,4 +37,189 @@ INCLUDED_EXTENSIONS = {
 EXCLUDED_DIRS = {
     ".git", ".github", "node_modules", "dist", "build",
     "__pycache__", ".venv", ".idea", ".vscode",
-}
\ No newline at end of file
+}
+
+# Outline prompt'undaki repo yapısı özeti:
+# - OUTLINE_STRUCTURE_TOKEN_BUDGET: dizin özetleri + dosya listesinin toplam token bütçesi
+# - DIRECTORY_SUMMARY_TOP_SYMBOLS: dizin başına gösterilen sembol (class / fonksiyon) sayısı
+OUTLINE_STRUCTURE_TOKEN_BUDGET = 3000
+DIRECTORY_SUMMARY_TOP_SYMBOLS = 6
+
+# FAISS index: tombstone'lu (silinmiş) kayıtların oranı bu eşiği geçince
+# arka planda compaction yapılır
+INDEX_COMPACTION_THRESHOLD = 0.2
+
+# FAISS snapshot'ları: process içinde cache'lenecek index sayısı,
+# CURRENT dışında saklanacak eski versiyon sayısı ve GC zamanlaması
+INDEX_CACHE_SIZE = 8
+INDEX_KEEP_VERSIONS = 2
+INDEX_GC_GRACE_SECONDS = 600
+INDEX_GC_INTERVAL_SECONDS = 900
+
+# Çoklu repo (sharded) arama:
+# - SHARD_GROUPS_PATH: {"grup-veya-tenant": ["owner_repo", ...]} şeklinde JSON
+#   ("*" grubu tanımlı değilse index'i olan tüm repolar anlamına gelir)
+# - SHARD_SEARCH_WORKERS: FAISS aramalarını (tek repo ve shard'lar) yapan thread sayısı
+SHARD_GROUPS_PATH = STORAGE_DIR / "shard_groups.json"
+SHARD_SEARCH_WORKERS = 8
+
+# Retrieval post-processing:
+# - Önce top_k * RETRIEVAL_FETCH_MULTIPLIER aday çekilir
+# - MMR ile top_k tanesi seçilir (MMR_LAMBDA=1 -> sadece alaka, 0 -> sadece çeşitlilik)
+# - Aynı dosyadaki komşu/örtüşen chunk'lar tek blokta birleştirilir
+RETRIEVAL_FETCH_MULTIPLIER = 3
+MMR_LAMBDA = 0.7
+
+# Deep research retrieval'ı:
+# - İlk iterasyon soruyla DEEP_RESEARCH_TOP_K bağlam çeker
+# - Sonraki iterasyonlar bir önceki çıktının "Follow-up Queries" listesinden en fazla
+#   DEEP_RESEARCH_MAX_SUBQUERIES sorguyu tek batch'te embed edip arar (sorgu başına
+#   DEEP_RESEARCH_SUBQUERY_TOP_K); daha önce gösterilmiş chunk'lar tekrar gönderilmez
+DEEP_RESEARCH_TOP_K = 12
+DEEP_RESEARCH_MAX_SUBQUERIES = 4
+DEEP_RESEARCH_SUBQUERY_TOP_K = 6
+
+# Prompt token bütçeleri (context_packer):
+# - PROMPT_TOKEN_BUDGET: bir prompt için toplam input token üst sınırı
+# - CONTEXT_TOKEN_BUDGET: bunun retrieval bloklarına ayrılabilecek kısmı
+# - COMPLETION_TOKEN_RESERVE: model context window'unda cevaba bırakılan pay
+PROMPT_TOKEN_BUDGET = 24000
+CONTEXT_TOKEN_BUDGET = 12000
+COMPLETION_TOKEN_RESERVE = 4096
+
+# Bilinen modellerin context window'ları (prefix eşleşmesi)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+}
+
+# LLM HTTP bağlantı havuzu (process genelinde paylaşılan client'lar)
+LLM_HTTP_MAX_CONNECTIONS = 100
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_HTTP_KEEPALIVE_EXPIRY = 60.0
+LLM_HTTP_CONNECT_TIMEOUT = 10.0
+LLM_HTTP_READ_TIMEOUT = 300.0
+# Registry'de tutulacak en fazla client sayısı (sync ve async ayrı ayrı); aşılınca
+# en uzun süredir kullanılmayan client çıkarılır ve devam eden istekleri kesilmesin
+# diye grace süresi sonunda kapatılır
+LLM_CLIENT_CACHE_SIZE = 32
+LLM_CLIENT_CLOSE_GRACE_SECONDS = LLM_HTTP_READ_TIMEOUT
+
+# Wiki sayfa üretimi: aynı anda en fazla kaç sayfa için LLM çağrısı yapılacağı
+# (process genelinde) ve sayfa başına tekrar deneme sayısı / bekleme süresi
+WIKI_PAGE_CONCURRENCY = 4
+WIKI_PAGE_MAX_RETRIES = 2
+WIKI_PAGE_RETRY_BACKOFF_SECONDS = 2.0
+
+# Artımlı wiki üretimi: cache'teki sayfanın kayıtlı chunk kümesi ile bugünkü
+# retrieval sonucunun Jaccard örtüşmesi bu eşiğin altındaysa sayfa yeniden üretilir
+WIKI_PAGE_MIN_DEP_OVERLAP = 0.7
+
+# High Level Architecture sayfasının (repo, commit, model) cache'i:
+# - Commit değiştiğinde ilgili dosyaların en fazla ARCHITECTURE_UPDATE_MAX_CHANGED_FRACTION
+#   oranı değiştiyse önceki doküman + değişiklik özetiyle tek bir güncelleme çağrısı yapılır,
+#   daha fazlası değiştiyse deep research baştan çalışır
+# - ARCHITECTURE_DIFF_TOKEN_BUDGET: güncelleme prompt'undaki değişiklik özetinin token sınırı
+ARCHITECTURE_CACHE_DIR = STORAGE_DIR / "architecture"
+ARCHITECTURE_UPDATE_MAX_CHANGED_FRACTION = 0.3
+ARCHITECTURE_DIFF_TOKEN_BUDGET = 6000
+
+# LLM cevap cache'i (model + normalize edilmiş mesajlar -> cevap)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_DIR = STORAGE_DIR / "llm_cache"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# /api/ask semantik cevap cache'i: soru embedding'i bu cosine benzerliğinin
+# üstündeyse ve index snapshot'ı değişmediyse önceki cevap döner
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES_PER_REPO = 500
+
+# LLM çağrılarında kuyruk gecikmesi kontrolü (chat completion):
+# - LLM_CALL_TIMEOUT_SECONDS: tek bir çağrının (hedge dahil) toplam süre sınırı
+# - LLM_CALL_MAX_RETRIES / LLM_CALL_RETRY_BACKOFF_SECONDS: geçici hatalarda
+#   tekrar deneme sayısı ve üstel beklemenin başlangıç süresi
+# - Hedge: çağrı gözlenen p(LLM_HEDGE_PERCENTILE) gecikmesini aşarsa ikinci bir
+#   istek (varsa LLMConfig.hedge_base_url / hedge_chat_model'e) atılır ve ilk
+#   biten cevap kullanılır. Yeterli örnek yokken LLM_HEDGE_DEFAULT_DELAY_SECONDS
+#   kullanılır; gecikme LLM_HEDGE_MIN_DELAY_SECONDS'tan kısa olamaz.
+LLM_CALL_TIMEOUT_SECONDS = 180.0
+LLM_CALL_MAX_RETRIES = 2
+LLM_CALL_RETRY_BACKOFF_SECONDS = 1.0
+LLM_HEDGE_ENABLED = True
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = 30.0
+LLM_HEDGE_MIN_DELAY_SECONDS = 1.0
+LLM_LATENCY_WINDOW = 200
+
+# Aşama bazlı model yönlendirme (bkz. llm_routing):
+# - chat_model: None -> LLMConfig.chat_model (istekteki stage_routes önceliklidir)
+# - max_tokens: None -> model varsayılanı
+# - concurrency: aşamanın process genelindeki eşzamanlı LLM çağrısı sınırı
+LLM_STAGE_ROUTES = {
+    "outline": {"chat_model": None, "max_tokens": 2048, "concurrency": 2},
+    "page": {"chat_model": None, "max_tokens": None, "concurrency": WIKI_PAGE_CONCURRENCY},
+    "research_intermediate": {"chat_model": None, "max_tokens": 1500, "concurrency": 4},
+    "research_final": {"chat_model": None, "max_tokens": None, "concurrency": 4},
+    "ask": {"chat_model": None, "max_tokens": None, "concurrency": 16},
+    # Konuşma oturumlarının eski mesajlarını rolling özete katlar (bkz. conversations)
+    "conversation_summary": {"chat_model": None, "max_tokens": 600, "concurrency": 4},
+}
+
+# /api/ask konuşma oturumları (bkz. conversations):
+# - CONVERSATION_TTL_SECONDS: son kullanımdan sonra oturumun bellekte tutulma süresi
+# - CONVERSATION_MAX_SESSIONS: node başına oturum üst sınırı (en uzun süre kullanılmayan düşer)
+# - CONVERSATION_RECENT_MESSAGES: prompt'a aynen giren son mesaj sayısı (soru + cevap = 2 mesaj)
+# - CONVERSATION_SUMMARIZE_BATCH: bunların dışında kalan mesaj sayısı bu eşiğe ulaşınca
+#   hepsi tek bir LLM çağrısıyla özete katlanır
+CONVERSATION_TTL_SECONDS = 6 * 3600
+CONVERSATION_MAX_SESSIONS = 2000
+CONVERSATION_RECENT_MESSAGES = 6
+CONVERSATION_SUMMARIZE_BATCH = 4
+
+# Asenkron wiki üretim işleri (node başına):
+# - GENERATION_JOB_WORKERS: aynı anda çalışan iş sayısı
+# - GENERATION_MAX_ACTIVE_JOBS: kuyrukta + çalışan iş üst sınırı (aşılırsa 429)
+# - GENERATION_JOB_RETENTION_SECONDS: biten işlerin sonucunun saklanma süresi
+GENERATION_JOB_WORKERS = 2
+GENERATION_MAX_ACTIVE_JOBS = 10
+GENERATION_JOB_RETENTION_SECONDS = 3600
+
+# Lazy wiki shell / section fragment'ları:
+# - WIKI_FRAGMENT_MAX_AGE_SECONDS: shell ve fragment cevaplarının tarayıcı cache süresi (ETag ile)
+# - EPHEMERAL_WIKI_TTL_SECONDS: stream ile üretilen ephemeral wiki'lerin bellekte tutulma süresi
+# - EPHEMERAL_WIKI_MAX_ENTRIES: bellekte tutulan ephemeral wiki üst sınırı (en eski düşer)
+WIKI_FRAGMENT_MAX_AGE_SECONDS = 300
+EPHEMERAL_WIKI_TTL_SECONDS = 3600
+EPHEMERAL_WIKI_MAX_ENTRIES = 50
+
+# Tam HTML wiki servisi:
+# - HTML_VARIANT_GZIP_LEVEL / HTML_VARIANT_BROTLI_QUALITY: build sırasında yazılan
+#   .gz / .br kopyalarının sıkıştırma seviyesi (bir kez yapıldığı için en yüksek seviye)
+# - HTML_DOCUMENT_CACHE_MAX_BYTES: sıcak dokümanların (tüm varyantlarıyla) tutulduğu
+#   process içi LRU'nun üst sınırı
+HTML_VARIANT_GZIP_LEVEL = 9
+HTML_VARIANT_BROTLI_QUALITY = 11
+HTML_DOCUMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Markdown -> HTML section render'ı:
+# - RENDER_CACHE_MAX_BYTES: (markdown hash, renderer versiyonu) -> HTML fragment LRU'sunun üst sınırı
+# - WIKI_RENDER_PARALLEL_MIN_SECTIONS: render edilecek section sayısı bunun altındaysa
+#   process pool'a gidilmez (pickle maliyeti paralellik kazancını aşar)
+RENDER_CACHE_MAX_BYTES = 32 * 1024 * 1024
+WIKI_RENDER_PARALLEL_MIN_SECTIONS = 8
+
+# Aynı repo için eşzamanlı kalıcı build'leri engelleyen file lock'lar
+# (paylaşılan storage üzerinde worker / pod'lar arası çalışır)
+BUILD_LOCK_DIR = STORAGE_DIR / "locks"
+BUILD_LOCK_TIMEOUT_SECONDS = 2 * 3600
+BUILD_LOCK_POLL_SECONDS = 1.0
+
+# CPU ağırlıklı işler (chunking, HTML render) için process pool boyutu.
+# 0 -> process pool kullanılmaz, işler çağıran thread'de çalışır.
+CPU_POOL_WORKERS = os.cpu_count() or 2
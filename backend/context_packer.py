@@ -0,0 +1,189 @@
+import logging
+from typing import List, Dict, Any, Optional
+
+from .config import (
+    PROMPT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_BUDGET,
+    COMPLETION_TOKEN_RESERVE,
+    MODEL_CONTEXT_WINDOWS,
+)
+
+logger = logging.getLogger("deepwiki")
+
+try:  # tiktoken opsiyonel; yoksa karakter bazlı tahmin kullanılır
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoders: Dict[str, Any] = {}
+
+
+def _get_encoder(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    key = model or ""
+    if key not in _encoders:
+        try:
+            _encoders[key] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            try:
+                _encoders[key] = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # Encoding dosyası indirilemiyorsa (offline ortam) tahmine düş
+                _encoders[key] = None
+    return _encoders[key]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Metnin token sayısı. tiktoken yoksa ~4 karakter = 1 token tahmini yapılır.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def prompt_budget_for_model(model: Optional[str]) -> int:
+    """
+    Model için kullanılabilecek prompt token bütçesi:
+    min(PROMPT_TOKEN_BUDGET, context window - COMPLETION_TOKEN_RESERVE).
+    Bilinmeyen modellerde PROMPT_TOKEN_BUDGET kullanılır.
+    """
+    budget = PROMPT_TOKEN_BUDGET
+    if model:
+        # En uzun eşleşen prefix (ör. "gpt-4.1-mini" önce "gpt-4.1-mini", sonra "gpt-4.1")
+        for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+            if model.startswith(prefix):
+                budget = min(budget, MODEL_CONTEXT_WINDOWS[prefix] - COMPLETION_TOKEN_RESERVE)
+                break
+    return max(budget, 0)
+
+
+def format_context_block(neighbor: Dict[str, Any]) -> str:
+    return f"File: {neighbor['path']}\n\n{neighbor['text']}\n---"
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str], keep_tail: bool) -> str:
+    """
+    Metni en fazla max_tokens olacak şekilde keser. keep_tail=True ise sondan korur.
+    Encoder'a bağlı olmamak için karakter oranıyla daraltılır.
+    """
+    if max_tokens <= 0:
+        return ""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    n_chars = max(int(len(text) * max_tokens / tokens), 0)
+    while n_chars > 0:
+        candidate = text[-n_chars:] if keep_tail else text[:n_chars]
+        if count_tokens(candidate, model) <= max_tokens:
+            return candidate
+        n_chars = int(n_chars * 0.9)
+    return ""
+
+
+def pack_context(
+    fixed_texts: List[str],
+    neighbors: List[Dict[str, Any]],
+    history_entries: Optional[List[str]] = None,
+    model: Optional[str] = None,
+    history_separator: str = "\n",
+    total_budget: Optional[int] = None,
+    context_budget: int = CONTEXT_TOKEN_BUDGET,
+) -> Dict[str, Any]:
+    """
+    Prompt'u token bütçesine göre paketler:
+
+    1. Sabit metinler (system prompt, template, soru) her zaman girer
+    2. Retrieval blokları skora göre (en iyi önce) context bütçesi dolana kadar eklenir
+    3. Kalan bütçe geçmişe verilir; en yeni girdiler korunur, eskiler düşer
+       (sığmayan en yeni girdi baştan kırpılır)
+
+    Dönüş:
+        {
+          "contexts": str,        # format_context_block ile birleştirilmiş bloklar
+          "history": str,         # history_separator ile birleştirilmiş geçmiş
+          "neighbors": [...],     # prompt'a giren bloklar
+          "stats": {...},         # token sayıları
+        }
+    """
+    if total_budget is None:
+        total_budget = prompt_budget_for_model(model)
+    history_entries = history_entries or []
+
+    fixed_tokens = sum(count_tokens(t, model) for t in fixed_texts)
+    remaining = max(total_budget - fixed_tokens, 0)
+
+    # --- Retrieval blokları ---
+    block_budget = min(context_budget, remaining)
+    used_blocks: List[Dict[str, Any]] = []
+    block_texts: List[str] = []
+    context_tokens = 0
+    for n in sorted(neighbors, key=lambda x: x.get("score", 0.0)):
+        block = format_context_block(n)
+        tokens = count_tokens(block, model)
+        if context_tokens + tokens > block_budget:
+            if used_blocks:
+                continue
+            # Hiçbir blok sığmıyorsa en iyi bloğu kırparak da olsa ekle
+            block = truncate_to_tokens(block, block_budget, model, keep_tail=False)
+            tokens = count_tokens(block, model)
+            if not block:
+                continue
+        used_blocks.append(n)
+        block_texts.append(block)
+        context_tokens += tokens
+    contexts = "\n\n".join(block_texts)
+    remaining -= context_tokens
+
+    # --- Geçmiş (en yeniden eskiye) ---
+    kept: List[str] = []
+    history_tokens = 0
+    for entry in reversed(history_entries):
+        tokens = count_tokens(entry, model)
+        if history_tokens + tokens <= remaining:
+            kept.append(entry)
+            history_tokens += tokens
+            continue
+        if not kept:
+            entry = truncate_to_tokens(entry, remaining - history_tokens, model, keep_tail=True)
+            if entry:
+                kept.append(entry)
+                history_tokens += count_tokens(entry, model)
+        break
+    kept.reverse()
+    history = history_separator.join(kept)
+
+    stats = {
+        "budget": total_budget,
+        "fixed_tokens": fixed_tokens,
+        "context_tokens": context_tokens,
+        "history_tokens": history_tokens,
+        "total_tokens": fixed_tokens + context_tokens + history_tokens,
+        "blocks_used": len(used_blocks),
+        "blocks_dropped": len(neighbors) - len(used_blocks),
+        "history_used": len(kept),
+        "history_dropped": len(history_entries) - len(kept),
+    }
+    logger.info(
+        "Packed prompt model=%s total=%d/%d (fixed=%d context=%d history=%d) blocks=%d/%d history=%d/%d",
+        model,
+        stats["total_tokens"],
+        total_budget,
+        fixed_tokens,
+        context_tokens,
+        history_tokens,
+        stats["blocks_used"],
+        len(neighbors),
+        stats["history_used"],
+        len(history_entries),
+    )
+    return {
+        "contexts": contexts,
+        "history": history,
+        "neighbors": used_blocks,
+        "stats": stats,
+    }
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set
+
+from .config import (
+    CONVERSATION_TTL_SECONDS,
+    CONVERSATION_MAX_SESSIONS,
+    CONVERSATION_RECENT_MESSAGES,
+    CONVERSATION_SUMMARIZE_BATCH,
+)
+from .chat_client import AsyncChatClient
+from .context_packer import truncate_to_tokens
+from .models import LLMConfig
+from .prompts import CONVERSATION_SUMMARY_SYSTEM_PROMPT, CONVERSATION_SUMMARY_USER_TEMPLATE
+
+logger = logging.getLogger("deepwiki")
+
+# Özete katlanan tek bir mesajın (ör. uzun bir cevabın) en fazla token'ı
+_FOLD_MESSAGE_MAX_TOKENS = 1500
+
+# /api/ask konuşma oturumları; yalnızca bu process'in belleğinde tutulur.
+# session_id -> {"repo_id", "summary", "messages": [{"role", "content"}],
+#                "summarizing", "updated_at"}
+# Sıra son kullanıma göredir (en eski başta).
+_sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+# Çalışan özet task'ları; referans tutulmazsa event loop task'ı erkenden toplayabilir
+_background: Set[asyncio.Task] = set()
+_stats: Dict[str, int] = {
+    "created": 0,
+    "expired": 0,
+    "evicted": 0,
+    "summaries": 0,
+    "summary_failures": 0,
+}
+
+
+def _purge_expired() -> None:
+    # _lock tutulurken çağrılır
+    cutoff = time.time() - CONVERSATION_TTL_SECONDS
+    while _sessions:
+        session_id, session = next(iter(_sessions.items()))
+        if session["updated_at"] >= cutoff:
+            break
+        del _sessions[session_id]
+        _stats["expired"] += 1
+
+
+def _get_session(session_id: str, repo_id: str) -> Optional[Dict[str, Any]]:
+    # _lock tutulurken çağrılır; oturumu en yeni kullanılan olarak işaretler
+    _purge_expired()
+    session = _sessions.get(session_id)
+    if session is None or session["repo_id"] != repo_id:
+        return None
+    session["updated_at"] = time.time()
+    _sessions.move_to_end(session_id)
+    return session
+
+
+def create_session(repo_id: str) -> str:
+    """
+    repo için boş bir konuşma oturumu açar ve session_id döner.
+    CONVERSATION_MAX_SESSIONS aşılırsa en uzun süredir kullanılmayan oturum düşer.
+    """
+    session_id = uuid.uuid4().hex
+    with _lock:
+        _purge_expired()
+        _sessions[session_id] = {
+            "repo_id": repo_id,
+            "summary": "",
+            "messages": [],
+            "summarizing": False,
+            "updated_at": time.time(),
+        }
+        _stats["created"] += 1
+        while len(_sessions) > CONVERSATION_MAX_SESSIONS:
+            _sessions.popitem(last=False)
+            _stats["evicted"] += 1
+    return session_id
+
+
+def get_session_history(session_id: str, repo_id: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Prompt'a girecek konuşma geçmişi: eski mesajların özeti (varsa, role="summary")
+    ve ardından özetlenmemiş mesajlar. Oturum yoksa, süresi dolduysa veya başka bir
+    repo'ya aitse None.
+    """
+    with _lock:
+        session = _get_session(session_id, repo_id)
+        if session is None:
+            return None
+        history = [{"role": "summary", "content": session["summary"]}] if session["summary"] else []
+        history.extend(dict(m) for m in session["messages"])
+    return history
+
+
+def record_turn(session_id: str, repo_id: str, question: str, answer: str, llm: LLMConfig) -> None:
+    """
+    Soru ve cevabı oturuma ekler. Son CONVERSATION_RECENT_MESSAGES dışında kalan
+    mesaj sayısı CONVERSATION_SUMMARIZE_BATCH'e ulaştıysa bu mesajlar arka planda
+    tek bir çağrıyla özete katlanır; cevap bu çağrıyı beklemez.
+    Çalışan bir event loop içinden çağrılmalıdır.
+    """
+    with _lock:
+        session = _get_session(session_id, repo_id)
+        if session is None:
+            return
+        session["messages"].append({"role": "user", "content": question})
+        session["messages"].append({"role": "assistant", "content": answer})
+        n_fold = len(session["messages"]) - CONVERSATION_RECENT_MESSAGES
+        if n_fold < CONVERSATION_SUMMARIZE_BATCH or session["summarizing"]:
+            return
+        session["summarizing"] = True
+        summary = session["summary"]
+        to_fold = [dict(m) for m in session["messages"][:n_fold]]
+
+    task = asyncio.get_running_loop().create_task(
+        _fold_into_summary(session_id, summary, to_fold, llm)
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _fold_into_summary(
+    session_id: str,
+    summary: str,
+    to_fold: List[Dict[str, str]],
+    llm: LLMConfig,
+) -> None:
+    chat_client = AsyncChatClient(llm, stage="conversation_summary")
+    messages_text = "\n\n".join(
+        f"{m['role'].upper()}: "
+        + truncate_to_tokens(m["content"], _FOLD_MESSAGE_MAX_TOKENS, chat_client.model, keep_tail=False)
+        for m in to_fold
+    )
+    user_prompt = CONVERSATION_SUMMARY_USER_TEMPLATE.format(
+        summary=summary or "(none)",
+        messages=messages_text,
+    )
+    try:
+        new_summary = await chat_client.chat(
+            [
+                {"role": "system", "content": CONVERSATION_SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ]
+        )
+    except Exception as e:
+        # Mesajlar yerinde kalır; bir sonraki turda tekrar denenir
+        logger.warning("Conversation summary failed session_id=%s: %s", session_id, e)
+        new_summary = None
+
+    with _lock:
+        session = _sessions.get(session_id)
+        if session is None:
+            return
+        session["summarizing"] = False
+        if new_summary is None:
+            _stats["summary_failures"] += 1
+            return
+        # Çağrı sürerken yeni mesajlar sona eklenmiş olabilir; yalnızca katlananlar silinir
+        session["summary"] = new_summary.strip()
+        del session["messages"][:len(to_fold)]
+        _stats["summaries"] += 1
+
+
+def get_conversation_stats() -> Dict[str, Any]:
+    with _lock:
+        _purge_expired()
+        stats: Dict[str, Any] = dict(_stats)
+        stats["sessions"] = len(_sessions)
+        stats["summarizing"] = sum(1 for s in _sessions.values() if s["summarizing"])
+    return stats
@@ -1,8 +1,17 @@
-from typing import List, Dict, Any, Tuple
+import logging
+import re
+from typing import List, Dict, Any, Tuple, Iterator, Set, Hashable
 
+from .config import (
+    DEEP_RESEARCH_TOP_K,
+    DEEP_RESEARCH_MAX_SUBQUERIES,
+    DEEP_RESEARCH_SUBQUERY_TOP_K,
+)
 from .embeddings import EmbeddingClient
 from .chat_client import ChatClient
-from .vector_store import FaissIndex, get_index_paths
+from .vector_store import FaissIndex, acquire_index
+from .retrieval import retrieve_many
+from .context_packer import pack_context
 from .models import LLMConfig
 from .prompts import (
     DEEP_RESEARCH_FIRST_ITERATION_PROMPT,
@@ -10,31 +19,99 @@ from .prompts import (
     DEEP_RESEARCH_FINAL_ITERATION_PROMPT,
 )
 
+logger = logging.getLogger("deepwiki")
+
+# Alt sorgular önce "Follow-up Queries", yoksa "Next Steps" bölümünden okunur
+_QUERY_SECTION_RES = [
+    re.compile(r"^#+\s*follow[- ]?up queries\s*:?\s*$", re.IGNORECASE | re.MULTILINE),
+    re.compile(r"^#+\s*next steps\s*:?\s*$", re.IGNORECASE | re.MULTILINE),
+]
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.+?)\s*$")
+
 
-def _load_index(repo_id: str) -> FaissIndex:
-    index_path, meta_path = get_index_paths(repo_id)
-    return FaissIndex.load(index_path, meta_path)
+def extract_follow_up_queries(content: str, limit: int = DEEP_RESEARCH_MAX_SUBQUERIES) -> List[str]:
+    """
+    Bir iterasyon çıktısından sonraki iterasyonun arama sorgularını çıkarır:
+    "## Follow-up Queries" (yoksa "## Next Steps") bölümündeki liste maddeleri.
+    Bölüm bir sonraki başlıkta biter; bölüm yoksa boş liste döner.
+    """
+    for section_re in _QUERY_SECTION_RES:
+        match = section_re.search(content)
+        if match is None:
+            continue
+        queries: List[str] = []
+        for line in content[match.end():].splitlines():
+            if line.lstrip().startswith("#"):
+                break
+            item = _LIST_ITEM_RE.match(line)
+            if item is None:
+                continue
+            query = item.group(1).strip("`*_ ")
+            if query and query.lower() not in (q.lower() for q in queries):
+                queries.append(query)
+            if len(queries) >= limit:
+                break
+        if queries:
+            return queries
+    return []
 
 
-def _build_contexts(neighbors: List[Dict[str, Any]]) -> str:
-    blocks: List[str] = []
-    for n in neighbors:
-        blocks.append(f"File: {n['path']}\n\n{n['text']}\n---")
-    return "\n\n".join(blocks)
+def _context_keys(block: Dict[str, Any]) -> Set[Hashable]:
+    # Birleştirilmiş bloklar içerdikleri chunk ID'leriyle, ID'siz eski metadata
+    # dosya + metin ile tanınır
+    if block.get("ids"):
+        return set(block["ids"])
+    return {(block.get("repo_id"), block["path"], block.get("text", ""))}
+
+
+def _retrieve_new_contexts(
+    index: FaissIndex,
+    embed_client: EmbeddingClient,
+    queries: List[str],
+    top_k: int,
+    seen: Set[Hashable],
+) -> List[Dict[str, Any]]:
+    """
+    Sorguları tek batch'te embed edip tek bir batch FAISS aramasıyla arar;
+    daha önce prompt'a girmiş (seen) veya bu turda başka bir sorgudan gelmiş
+    bloklar atlanır.
+    """
+    if not queries:
+        return []
+    embeddings = embed_client.embed_texts(queries)
+    fresh: List[Dict[str, Any]] = []
+    taken: Set[Hashable] = set()
+    for blocks in retrieve_many(index, embeddings, top_k=top_k):
+        for block in blocks:
+            keys = _context_keys(block)
+            if keys <= seen or keys <= taken:
+                continue
+            taken |= keys
+            fresh.append(block)
+    return fresh
 
 
-def _build_history_text(iterations: List[Dict[str, str]]) -> str:
+def _build_history_entries(iterations: List[Dict[str, Any]]) -> List[str]:
     """
-    Önceki araştırma adımlarını düz metin olarak birleştirir.
+    Önceki araştırma adımlarını (label + içerik) ayrı metinler olarak döner.
     """
-    if not iterations:
-        return ""
-    parts = []
+    entries = []
     for it in iterations:
         label = it.get("label", "")
         content = it.get("content", "")
-        parts.append(f"{label}\n{content}\n")
-    return "\n\n".join(parts)
+        entries.append(f"{label}\n{content}\n")
+    return entries
+
+
+def _system_text(stage: str, iteration: int) -> str:
+    if stage == "first":
+        return DEEP_RESEARCH_FIRST_ITERATION_PROMPT.format(max_subqueries=DEEP_RESEARCH_MAX_SUBQUERIES)
+    if stage == "final":
+        return DEEP_RESEARCH_FINAL_ITERATION_PROMPT
+    # Basit bir formatlama; sadece ihtiyaç duyulan placeholder'ları dolduruyoruz.
+    return DEEP_RESEARCH_INTERMEDIATE_ITERATION_PROMPT.format(
+        iteration=iteration, max_subqueries=DEEP_RESEARCH_MAX_SUBQUERIES
+    )
 
 
 def _build_messages(
@@ -50,18 +127,7 @@ def _build_messages(
 
     stage: "first" | "intermediate" | "final"
     """
-    if stage == "first":
-        system_prompt = DEEP_RESEARCH_FIRST_ITERATION_PROMPT
-    elif stage == "final":
-        system_prompt = DEEP_RESEARCH_FINAL_ITERATION_PROMPT
-    else:
-        system_prompt = DEEP_RESEARCH_INTERMEDIATE_ITERATION_PROMPT
-
-    # Basit bir formatlama; sadece ihtiyaç duyulan placeholder'ları dolduruyoruz.
-    if stage == "intermediate":
-        system_text = system_prompt.format(iteration=iteration)
-    else:
-        system_text = system_prompt
+    system_text = _system_text(stage, iteration)
 
     user_parts = [
         f"User question:\n{question}\n",
@@ -81,74 +147,144 @@ def _build_messages(
     ]
 
 
-def run_deep_research(
+def iter_deep_research(
     repo_id: str,
     question: str,
     llm: LLMConfig,
     max_iterations: int = 3,
-) -> Tuple[str, List[Dict[str, str]]]:
+    stream: bool = False,
+) -> Iterator[Dict[str, Any]]:
     """
-    Repo üzerinde çok turlu bir araştırma süreci yürütür.
+    Deep research sürecini olay (event) akışı olarak yürütür.
 
-    - Her iterasyonda soru için embedding üretir ve FAISS index'ten bağlam toplar
-    - İlk iterasyonda araştırma planı + ilk bulgular
-    - Orta iterasyonlarda derinleşen "research update" çıktıları
-    - Son iterasyonda kapsamlı bir "final conclusion"
+    Olaylar:
+      {"event": "iteration_start", "data": {"iteration", "stage", "label"}}
+      {"event": "token", "data": {"iteration", "text"}}          # sadece stream=True iken
+      {"event": "iteration_end", "data": {"iteration", "stage", "label", "content", "token_usage",
+                                          "queries", "new_contexts"}}
+      {"event": "done", "data": {"final_answer", "iterations"}}
     """
     if max_iterations < 1:
         max_iterations = 1
     if max_iterations > 5:
         max_iterations = 5
 
-    index = _load_index(repo_id)
     embed_client = EmbeddingClient(llm)
-    chat_client = ChatClient(llm)
+    # Ara adımlar (plan / güncelleme) hızlı modele, son cevap güçlü modele gider
+    intermediate_client = ChatClient(llm, stage="research_intermediate")
+    final_client = ChatClient(llm, stage="research_final")
 
-    iterations: List[Dict[str, str]] = []
+    iterations: List[Dict[str, Any]] = []
     final_answer = ""
+    # İlk iterasyon soruyla, sonrakiler bir önceki çıktının alt sorgularıyla arar
+    queries = [question]
+    top_k = DEEP_RESEARCH_TOP_K
+    # Daha önce prompt'a girmiş chunk'lar; aynı bağlam iki kez gönderilmez
+    seen: Set[Hashable] = set()
 
-    for i in range(1, max_iterations + 1):
-        if i == 1:
-            stage = "first"
-            label = f"## Research Plan (iteration {i})"
-        elif i == max_iterations:
-            stage = "final"
-            label = f"## Final Conclusion (iteration {i})"
-        else:
-            stage = "intermediate"
-            label = f"## Research Update ({i})"
-
-        # Her iterasyonda soruya göre embedding + en ilgili context'ler
-        q_emb = embed_client.embed_texts([question])[0]
-        neighbors = index.search(q_emb, top_k=12)
-        contexts = _build_contexts(neighbors)
-
-        history_text = _build_history_text(iterations)
-        messages = _build_messages(
-            stage=stage,
-            iteration=i,
-            question=question,
-            contexts=contexts,
-            history_text=history_text,
-            llm=llm,
-        )
-
-        content = chat_client.chat(messages)
-
-        iterations.append(
-            {
+    # Araştırma boyunca tek bir snapshot sabitlenir
+    with acquire_index(repo_id) as index:
+        for i in range(1, max_iterations + 1):
+            neighbors = _retrieve_new_contexts(index, embed_client, queries, top_k, seen)
+
+            if i == 1:
+                stage = "first"
+                label = f"## Research Plan (iteration {i})"
+            elif i == max_iterations or not neighbors:
+                if i < max_iterations:
+                    # Yeni bağlam yoksa ara adım yalnızca öncekileri tekrar ederdi; doğrudan sonuca geçilir
+                    logger.info(
+                        "Deep research repo_id=%s stopping early at iteration %d/%d: no new contexts",
+                        repo_id,
+                        i,
+                        max_iterations,
+                    )
+                stage = "final"
+                label = f"## Final Conclusion (iteration {i})"
+            else:
+                stage = "intermediate"
+                label = f"## Research Update ({i})"
+
+            chat_client = final_client if stage == "final" else intermediate_client
+
+            yield {
+                "event": "iteration_start",
+                "data": {"iteration": i, "stage": stage, "label": label},
+            }
+
+            # Bağlamlar ve önceki iterasyonlar token bütçesine göre paketlenir;
+            # sığmayan en eski iterasyonlar düşer.
+            packed = pack_context(
+                fixed_texts=[_system_text(stage, i), question],
+                neighbors=neighbors,
+                history_entries=_build_history_entries(iterations),
+                model=chat_client.model,
+                history_separator="\n\n",
+            )
+            # Bütçeye sığmayıp gönderilmeyen bloklar sonraki iterasyonlarda tekrar gelebilir
+            for block in packed["neighbors"]:
+                seen |= _context_keys(block)
+
+            messages = _build_messages(
+                stage=stage,
+                iteration=i,
+                question=question,
+                contexts=packed["contexts"],
+                history_text=packed["history"],
+                llm=llm,
+            )
+
+            if stream:
+                parts: List[str] = []
+                for delta in chat_client.chat_stream(messages):
+                    parts.append(delta)
+                    yield {"event": "token", "data": {"iteration": i, "text": delta}}
+                content = "".join(parts)
+            else:
+                content = chat_client.chat(messages)
+
+            iteration = {
                 "stage": stage,
                 "label": label,
                 "content": content,
+                "token_usage": packed["stats"],
+                "queries": queries,
+                "new_contexts": len(packed["neighbors"]),
             }
-        )
+            iterations.append(iteration)
+            yield {"event": "iteration_end", "data": {"iteration": i, **iteration}}
+
+            if stage == "final":
+                final_answer = content
+                break
 
-        if stage == "final":
-            final_answer = content
+            queries = extract_follow_up_queries(content)
+            top_k = DEEP_RESEARCH_SUBQUERY_TOP_K
 
     if not final_answer and iterations:
         final_answer = iterations[-1]["content"]
 
-    return final_answer, iterations
+    yield {
+        "event": "done",
+        "data": {"final_answer": final_answer, "iterations": iterations},
+    }
 
 
+def run_deep_research(
+    repo_id: str,
+    question: str,
+    llm: LLMConfig,
+    max_iterations: int = 3,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Repo üzerinde çok turlu bir araştırma süreci yürütür.
+
+    - İlk iterasyonda soru için FAISS index'ten bağlam toplar; araştırma planı + ilk bulgular
+    - Sonraki iterasyonlar önceki çıktının "Follow-up Queries" alt sorgularıyla yalnızca
+      henüz gösterilmemiş bağlamları çeker ve derinleşen "research update" üretir
+    - Son iterasyonda (veya yeni bağlam kalmadığında erkenden) kapsamlı bir "final conclusion"
+    """
+    for event in iter_deep_research(repo_id, question, llm, max_iterations):
+        if event["event"] == "done":
+            return event["data"]["final_answer"], event["data"]["iterations"]
+    return "", []
@@ -1,8 +1,8 @@
 from typing import List
 
-from openai import OpenAI
 from .models import LLMConfig
 from .config import EMBEDDING_BATCH_SIZE
+from .llm_clients import get_openai_client, get_async_openai_client
 
 
 class EmbeddingClient:
@@ -13,15 +13,8 @@ class EmbeddingClient:
     """
 
     def __init__(self, config: LLMConfig):
-        if config.provider == "openai":
-            base_url = config.base_url or "https://api.openai.com/v1"
-            self.client = OpenAI(
-                base_url=base_url,
-                api_key=config.api_key,
-            )
-            self.model = config.embed_model
-        else:
-            raise NotImplementedError(f"Provider not supported yet: {config.provider}")
+        self.client = get_openai_client(config)
+        self.model = config.embed_model
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
@@ -43,4 +36,25 @@ class EmbeddingClient:
             batch_embeddings = [d.embedding for d in response.data]
             all_embeddings.extend(batch_embeddings)
 
-        return all_embeddings
\ No newline at end of file
+        return all_embeddings
+
+
+class AsyncEmbeddingClient:
+    """
+    EmbeddingClient'ın asyncio sürümü (istek yolundaki soru embedding'leri için).
+    """
+
+    def __init__(self, config: LLMConfig):
+        self.client = get_async_openai_client(config)
+        self.model = config.embed_model
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        all_embeddings: List[List[float]] = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=batch,
+            )
+            all_embeddings.extend(d.embedding for d in response.data)
+        return all_embeddings
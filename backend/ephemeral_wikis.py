@@ -0,0 +1,76 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from .config import EPHEMERAL_WIKI_TTL_SECONDS, EPHEMERAL_WIKI_MAX_ENTRIES
+from .models import WikiSection
+
+# Stream ile üretilen ephemeral wiki'lerin section fragment'ları; diske hiçbir şey
+# yazılmaz. Lazy shell bu kayıtlardan section başına fragment çeker.
+# wiki_id -> {"repo_id", "sections", "fragments": {section_id: html}, "created_at"}
+_wikis: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "stored": 0,
+    "evicted": 0,
+    "expired": 0,
+}
+
+
+def _purge_expired() -> None:
+    # _lock tutulurken çağrılır; kayıtlar eklenme sırasında olduğundan baştan temizlenir
+    cutoff = time.time() - EPHEMERAL_WIKI_TTL_SECONDS
+    while _wikis:
+        wiki_id, wiki = next(iter(_wikis.items()))
+        if wiki["created_at"] >= cutoff:
+            break
+        del _wikis[wiki_id]
+        _stats["expired"] += 1
+
+
+def store_ephemeral_wiki(
+    repo_id: str,
+    sections: List[WikiSection],
+    fragments: Dict[str, str],
+) -> str:
+    """
+    Ephemeral wiki'nin section fragment'larını EPHEMERAL_WIKI_TTL_SECONDS boyunca
+    saklar ve erişim için bir wiki_id döner. EPHEMERAL_WIKI_MAX_ENTRIES aşılırsa
+    en eski kayıt düşer.
+    """
+    wiki_id = uuid.uuid4().hex
+    with _lock:
+        _purge_expired()
+        _wikis[wiki_id] = {
+            "repo_id": repo_id,
+            "sections": list(sections),
+            "fragments": dict(fragments),
+            "created_at": time.time(),
+        }
+        _stats["stored"] += 1
+        while len(_wikis) > EPHEMERAL_WIKI_MAX_ENTRIES:
+            _wikis.popitem(last=False)
+            _stats["evicted"] += 1
+    return wiki_id
+
+
+def get_ephemeral_wiki(wiki_id: str) -> Optional[Dict[str, Any]]:
+    """
+    {"repo_id", "sections", "fragments", "created_at"}; kayıt yoksa veya süresi dolduysa None.
+    """
+    with _lock:
+        _purge_expired()
+        return _wikis.get(wiki_id)
+
+
+def get_ephemeral_wiki_stats() -> Dict[str, Any]:
+    with _lock:
+        _purge_expired()
+        stats: Dict[str, Any] = dict(_stats)
+        stats["entries"] = len(_wikis)
+        stats["fragment_bytes"] = sum(
+            len(f) for wiki in _wikis.values() for f in wiki["fragments"].values()
+        )
+    return stats
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from .config import CPU_POOL_WORKERS, SHARD_SEARCH_WORKERS
+
+logger = logging.getLogger("deepwiki")
+
+T = TypeVar("T")
+
+# FAISS aramaları için ayrı thread pool: search çağrıları C++ tarafında GIL'i
+# bıraktığından thread'ler gerçekten paralel çalışır ve event loop'u bloklamaz.
+search_pool = ThreadPoolExecutor(
+    max_workers=SHARD_SEARCH_WORKERS,
+    thread_name_prefix="faiss-search",
+)
+
+_cpu_lock = threading.Lock()
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Chunking / HTML render gibi saf Python CPU işleri için process pool.
+    Thread'li bir process'ten fork etmek güvenli olmadığından "spawn" kullanılır.
+    CPU_POOL_WORKERS=0 ise None döner.
+    """
+    global _cpu_pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _cpu_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("Started CPU process pool workers=%d", CPU_POOL_WORKERS)
+        return _cpu_pool
+
+
+def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """
+    fn(*args)'ı process pool'da çalıştırıp sonucu bekler (senkron çağıranlar için).
+    fn ve argümanlar pickle edilebilir olmalıdır.
+    """
+    pool = get_cpu_pool()
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+
+def map_cpu(fn: Callable[[Any], T], items: Iterable[Any]) -> List[T]:
+    """
+    fn'i items üzerinde process pool'da paralel çalıştırır; sonuçlar girdi sırasındadır.
+    Pickle / IPC maliyetini azaltmak için işler worker başına birkaç parçaya bölünür.
+    """
+    items = list(items)
+    pool = get_cpu_pool()
+    if pool is None:
+        return [fn(item) for item in items]
+    chunksize = max(1, len(items) // (CPU_POOL_WORKERS * 4))
+    return list(pool.map(fn, items, chunksize=chunksize))
+
+
+async def run_cpu_async(fn: Callable[..., T], *args: Any) -> T:
+    pool = get_cpu_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.wrap_future(pool.submit(fn, *args))
+
+
+async def run_search(fn: Callable[..., T], *args: Any) -> T:
+    """
+    fn(*args)'ı FAISS search thread pool'unda çalıştırır.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_pool, functools.partial(fn, *args))
+
+
+def shutdown_executors() -> None:
+    global _cpu_pool
+    with _cpu_lock:
+        pool, _cpu_pool = _cpu_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,274 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from .config import (
+    HTML_VARIANT_GZIP_LEVEL,
+    HTML_VARIANT_BROTLI_QUALITY,
+    HTML_DOCUMENT_CACHE_MAX_BYTES,
+)
+
+try:  # brotli opsiyonel; yoksa yalnızca gzip varyantı üretilir / servis edilir
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("deepwiki")
+
+# Content-Encoding -> diskteki varyant dosyasının uzantısı
+_VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# path -> {"signature": (mtime_ns, size), "variants": {encoding: (body, etag)}, "bytes": int}
+# encoding None sıkıştırılmamış halidir
+_documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cached_bytes = 0
+_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "compressed_on_load": 0,
+    "not_modified": 0,
+    "bytes_sent": 0,
+}
+_responses_by_encoding: Dict[str, int] = {}
+
+
+def _available_encodings() -> List[str]:
+    # Tercih sırası: en iyi sıkıştıran önce
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=HTML_VARIANT_BROTLI_QUALITY)
+    # mtime=0: aynı içerik her build'de aynı byte'ları üretir
+    return gzip.compress(data, compresslevel=HTML_VARIANT_GZIP_LEVEL, mtime=0)
+
+
+def _decompress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.decompress(data)
+    return gzip.decompress(data)
+
+
+def _variant_path(path: Path, encoding: str) -> Path:
+    return path.with_name(path.name + _VARIANT_SUFFIXES[encoding])
+
+
+def write_html_stream(path: Path, chunks: Iterable[str]) -> None:
+    """
+    Parça parça gelen HTML dokümanını ve sıkıştırılmış varyantlarını ({path}.gz,
+    brotli varsa {path}.br) tek geçişte yazar; doküman bellekte birleştirilmez.
+    Dosyalar geçici isimlerle yazılıp atomik olarak yerine konur. Varyantlar önce
+    yerleşir; okuyan taraf yine de her varyantı doküman ile doğrular
+    (bkz. load_html_document).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    targets: Dict[Optional[str], Path] = {None: path}
+    for encoding in _available_encodings():
+        targets[encoding] = _variant_path(path, encoding)
+    tmp_paths = {enc: target.parent / f".{target.name}.{token}.tmp" for enc, target in targets.items()}
+
+    try:
+        with ExitStack() as stack:
+            files = {enc: stack.enter_context(open(tmp, "wb")) for enc, tmp in tmp_paths.items()}
+            # filename="": gzip başlığına geçici dosya adı yazılmasın
+            gz = stack.enter_context(
+                gzip.GzipFile(
+                    filename="",
+                    fileobj=files["gzip"],
+                    mode="wb",
+                    compresslevel=HTML_VARIANT_GZIP_LEVEL,
+                    mtime=0,
+                )
+            )
+            br = brotli.Compressor(quality=HTML_VARIANT_BROTLI_QUALITY) if "br" in files else None
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                files[None].write(data)
+                gz.write(data)
+                if br is not None:
+                    files["br"].write(br.process(data))
+            if br is not None:
+                files["br"].write(br.finish())
+
+        for encoding in _available_encodings():
+            os.replace(tmp_paths[encoding], targets[encoding])
+        os.replace(tmp_paths[None], path)
+    except BaseException:
+        for tmp in tmp_paths.values():
+            tmp.unlink(missing_ok=True)
+        raise
+
+
+def make_etag(data: bytes, encoding: Optional[str] = None) -> str:
+    """
+    İçerik hash'inden strong ETag. Her Content-Encoding ayrı bir temsil olduğundan
+    sıkıştırılmış varyantların ETag'i encoding son ekini taşır.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match başlığı (virgüllü liste veya "*") verilen ETag'i içeriyor mu?
+    RFC 9110 gereği karşılaştırma zayıftır; W/ öneki yok sayılır.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def _opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return any(_opaque(tag) == _opaque(etag) for tag in if_none_match.split(","))
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: List[str]) -> Optional[str]:
+    """
+    Accept-Encoding'e göre available içinden (tercih sırasıyla) en yüksek q değerli
+    encoding'i seçer; hiçbiri kabul edilmiyorsa None (sıkıştırılmamış) döner.
+    """
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _load_variant(path: Path, encoding: str, data: bytes) -> bytes:
+    """
+    Diskteki varyantı doküman ile doğrulayarak okur. Varyant yoksa (eski build) veya
+    dokümanla uyuşmuyorsa (eşzamanlı yeniden build) bellekte sıkıştırılır.
+    """
+    variant_path = _variant_path(path, encoding)
+    try:
+        compressed = variant_path.read_bytes()
+        if _decompress(encoding, compressed) == data:
+            return compressed
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable HTML variant %s: %s", variant_path, e)
+    with _lock:
+        _stats["compressed_on_load"] += 1
+    return _compress(encoding, data)
+
+
+def load_html_document(path: Path) -> Optional[Dict[Optional[str], Tuple[bytes, str]]]:
+    """
+    Dokümanın tüm temsillerini {encoding: (body, etag)} olarak döner; dosya yoksa None.
+    Sonuç, dosyanın (mtime, boyut) imzasıyla doğrulanan bir LRU'da tutulur;
+    sıcak dokümanlar için disk okuması, hash ve sıkıştırma yapılmaz.
+    """
+    global _cached_bytes
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    signature = (st.st_mtime_ns, st.st_size)
+
+    with _lock:
+        entry = _documents.get(key)
+        if entry is not None and entry["signature"] == signature:
+            _documents.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["variants"]
+        _stats["misses"] += 1
+
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    variants: Dict[Optional[str], Tuple[bytes, str]] = {None: (data, make_etag(data))}
+    for encoding in _available_encodings():
+        variants[encoding] = (_load_variant(path, encoding, data), make_etag(data, encoding))
+    size = sum(len(body) for body, _ in variants.values())
+
+    with _lock:
+        old = _documents.pop(key, None)
+        if old is not None:
+            _cached_bytes -= old["bytes"]
+        if size <= HTML_DOCUMENT_CACHE_MAX_BYTES:
+            _documents[key] = {"signature": signature, "variants": variants, "bytes": size}
+            _cached_bytes += size
+        while _cached_bytes > HTML_DOCUMENT_CACHE_MAX_BYTES and _documents:
+            _, evicted = _documents.popitem(last=False)
+            _cached_bytes -= evicted["bytes"]
+            _stats["evictions"] += 1
+    return variants
+
+
+def prepare_html_response(
+    path: Path,
+    accept_encoding: Optional[str],
+    if_none_match: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """
+    Diskteki HTML dokümanı için {"status", "body", "headers"} üretir:
+    - Accept-Encoding'e göre br / gzip / sıkıştırılmamış temsil seçilir
+    - If-None-Match seçilen temsilin ETag'iyle eşleşirse 304 ve boş gövde döner
+    - Cache-Control: no-cache; tarayıcı her seferinde (ucuz) bir 304 ile doğrular,
+      böylece yeniden build edilen wiki hemen görünür
+    Dosya yoksa None döner.
+    """
+    variants = load_html_document(path)
+    if variants is None:
+        return None
+    encoding = negotiate_encoding(accept_encoding, [e for e in _available_encodings() if e in variants])
+    body, etag = variants[encoding]
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        with _lock:
+            _stats["not_modified"] += 1
+        return {"status": 304, "body": b"", "headers": headers}
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    with _lock:
+        _stats["bytes_sent"] += len(body)
+        label = encoding or "identity"
+        _responses_by_encoding[label] = _responses_by_encoding.get(label, 0) + 1
+    return {"status": 200, "body": body, "headers": headers}
+
+
+def get_html_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["responses_by_encoding"] = dict(_responses_by_encoding)
+        stats["documents"] = len(_documents)
+        stats["cached_bytes"] = _cached_bytes
+    stats["max_bytes"] = HTML_DOCUMENT_CACHE_MAX_BYTES
+    stats["brotli"] = brotli is not None
+    return stats
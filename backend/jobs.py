@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+
+from .config import (
+    GENERATION_JOB_WORKERS,
+    GENERATION_MAX_ACTIVE_JOBS,
+    GENERATION_JOB_RETENTION_SECONDS,
+)
+
+logger = logging.getLogger("deepwiki")
+
+# Pipeline aşamaları ve toplam ilerlemedeki ağırlıkları (yüzde)
+GENERATION_STAGE_WEIGHTS = {
+    "clone": 5,
+    "index": 25,
+    "outline": 5,
+    "pages": 60,
+    "html": 5,
+}
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueueFullError(RuntimeError):
+    """Node'daki aktif iş sayısı GENERATION_MAX_ACTIVE_JOBS'a ulaştı."""
+
+
+_job_pool = ThreadPoolExecutor(
+    max_workers=GENERATION_JOB_WORKERS,
+    thread_name_prefix="wiki-job",
+)
+_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _percent(job: Dict[str, Any]) -> float:
+    if job["status"] == "succeeded":
+        return 100.0
+    total = sum(GENERATION_STAGE_WEIGHTS.values())
+    done = 0.0
+    for stage in job["stages"]:
+        weight = GENERATION_STAGE_WEIGHTS.get(stage["name"], 0)
+        fraction = 1.0 if stage["finished_at"] is not None else stage["fraction"]
+        done += weight * fraction
+    return round(100.0 * done / total, 1)
+
+
+def _update_progress(job_id: str, stage_name: str, fraction: float) -> None:
+    """
+    Pipeline'dan gelen (aşama, oran) bildirimini işler. Yeni bir aşamaya
+    geçildiğinde önceki aşama kapatılır ve süresi kaydedilir.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        now = _now()
+        current = job["stages"][-1] if job["stages"] else None
+        if current is None or current["name"] != stage_name:
+            if current is not None and current["finished_at"] is None:
+                current["finished_at"] = now
+                current["seconds"] = round(now - current["started_at"], 3)
+            current = {
+                "name": stage_name,
+                "started_at": now,
+                "finished_at": None,
+                "seconds": None,
+                "fraction": 0.0,
+            }
+            job["stages"].append(current)
+        current["fraction"] = max(0.0, min(float(fraction), 1.0))
+        job["stage"] = stage_name
+
+
+def _finish(job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        now = _now()
+        if job["stages"] and job["stages"][-1]["finished_at"] is None:
+            last = job["stages"][-1]
+            last["finished_at"] = now
+            last["seconds"] = round(now - last["started_at"], 3)
+        job["status"] = status
+        job["finished_at"] = now
+        job["result"] = result
+        job["error"] = error
+
+
+def _run_job(job_id: str, run: Callable[[Callable[[str, float], None]], Any]) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = "running"
+        job["started_at"] = _now()
+    logger.info("Job started job_id=%s kind=%s", job_id, job["kind"])
+    try:
+        result = run(lambda stage, fraction=0.0: _update_progress(job_id, stage, fraction))
+    except Exception as e:
+        logger.exception("Job failed job_id=%s", job_id)
+        _finish(job_id, "failed", error=str(e))
+        return
+    _finish(job_id, "succeeded", result=result)
+    logger.info("Job finished job_id=%s", job_id)
+
+
+def _purge_expired() -> None:
+    # _lock tutulurken çağrılır
+    cutoff = _now() - GENERATION_JOB_RETENTION_SECONDS
+    expired = [
+        job_id
+        for job_id, job in _jobs.items()
+        if job["finished_at"] is not None and job["finished_at"] < cutoff
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def submit_job(
+    kind: str,
+    run: Callable[[Callable[[str, float], None]], Any],
+    params: Optional[Dict[str, Any]] = None,
+    dedup_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    run(progress) fonksiyonunu arka planda çalıştıracak bir iş oluşturur.
+    Aktif iş sayısı sınırdaysa JobQueueFullError yükselir.
+
+    params: durum sorgusunda gösterilecek, gizli bilgi içermeyen istek özeti.
+    dedup_key: aynı key'le kuyrukta / çalışan bir iş varsa yeni iş açılmaz,
+    o işin durumu döner.
+    """
+    with _lock:
+        _purge_expired()
+        if dedup_key is not None:
+            for job in _jobs.values():
+                if job["dedup_key"] == dedup_key and job["status"] in ACTIVE_STATUSES:
+                    logger.info("Coalescing job submission into job_id=%s key=%s", job["job_id"], dedup_key)
+                    return _job_status(job)
+        active = sum(1 for j in _jobs.values() if j["status"] in ACTIVE_STATUSES)
+        if active >= GENERATION_MAX_ACTIVE_JOBS:
+            raise JobQueueFullError(
+                f"Too many active jobs on this node ({active}/{GENERATION_MAX_ACTIVE_JOBS})"
+            )
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "params": params or {},
+            "dedup_key": dedup_key,
+            "status": "queued",
+            "stage": None,
+            "stages": [],
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        job = _job_status(_jobs[job_id])
+
+    _job_pool.submit(_run_job, job_id, run)
+    return job
+
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    # _lock tutulurken çağrılır; sonuç (HTML vb.) durum cevabına girmez
+    status = {k: v for k, v in job.items() if k != "result"}
+    status["stages"] = [
+        {k: v for k, v in stage.items() if k != "fraction"} for stage in job["stages"]
+    ]
+    status["percent"] = _percent(job)
+    if job["stages"] and job["finished_at"] is None:
+        status["stage_percent"] = round(100.0 * job["stages"][-1]["fraction"], 1)
+    status["has_result"] = job["result"] is not None
+    return status
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        job = _jobs.get(job_id)
+        return _job_status(job) if job is not None else None
+
+
+def get_job_result(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    {"status", "result", "error"}; iş yoksa (veya süresi dolup silindiyse) None.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {"status": job["status"], "result": job["result"], "error": job["error"]}
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    with _lock:
+        _purge_expired()
+        jobs = [_job_status(j) for j in _jobs.values()]
+    return sorted(jobs, key=lambda j: j["created_at"], reverse=True)
+
+
+def get_job_stats() -> Dict[str, Any]:
+    with _lock:
+        counts: Dict[str, int] = {}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return {
+        "workers": GENERATION_JOB_WORKERS,
+        "max_active_jobs": GENERATION_MAX_ACTIVE_JOBS,
+        "by_status": counts,
+    }
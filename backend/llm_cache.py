@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+
+from .config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_DIR,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_BYTES,
+)
+
+logger = logging.getLogger("deepwiki")
+
+# Her bu kadar yazmada bir boyut kontrolü / eviction yapılır
+_EVICT_EVERY_N_WRITES = 50
+
+_lock = threading.Lock()
+_writes_since_evict = 0
+_stats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "expired": 0,
+    "evictions": 0,
+}
+
+
+def _incr(key: str, n: int = 1) -> None:
+    with _lock:
+        _stats[key] += n
+
+
+def _normalize_content(content: Any) -> Any:
+    if not isinstance(content, str):
+        return content
+    lines = content.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    endpoint: Optional[str] = None,
+) -> str:
+    """
+    (endpoint, model, normalize edilmiş mesajlar, max_tokens) için içerik adresli anahtar.
+    endpoint "provider|base_url" biçimindedir; aynı model adını sunan farklı
+    endpoint'lerin cevapları birbirine karışmaz.
+    Satır sonu boşlukları ve baş/son boşluklar anahtarı etkilemez.
+    """
+    normalized = [
+        {"role": m.get("role"), "content": _normalize_content(m.get("content"))}
+        for m in messages
+    ]
+    key_data: Dict[str, Any] = {"model": model, "messages": normalized}
+    if endpoint is not None:
+        key_data["endpoint"] = endpoint
+    if max_tokens is not None:
+        # Kısaltılmış bir cevap, limitsiz istek için cache'ten dönmemeli
+        key_data["max_tokens"] = max_tokens
+    payload = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return LLM_CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def get_cached_completion(key: str) -> Optional[str]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    path = _entry_path(key)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        _incr("misses")
+        return None
+
+    if time.time() - data.get("created_at", 0) > LLM_CACHE_TTL_SECONDS:
+        _incr("expired")
+        _incr("misses")
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return None
+
+    # LRU eviction için son erişim zamanını mtime olarak güncelliyoruz
+    try:
+        os.utime(path, None)
+    except FileNotFoundError:
+        pass
+    _incr("hits")
+    return data.get("response")
+
+
+def put_cached_completion(key: str, model: str, response: str) -> None:
+    """
+    Cevabı atomik olarak yazar (geçici dosya + os.replace); aynı anda çalışan
+    worker'lar yarım yazılmış bir kaydı asla okumaz.
+    """
+    global _writes_since_evict
+    if not LLM_CACHE_ENABLED or response is None:
+        return
+    path = _entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.parent / f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    tmp_path.write_text(
+        json.dumps(
+            {"model": model, "created_at": time.time(), "response": response},
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+    _incr("writes")
+
+    with _lock:
+        _writes_since_evict += 1
+        run_evict = _writes_since_evict >= _EVICT_EVERY_N_WRITES
+        if run_evict:
+            _writes_since_evict = 0
+    if run_evict:
+        evict_llm_cache()
+
+
+def evict_llm_cache(max_bytes: int = LLM_CACHE_MAX_BYTES) -> int:
+    """
+    Süresi dolan kayıtları ve toplam boyut max_bytes'ı aşıyorsa en uzun süredir
+    erişilmeyen kayıtları siler. Silinen kayıt sayısını döner.
+    """
+    if not LLM_CACHE_DIR.exists():
+        return 0
+
+    now = time.time()
+    entries = []
+    for path in LLM_CACHE_DIR.glob("*/*.json"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    # En eski erişilenden başlayarak
+    for mtime, size, path in sorted(entries, key=lambda e: e[0]):
+        expired = now - mtime > LLM_CACHE_TTL_SECONDS
+        if not expired and total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        _incr("evictions", removed)
+        logger.info("LLM cache eviction removed=%d remaining_bytes=%d", removed, total)
+    return removed
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["enabled"] = LLM_CACHE_ENABLED
+    return stats
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Any
+
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+from .models import LLMConfig
+from .config import (
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_CONNECT_TIMEOUT,
+    LLM_HTTP_READ_TIMEOUT,
+    LLM_CLIENT_CACHE_SIZE,
+    LLM_CLIENT_CLOSE_GRACE_SECONDS,
+)
+
+logger = logging.getLogger("deepwiki")
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# openai paketinin kullandığı HTTP kütüphanesinin Limits sınıfı;
+# doğrudan import etmek yerine openai'nin varsayılanından alıyoruz.
+_Limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+_lock = threading.Lock()
+# LRU sırasında tutulur: en son kullanılan sonda
+_clients: "OrderedDict[Tuple[str, str, str], OpenAI]" = OrderedDict()
+_async_clients: "OrderedDict[Tuple[str, str, str], AsyncOpenAI]" = OrderedDict()
+# Registry'den çıkarılıp grace süresini bekleyen client'lar: timer/görev -> client.
+# Kapanışta (close_all_clients / aclose_all_async_clients) beklemeden kapatılırlar.
+_pending_close: Dict[Any, Any] = {}
+_stats: Dict[str, int] = {
+    "clients_created": 0,
+    "client_reuses": 0,
+    "clients_evicted": 0,
+    "requests": 0,
+    "connections_opened": 0,
+    "tls_handshakes": 0,
+}
+
+
+def _incr(key: str, n: int = 1) -> None:
+    with _lock:
+        _stats[key] += n
+
+
+def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    # Transport katmanının trace olaylarından yeni bağlantı / TLS handshake sayılır
+    if event_name == "connection.connect_tcp.complete":
+        _incr("connections_opened")
+    elif event_name == "connection.start_tls.complete":
+        _incr("tls_handshakes")
+
+
+def _on_request(request) -> None:
+    _incr("requests")
+    request.extensions["trace"] = _trace
+
+
+# Async transport trace ve event hook'ları coroutine olmak zorunda
+async def _atrace(event_name: str, info: Dict[str, Any]) -> None:
+    _trace(event_name, info)
+
+
+async def _aon_request(request) -> None:
+    _incr("requests")
+    request.extensions["trace"] = _atrace
+
+
+def _http_client_kwargs() -> Dict[str, Any]:
+    return {
+        "limits": _Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": openai.Timeout(LLM_HTTP_READ_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+    }
+
+
+def _close_client_later(client: OpenAI) -> None:
+    def _close() -> None:
+        with _lock:
+            _pending_close.pop(timer, None)
+        try:
+            client.close()
+        except Exception:
+            logger.warning("Failed to close evicted LLM client", exc_info=True)
+
+    timer = threading.Timer(LLM_CLIENT_CLOSE_GRACE_SECONDS, _close)
+    timer.daemon = True
+    with _lock:
+        _pending_close[timer] = client
+    timer.start()
+
+
+def _aclose_client_later(client: AsyncOpenAI) -> None:
+    # Async client'lar uygulamanın event loop'unda oluşturulur ve orada kapatılmalı
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning("Evicted async LLM client outside an event loop; not closing it")
+        return
+
+    async def _close() -> None:
+        await asyncio.sleep(LLM_CLIENT_CLOSE_GRACE_SECONDS)
+        with _lock:
+            _pending_close.pop(task, None)
+        try:
+            await client.close()
+        except Exception:
+            logger.warning("Failed to close evicted async LLM client", exc_info=True)
+
+    task = loop.create_task(_close())
+    with _lock:
+        _pending_close[task] = client
+
+
+def _evict_lru(registry: "OrderedDict[Tuple[str, str, str], Any]") -> list:
+    # _lock tutulurken çağrılır; çıkarılan client'ları döner
+    evicted = []
+    while len(registry) > LLM_CLIENT_CACHE_SIZE:
+        key, client = registry.popitem(last=False)
+        evicted.append(client)
+        _stats["clients_evicted"] += 1
+        logger.info("Evicted pooled LLM client provider=%s base_url=%s", key[0], key[1])
+    return evicted
+
+
+def _client_key(config: LLMConfig) -> Tuple[str, str, str]:
+    base_url = config.base_url or DEFAULT_OPENAI_BASE_URL
+    # API key'i bellekte anahtar olarak düz tutmamak için hash'liyoruz
+    key_hash = hashlib.sha256(config.api_key.encode("utf-8")).hexdigest()
+    return config.provider, base_url, key_hash
+
+
+def get_openai_client(config: LLMConfig) -> OpenAI:
+    """
+    (provider, base_url, api_key hash) başına tek bir OpenAI client döner.
+    Client'lar keep-alive bağlantı havuzunu paylaşır; böylece her sayfa/istek
+    için yeniden TCP + TLS kurulumu yapılmaz. Registry LLM_CLIENT_CACHE_SIZE
+    ile sınırlı bir LRU'dur; çıkarılan client'lar grace süresi sonunda kapatılır.
+    """
+    if config.provider != "openai":
+        raise NotImplementedError(f"Provider not supported yet: {config.provider}")
+
+    key = _client_key(config)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            _stats["client_reuses"] += 1
+            return client
+
+        http_client = openai.DefaultHttpxClient(
+            event_hooks={"request": [_on_request]},
+            **_http_client_kwargs(),
+        )
+        client = OpenAI(
+            base_url=key[1],
+            api_key=config.api_key,
+            http_client=http_client,
+        )
+        _clients[key] = client
+        _stats["clients_created"] += 1
+        logger.info("Created pooled LLM client provider=%s base_url=%s", key[0], key[1])
+        evicted = _evict_lru(_clients)
+    for old in evicted:
+        _close_client_later(old)
+    return client
+
+
+def get_async_openai_client(config: LLMConfig) -> AsyncOpenAI:
+    """
+    get_openai_client'ın asyncio sürümü. Bağlantı havuzu event loop'a bağlı
+    olduğundan bu client'lar yalnızca uygulamanın (uvicorn) event loop'unda kullanılmalı.
+    """
+    if config.provider != "openai":
+        raise NotImplementedError(f"Provider not supported yet: {config.provider}")
+
+    key = _client_key(config)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is not None:
+            _async_clients.move_to_end(key)
+            _stats["client_reuses"] += 1
+            return client
+
+        http_client = openai.DefaultAsyncHttpxClient(
+            event_hooks={"request": [_aon_request]},
+            **_http_client_kwargs(),
+        )
+        client = AsyncOpenAI(
+            base_url=key[1],
+            api_key=config.api_key,
+            http_client=http_client,
+        )
+        _async_clients[key] = client
+        _stats["clients_created"] += 1
+        logger.info("Created pooled async LLM client provider=%s base_url=%s", key[0], key[1])
+        evicted = _evict_lru(_async_clients)
+    for old in evicted:
+        _aclose_client_later(old)
+    return client
+
+
+def get_client_pool_stats() -> Dict[str, Any]:
+    """
+    Client registry ve bağlantı yeniden kullanım metrikleri.
+    """
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["active_clients"] = len(_clients) + len(_async_clients)
+    requests = stats["requests"]
+    stats["connection_reuse_ratio"] = (
+        round(1 - stats["connections_opened"] / requests, 4) if requests else 0.0
+    )
+    return stats
+
+
+def close_all_clients() -> None:
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        for timer in [t for t in _pending_close if isinstance(t, threading.Timer)]:
+            timer.cancel()
+            clients.append(_pending_close.pop(timer))
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            logger.warning("Failed to close LLM client", exc_info=True)
+
+
+async def aclose_all_async_clients() -> None:
+    with _lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+        for task in [t for t in _pending_close if isinstance(t, asyncio.Task)]:
+            task.cancel()
+            clients.append(_pending_close.pop(task))
+    for client in clients:
+        try:
+            await client.close()
+        except Exception:
+            logger.warning("Failed to close async LLM client", exc_info=True)
@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Awaitable, Callable, Deque, Dict, Any, Optional, Tuple, TypeVar
+
+import numpy as np
+import openai
+
+from .config import (
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_CALL_TIMEOUT_SECONDS,
+    LLM_CALL_MAX_RETRIES,
+    LLM_CALL_RETRY_BACKOFF_SECONDS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_LATENCY_WINDOW,
+)
+
+logger = logging.getLogger("deepwiki")
+
+T = TypeVar("T")
+
+# Tekrar denemeye değer (geçici) hatalar; 4xx gibi kalıcı hatalar hemen yükselir
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # APITimeoutError dahil
+    openai.RateLimitError,
+    openai.InternalServerError,
+    TimeoutError,
+)
+
+# Birincil ve hedge istekleri bu pool'da çalışır; çağıran thread sadece bekler.
+# Kaybeden istek iptal edilemez, kendi timeout'u dolana kadar arka planda biter.
+_call_pool = ThreadPoolExecutor(
+    max_workers=LLM_HTTP_MAX_CONNECTIONS,
+    thread_name_prefix="llm-call",
+)
+
+_lock = threading.Lock()
+# latency_key (ör. "base_url|model") -> son başarılı çağrı süreleri
+_latencies: Dict[str, Deque[float]] = {}
+_stats: Dict[str, int] = {
+    "calls": 0,
+    "retries": 0,
+    "timeouts": 0,
+    "failures": 0,
+    "hedges_fired": 0,
+    "hedge_wins": 0,
+}
+
+
+def _incr(key: str, n: int = 1) -> None:
+    with _lock:
+        _stats[key] += n
+
+
+def record_latency(latency_key: str, seconds: float) -> None:
+    with _lock:
+        window = _latencies.get(latency_key)
+        if window is None:
+            window = deque(maxlen=LLM_LATENCY_WINDOW)
+            _latencies[latency_key] = window
+        window.append(seconds)
+
+
+def hedge_delay(latency_key: str) -> float:
+    """
+    Hedge isteği atılmadan önce beklenecek süre: son çağrıların
+    LLM_HEDGE_PERCENTILE yüzdelik gecikmesi. Yeterli örnek yoksa
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS kullanılır.
+    """
+    with _lock:
+        samples = list(_latencies.get(latency_key, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        delay = LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    else:
+        delay = float(np.percentile(samples, LLM_HEDGE_PERCENTILE))
+    return max(delay, LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+def _hedged_attempt(
+    latency_key: str,
+    primary: Callable[[float], T],
+    hedge: Optional[Callable[[float], T]],
+    deadline: float,
+) -> Tuple[T, str]:
+    started = time.monotonic()
+    remaining = deadline - started
+    if remaining <= 0:
+        raise TimeoutError("LLM call deadline exceeded before the request was sent")
+
+    def _on_primary_done(fut: Future) -> None:
+        # Hedge kazansa bile birincilin süresi p95 hesabına girer;
+        # yoksa dağılım yalnızca hızlı cevaplardan oluşurdu
+        if not fut.cancelled() and fut.exception() is None:
+            record_latency(latency_key, time.monotonic() - started)
+
+    primary_future = _call_pool.submit(primary, remaining)
+    primary_future.add_done_callback(_on_primary_done)
+    roles: Dict[Future, str] = {primary_future: "primary"}
+
+    if hedge is not None and LLM_HEDGE_ENABLED:
+        delay = hedge_delay(latency_key)
+        done, _ = wait([primary_future], timeout=min(delay, remaining))
+        remaining = deadline - time.monotonic()
+        if not done and remaining > 0:
+            _incr("hedges_fired")
+            logger.info("Hedging LLM call key=%s after %.2fs", latency_key, delay)
+            roles[_call_pool.submit(hedge, remaining)] = "hedge"
+
+    pending = set(roles)
+    error: Optional[BaseException] = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            try:
+                result = fut.result()
+            except Exception as e:
+                error = e
+                continue
+            if roles[fut] == "hedge":
+                _incr("hedge_wins")
+            return result, roles[fut]
+
+    if pending:
+        _incr("timeouts")
+        raise TimeoutError(f"LLM call exceeded deadline (key={latency_key})")
+    raise error
+
+
+def call_llm(
+    latency_key: str,
+    primary: Callable[[float], T],
+    hedge: Optional[Callable[[float], T]] = None,
+    timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+    max_retries: int = LLM_CALL_MAX_RETRIES,
+) -> T:
+    """
+    Bir LLM çağrısını deadline, tekrar deneme ve hedge ile çalıştırır.
+
+    primary / hedge: kalan süreyi (saniye) alıp isteği yapan fonksiyonlar.
+    hedge verilirse, birincil istek hedge_delay(latency_key) içinde bitmezse
+    hedge de başlatılır ve ilk başarılı cevap döner.
+    Geçici hatalarda üstel bekleme ile en fazla max_retries kez tekrar denenir;
+    toplam süre timeout'u aşarsa TimeoutError yükselir.
+    """
+    return call_llm_with_winner(latency_key, primary, hedge, timeout, max_retries)[0]
+
+
+def call_llm_with_winner(
+    latency_key: str,
+    primary: Callable[[float], T],
+    hedge: Optional[Callable[[float], T]] = None,
+    timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+    max_retries: int = LLM_CALL_MAX_RETRIES,
+) -> Tuple[T, str]:
+    """
+    call_llm ile aynı; cevapla birlikte kazanan isteği ("primary" / "hedge") döner.
+    Hedge farklı bir modele gidiyorsa cevap o modelin adıyla cache'lenmelidir.
+    """
+    _incr("calls")
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        try:
+            return _hedged_attempt(latency_key, primary, hedge, deadline)
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            backoff = LLM_CALL_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+            if attempt > max_retries or deadline - time.monotonic() <= backoff:
+                _incr("failures")
+                raise
+            _incr("retries")
+            logger.warning(
+                "LLM call failed key=%s (attempt %d/%d): %s; retrying in %.1fs",
+                latency_key,
+                attempt,
+                max_retries + 1,
+                e,
+                backoff,
+            )
+            time.sleep(backoff)
+        except Exception:
+            _incr("failures")
+            raise
+
+
+async def _ahedged_attempt(
+    latency_key: str,
+    primary: Callable[[float], Awaitable[T]],
+    hedge: Optional[Callable[[float], Awaitable[T]]],
+    deadline: float,
+) -> Tuple[T, str]:
+    started = time.monotonic()
+    remaining = deadline - started
+    if remaining <= 0:
+        raise TimeoutError("LLM call deadline exceeded before the request was sent")
+
+    def _on_primary_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is None:
+            record_latency(latency_key, time.monotonic() - started)
+
+    primary_task = asyncio.ensure_future(primary(remaining))
+    primary_task.add_done_callback(_on_primary_done)
+    roles: Dict[asyncio.Future, str] = {primary_task: "primary"}
+
+    try:
+        if hedge is not None and LLM_HEDGE_ENABLED:
+            delay = hedge_delay(latency_key)
+            done, _ = await asyncio.wait({primary_task}, timeout=min(delay, remaining))
+            remaining = deadline - time.monotonic()
+            if not done and remaining > 0:
+                _incr("hedges_fired")
+                logger.info("Hedging LLM call key=%s after %.2fs", latency_key, delay)
+                roles[asyncio.ensure_future(hedge(remaining))] = "hedge"
+
+        pending = set(roles)
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                if roles[task] == "hedge":
+                    _incr("hedge_wins")
+                return task.result(), roles[task]
+
+        if pending:
+            _incr("timeouts")
+            raise TimeoutError(f"LLM call exceeded deadline (key={latency_key})")
+        raise error
+    finally:
+        # Thread'li sürümün aksine kaybeden istek iptal edilir ve bağlantı hemen serbest kalır.
+        # İptal edilen birincilin geçen süresi alt sınır olarak kaydedilir; yoksa
+        # p95 yalnızca hızlı cevaplardan hesaplanıp hedge gecikmesi sürekli küçülürdü.
+        if not primary_task.done():
+            record_latency(latency_key, time.monotonic() - started)
+        for task in roles:
+            if not task.done():
+                task.cancel()
+
+
+async def acall_llm(
+    latency_key: str,
+    primary: Callable[[float], Awaitable[T]],
+    hedge: Optional[Callable[[float], Awaitable[T]]] = None,
+    timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+    max_retries: int = LLM_CALL_MAX_RETRIES,
+) -> T:
+    """
+    call_llm'in asyncio sürümü; primary / hedge coroutine döndüren fonksiyonlardır.
+    Sayaçlar ve gecikme istatistikleri senkron yol ile ortaktır.
+    """
+    return (await acall_llm_with_winner(latency_key, primary, hedge, timeout, max_retries))[0]
+
+
+async def acall_llm_with_winner(
+    latency_key: str,
+    primary: Callable[[float], Awaitable[T]],
+    hedge: Optional[Callable[[float], Awaitable[T]]] = None,
+    timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+    max_retries: int = LLM_CALL_MAX_RETRIES,
+) -> Tuple[T, str]:
+    """
+    call_llm_with_winner'ın asyncio sürümü.
+    """
+    _incr("calls")
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        try:
+            return await _ahedged_attempt(latency_key, primary, hedge, deadline)
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            backoff = LLM_CALL_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+            if attempt > max_retries or deadline - time.monotonic() <= backoff:
+                _incr("failures")
+                raise
+            _incr("retries")
+            logger.warning(
+                "LLM call failed key=%s (attempt %d/%d): %s; retrying in %.1fs",
+                latency_key,
+                attempt,
+                max_retries + 1,
+                e,
+                backoff,
+            )
+            await asyncio.sleep(backoff)
+        except Exception:
+            _incr("failures")
+            raise
+
+
+def get_llm_call_stats() -> Dict[str, Any]:
+    """
+    Tekrar deneme / timeout / hedge sayaçları ve endpoint başına güncel hedge gecikmesi.
+    hedge_rate, hedge'in yol açtığı ek istek maliyetinin oranıdır.
+    """
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        keys = list(_latencies)
+    stats["hedge_rate"] = round(stats["hedges_fired"] / stats["calls"], 4) if stats["calls"] else 0.0
+    stats["hedge_delay_seconds"] = {key: round(hedge_delay(key), 3) for key in keys}
+    return stats
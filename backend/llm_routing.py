@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from typing import Dict, Any, Optional
+
+from .config import LLM_STAGE_ROUTES
+from .models import LLMConfig
+
+_lock = threading.Lock()
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_async_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def resolve_stage(llm: LLMConfig, stage: Optional[str]) -> Dict[str, Any]:
+    """
+    Aşama için kullanılacak {"chat_model", "max_tokens", "concurrency"} değerleri.
+    Öncelik: istekteki llm.stage_routes > LLM_STAGE_ROUTES > llm.chat_model.
+    stage=None ise yönlendirme yapılmaz.
+    """
+    defaults = LLM_STAGE_ROUTES.get(stage, {}) if stage else {}
+    override = (llm.stage_routes or {}).get(stage) if stage else None
+
+    chat_model = (override and override.chat_model) or defaults.get("chat_model") or llm.chat_model
+    max_tokens = (override and override.max_tokens) or defaults.get("max_tokens")
+    return {
+        "chat_model": chat_model,
+        "max_tokens": max_tokens,
+        "concurrency": defaults.get("concurrency"),
+    }
+
+
+def stage_semaphore(stage: Optional[str]) -> Optional[threading.BoundedSemaphore]:
+    """
+    Aşamanın process genelindeki eşzamanlılık sınırı; sınır tanımlı değilse None.
+    """
+    if not stage:
+        return None
+    limit = LLM_STAGE_ROUTES.get(stage, {}).get("concurrency")
+    if not limit:
+        return None
+    with _lock:
+        sem = _semaphores.get(stage)
+        if sem is None:
+            sem = threading.BoundedSemaphore(limit)
+            _semaphores[stage] = sem
+        return sem
+
+
+def stage_async_semaphore(stage: Optional[str]) -> Optional[asyncio.Semaphore]:
+    """
+    stage_semaphore'un event loop tarafı (AsyncChatClient için). Async yol,
+    thread'leri bloklamamak için aynı büyüklükte ayrı bir sınır kullanır.
+    """
+    if not stage:
+        return None
+    limit = LLM_STAGE_ROUTES.get(stage, {}).get("concurrency")
+    if not limit:
+        return None
+    with _lock:
+        sem = _async_semaphores.get(stage)
+        if sem is None:
+            sem = asyncio.Semaphore(limit)
+            _async_semaphores[stage] = sem
+        return sem
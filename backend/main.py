@@ -1,42 +1,72 @@
 # backend/main.py
 
 from pathlib import Path
+import asyncio
+import hashlib
 import json
 import logging
-import shutil
+import uuid
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 from fastapi import FastAPI, HTTPException, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from .models import (
     GenerateWikiRequest,
     GenerateWikiResponse,
     GenerateWikiEphemeralResponse,
+    JobStatusResponse,
     GetWikiPageRequest,
     GetWikiPageResponse,
     AskRequest,
     AskResponse,
+    MultiRepoAskRequest,
+    MultiRepoAskResponse,
     WikiSection,
     WikiPage,
     DeepResearchRequest,
     DeepResearchResponse,
     DeepResearchIteration,
+    WikiBundleManifest,
 )
-from .repo_analyzer import clone_or_update_repo, clone_repo_temp, normalize_repo_id
+from .repo_analyzer import normalize_repo_id
 from .wiki_generator import (
-    prepare_repo_index,
-    generate_wiki_outline,
     generate_wiki_page,
-    build_full_wiki_html,
-    build_in_memory_index,
-    generate_wiki_outline_ephemeral,
-    generate_wiki_page_ephemeral,
-    build_full_wiki_html_ephemeral,
+    run_generation_pipeline,
+    run_generation_pipeline_ephemeral,
+    iter_generation_pipeline_ephemeral,
+    render_wiki_shell,
+    render_section_fragment,
+    iter_full_wiki_html,
+    WIKI_RENDERER_VERSION,
+)
+from .rag_qa import ask_repo, ask_repos, stream_ask_repo
+from .config import BUNDLE_DIR, BUNDLE_MAX_UPLOAD_BYTES, WIKI_DIR, WIKI_FRAGMENT_MAX_AGE_SECONDS
+from .vector_store import acquire_index, index_exists, start_snapshot_gc
+from .llm_clients import get_client_pool_stats, close_all_clients, aclose_all_async_clients
+from .executors import shutdown_executors
+from .llm_cache import get_llm_cache_stats
+from .semantic_cache import get_semantic_cache_stats
+from .llm_resilience import get_llm_call_stats
+from .single_flight import get_single_flight_stats
+from .ephemeral_wikis import get_ephemeral_wiki, get_ephemeral_wiki_stats
+from .html_cache import etag_matches, get_html_cache_stats, prepare_html_response
+from .render_cache import get_render_cache_stats
+from .architecture_cache import get_architecture_cache_stats
+from .conversations import get_session_history, get_conversation_stats
+from .wiki_bundle import WikiBundleError, export_wiki_bundle, import_wiki_bundle
+from .jobs import (
+    JobQueueFullError,
+    submit_job,
+    get_job,
+    get_job_result,
+    list_jobs,
+    get_job_stats,
 )
-from .rag_qa import ask_repo
-from .config import WIKI_DIR
-from .vector_store import FaissIndex, get_index_paths
-from .deep_research import run_deep_research
+from .deep_research import run_deep_research, iter_deep_research
 
 # Logging
 logger = logging.getLogger("deepwiki")
@@ -58,6 +88,81 @@ app.add_middleware(
 )
 
 
+def _sse_event(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _sse_response(
+    events: Union[Iterator[Dict[str, Any]], AsyncIterator[Dict[str, Any]]],
+    log_context: str,
+) -> StreamingResponse:
+    """
+    {"event": ..., "data": ...} olay akışını server-sent events olarak döner.
+    Async iterator'lar event loop'ta, senkron olanlar threadpool'da tüketilir.
+    Akış sırasında hata olursa "error" olayı gönderilip akış kapatılır.
+    """
+
+    def _encode() -> Iterator[str]:
+        try:
+            for ev in events:
+                yield _sse_event(ev["event"], ev["data"])
+        except Exception as e:
+            logger.exception("Error while streaming %s", log_context)
+            yield _sse_event("error", {"detail": str(e)})
+
+    async def _aencode() -> AsyncIterator[str]:
+        try:
+            async for ev in events:
+                yield _sse_event(ev["event"], ev["data"])
+        except Exception as e:
+            logger.exception("Error while streaming %s", log_context)
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        _aencode() if hasattr(events, "__aiter__") else _encode(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx ingress'in cevabı buffer'lamaması için
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.on_event("startup")
+def _start_background_tasks():
+    # Eski FAISS snapshot versiyonlarını periyodik olarak temizle
+    start_snapshot_gc()
+
+
+@app.on_event("shutdown")
+async def _close_llm_clients():
+    close_all_clients()
+    await aclose_all_async_clients()
+    shutdown_executors()
+
+
+@app.get("/api/metrics")
+def metrics():
+    """
+    Süreç içi performans metrikleri (LLM client havuzu vb.).
+    """
+    return {
+        "llm_clients": get_client_pool_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "semantic_cache": get_semantic_cache_stats(),
+        "llm_calls": get_llm_call_stats(),
+        "jobs": get_job_stats(),
+        "single_flight": get_single_flight_stats(),
+        "ephemeral_wikis": get_ephemeral_wiki_stats(),
+        "html_cache": get_html_cache_stats(),
+        "render_cache": get_render_cache_stats(),
+        "architecture_cache": get_architecture_cache_stats(),
+        "conversations": get_conversation_stats(),
+    }
+
+
 @app.post("/api/generate", response_model=GenerateWikiResponse)
 def generate_wiki(req: GenerateWikiRequest, request: Request):
     """
@@ -69,23 +174,8 @@ def generate_wiki(req: GenerateWikiRequest, request: Request):
     """
     logger.info("POST /api/generate repo_url=%s client=%s", req.repo_url, request.client)
     try:
-        repo_path = clone_or_update_repo(req.repo_url, git_token=req.git_token)
-        repo_id = normalize_repo_id(req.repo_url)
-
-        # Embedding + FAISS index
-        prepare_repo_index(repo_id, repo_path, req.llm)
-
-        # Outline
-        sections = generate_wiki_outline(repo_id, repo_path, req.llm)
-
-        # Full HTML wiki (tek sefer)
-        build_full_wiki_html(repo_id, sections, req.llm)
-
-        logger.info("Wiki generated successfully for repo_id=%s", repo_id)
-        return GenerateWikiResponse(
-            repo_id=repo_id,
-            sections=sections,
-        )
+        result = run_generation_pipeline(req.repo_url, req.llm, git_token=req.git_token)
+        return GenerateWikiResponse(**result)
     except Exception as e:
         logger.exception("Error in /api/generate for repo_url=%s", req.repo_url)
         raise HTTPException(status_code=500, detail=str(e))
@@ -103,40 +193,107 @@ def generate_wiki_ephemeral(req: GenerateWikiRequest, request: Request):
     - Diskte kalıcı hiçbir veri bırakmaz.
     """
     logger.info("POST /api/generate_ephemeral repo_url=%s client=%s", req.repo_url, request.client)
-    tmp_repo = None
     try:
-        tmp_repo = clone_repo_temp(req.repo_url, git_token=req.git_token)
-        repo_id = normalize_repo_id(req.repo_url)
-
-        # In-memory index
-        index, metadatas = build_in_memory_index(tmp_repo, req.llm)
+        result = run_generation_pipeline_ephemeral(req.repo_url, req.llm, git_token=req.git_token)
+        return GenerateWikiEphemeralResponse(**result)
+    except Exception as e:
+        logger.exception("Error in /api/generate_ephemeral for repo_url=%s", req.repo_url)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Outline (cache'siz)
-        sections = generate_wiki_outline_ephemeral(tmp_repo, req.llm)
 
-        # Tüm section'lar için markdown üret
-        pages_md: list[str] = []
-        for section in sections:
-            page = generate_wiki_page_ephemeral(section, req.llm, index, metadatas)
-            pages_md.append(page.markdown)
+@app.post("/api/generate_ephemeral/stream")
+def generate_wiki_ephemeral_stream(req: GenerateWikiRequest, request: Request):
+    """
+    /api/generate_ephemeral'ın SSE sürümü. Aşama başlarında "progress",
+    outline hazır olunca layout + sidebar'ı taşıyan "shell", her sayfa
+    bittiği anda o sayfanın HTML'ini taşıyan "section" ve en sonda "done"
+    olayı gönderilir.
+    """
+    logger.info("POST /api/generate_ephemeral/stream repo_url=%s client=%s", req.repo_url, request.client)
+    events = iter_generation_pipeline_ephemeral(req.repo_url, req.llm, git_token=req.git_token)
+    return _sse_response(events, f"/api/generate_ephemeral/stream repo_url={req.repo_url}")
 
-        html = build_full_wiki_html_ephemeral(repo_id, sections, pages_md)
 
-        logger.info("Ephemeral wiki generated successfully for repo_id=%s", repo_id)
-        return GenerateWikiEphemeralResponse(
-            repo_id=repo_id,
-            sections=sections,
-            html=html,
+def _submit_generation_job(
+    kind: str,
+    req: GenerateWikiRequest,
+    pipeline,
+    dedup_key: Optional[str] = None,
+) -> JobStatusResponse:
+    try:
+        job = submit_job(
+            kind,
+            lambda progress: pipeline(req.repo_url, req.llm, git_token=req.git_token, progress=progress),
+            # API key / git token job durumunda görünmez
+            params={"repo_url": req.repo_url, "chat_model": req.llm.chat_model},
+            dedup_key=dedup_key,
         )
-    except Exception as e:
-        logger.exception("Error in /api/generate_ephemeral for repo_url=%s", req.repo_url)
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if tmp_repo and tmp_repo.exists():
-            try:
-                shutil.rmtree(tmp_repo, ignore_errors=True)
-            except Exception:
-                logger.warning("Failed to cleanup temp repo at %s", tmp_repo)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JobStatusResponse(**job)
+
+
+@app.post("/api/jobs/generate", response_model=JobStatusResponse, status_code=202)
+async def submit_generate_job(req: GenerateWikiRequest, request: Request):
+    """
+    /api/generate'in asenkron sürümü: işi kuyruğa alır ve hemen job_id döner.
+    Durum /api/jobs/{job_id}, sonuç /api/jobs/{job_id}/result ile alınır.
+    """
+    logger.info("POST /api/jobs/generate repo_url=%s client=%s", req.repo_url, request.client)
+    # Aynı repo için aktif bir iş varsa yeni iş açılmaz, o işin durumu döner
+    dedup_key = f"generate:{normalize_repo_id(req.repo_url)}"
+    return _submit_generation_job("generate", req, run_generation_pipeline, dedup_key=dedup_key)
+
+
+@app.post("/api/jobs/generate_ephemeral", response_model=JobStatusResponse, status_code=202)
+async def submit_generate_ephemeral_job(req: GenerateWikiRequest, request: Request):
+    """
+    /api/generate_ephemeral'ın asenkron sürümü. HTML sonucu iş kaydında
+    GENERATION_JOB_RETENTION_SECONDS boyunca bellekte tutulur.
+    """
+    logger.info("POST /api/jobs/generate_ephemeral repo_url=%s client=%s", req.repo_url, request.client)
+    return _submit_generation_job("generate_ephemeral", req, run_generation_pipeline_ephemeral)
+
+
+@app.get("/api/jobs", response_model=List[JobStatusResponse])
+async def get_jobs():
+    return [JobStatusResponse(**job) for job in list_jobs()]
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job)
+
+
+@app.get(
+    "/api/jobs/{job_id}/result",
+    response_model=Union[GenerateWikiEphemeralResponse, GenerateWikiResponse],
+)
+async def get_job_output(job_id: str):
+    """
+    Biten işin sonucu. İş henüz bitmediyse 409, başarısız olduysa 500 döner.
+    """
+    job = get_job_result(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = job["result"]
+    if "html" in result:
+        return GenerateWikiEphemeralResponse(**result)
+    return GenerateWikiResponse(**result)
+
+
+def _load_outline(repo_id: str) -> List[WikiSection]:
+    outline_path = WIKI_DIR / f"{repo_id}_outline.json"
+    if not outline_path.exists():
+        raise HTTPException(status_code=404, detail="Outline not found for repo")
+    return [WikiSection(**s) for s in json.loads(outline_path.read_text(encoding="utf-8"))]
 
 
 @app.post("/api/wiki_page", response_model=GetWikiPageResponse)
@@ -153,28 +310,22 @@ def get_wiki_page(req: GetWikiPageRequest):
     section_id = req.section_id
     llm = req.llm
 
-    outline_path = WIKI_DIR / f"{repo_id}_outline.json"
-    if not outline_path.exists():
-        raise HTTPException(status_code=404, detail="Outline not found for repo")
-
-    outline_data = json.loads(outline_path.read_text(encoding="utf-8"))
-    sections = [WikiSection(**s) for s in outline_data]
+    sections = _load_outline(repo_id)
     section = next((s for s in sections if s.id == section_id), None)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
     page_path = WIKI_DIR / f"{repo_id}_{section_id}.md"
 
-    index_path, meta_path = get_index_paths(repo_id)
-    if not index_path.exists() or not meta_path.exists():
+    if not index_exists(repo_id):
         raise HTTPException(status_code=404, detail="Index not found for repo")
-    index = FaissIndex.load(index_path, meta_path)
 
     if page_path.exists():
         markdown = page_path.read_text(encoding="utf-8")
         page = WikiPage(section=section, markdown=markdown)
     else:
-        page = generate_wiki_page(repo_id, section, llm, index)
+        with acquire_index(repo_id) as index:
+            page = generate_wiki_page(repo_id, section, llm, index)
 
     return GetWikiPageResponse(
         repo_id=repo_id,
@@ -191,31 +342,234 @@ def get_wiki_html(repo_id: str, request: Request):
     Burada:
     - Hiçbir LLM çağrısı yok
     - Hiçbir embedding / index işlemi yok
-    Sadece diskten WIKI_DIR/{repo_id}_wiki.html okunur.
+    WIKI_DIR/{repo_id}_wiki.html ve build sırasında yazılan .gz / .br kopyaları
+    process içi LRU'dan servis edilir; Accept-Encoding'e göre sıkıştırılmış temsil
+    seçilir, If-None-Match eşleşirse 304 döner (bkz. html_cache).
     """
     logger.info("GET /api/wiki_html repo_id=%s client=%s", repo_id, request.client)
     html_path = WIKI_DIR / f"{repo_id}_wiki.html"
-    if not html_path.exists():
+    prepared = prepare_html_response(
+        html_path,
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match"),
+    )
+    if prepared is None:
         logger.warning("HTML wiki not found for repo_id=%s", repo_id)
         raise HTTPException(status_code=404, detail="HTML wiki not found for repo")
 
-    html = html_path.read_text(encoding="utf-8")
-    logger.info("HTML wiki served for repo_id=%s", repo_id)
-    return Response(content=html, media_type="text/html")
+    logger.info("HTML wiki served for repo_id=%s status=%d", repo_id, prepared["status"])
+    return Response(
+        content=prepared["body"],
+        status_code=prepared["status"],
+        media_type="text/html" if prepared["status"] == 200 else None,
+        headers=prepared["headers"],
+    )
+
+
+def _cached_html_response(request: Request, etag_source: str, render: Callable[[], str]) -> Response:
+    """
+    ETag'li, tarayıcı tarafından WIKI_FRAGMENT_MAX_AGE_SECONDS boyunca cache'lenebilen
+    HTML cevabı. If-None-Match eşleşirse içerik render edilmeden 304 döner.
+    ETag renderer sürümünü de içerir; render değişince tarayıcı cache'i geçersiz olur.
+    """
+    etag_input = f"{WIKI_RENDERER_VERSION}\n{etag_source}"
+    etag = '"' + hashlib.blake2b(etag_input.encode("utf-8"), digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={WIKI_FRAGMENT_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=render(), media_type="text/html", headers=headers)
+
+
+@app.get("/api/wiki/{repo_id}/shell")
+def get_wiki_shell(repo_id: str, request: Request):
+    """
+    Tam HTML wiki'nin lazy sürümü: layout + sidebar + section yer tutucuları.
+    Section içerikleri açıldıkça /api/wiki/{repo_id}/sections/{section_id}'den çekilir.
+    """
+    sections = _load_outline(repo_id)
+    etag_source = repo_id + json.dumps([s.model_dump() for s in sections], sort_keys=True)
+    return _cached_html_response(
+        request,
+        etag_source,
+        lambda: render_wiki_shell(
+            repo_id,
+            sections,
+            "sections/{section_id}",
+            export_links={"html": f"../../wiki_html/{repo_id}", "bundle": "bundle"},
+        ),
+    )
+
+
+@app.get("/api/wiki/{repo_id}/sections/{section_id}")
+def get_wiki_section_fragment(repo_id: str, section_id: str, request: Request):
+    """
+    Diskteki sayfadan tek bir section'ın HTML fragment'ı. LLM çağrısı yapmaz;
+    sayfa henüz üretilmediyse 404 döner.
+    """
+    # Outline'da olmayan id'ler reddedilir (dosya yoluna serbest girdi gitmesin)
+    if not any(s.id == section_id for s in _load_outline(repo_id)):
+        raise HTTPException(status_code=404, detail="Section not found")
+    page_path = WIKI_DIR / f"{repo_id}_{section_id}.md"
+    if not page_path.exists():
+        raise HTTPException(status_code=404, detail="Page not generated yet")
+    markdown_text = page_path.read_text(encoding="utf-8")
+    return _cached_html_response(request, markdown_text, lambda: render_section_fragment(markdown_text))
+
+
+@app.get("/api/wiki/{repo_id}/bundle")
+def export_bundle(repo_id: str, request: Request):
+    """
+    Repo'nun wiki'sini ve arama index'ini tek dosyalık bir bundle olarak indirir
+    (outline, sayfa markdown'ları, render edilmiş fragment'lar, FAISS index + metadata).
+    Başka bir node POST /api/wiki/bundle ile yeniden build etmeden yükleyebilir.
+    """
+    logger.info("GET /api/wiki/%s/bundle client=%s", repo_id, request.client)
+    # Her istek kendi dosyasına yazar; eşzamanlı bir export gönderilmekte olan
+    # dosyayı değiştiremez. Dosya cevap gönderildikten sonra silinir.
+    export_path = BUNDLE_DIR / f".export-{uuid.uuid4().hex}.dwb"
+    try:
+        export_wiki_bundle(repo_id, export_path)
+    except Exception as e:
+        export_path.unlink(missing_ok=True)
+        if isinstance(e, FileNotFoundError):
+            raise HTTPException(status_code=404, detail=str(e))
+        if isinstance(e, TimeoutError):
+            raise HTTPException(status_code=503, detail=str(e))
+        raise
+    return FileResponse(
+        export_path,
+        media_type="application/octet-stream",
+        filename=f"{repo_id}.dwb",
+        background=BackgroundTask(export_path.unlink, missing_ok=True),
+    )
+
+
+@app.post("/api/wiki/bundle", response_model=WikiBundleManifest)
+async def import_bundle(request: Request):
+    """
+    GET /api/wiki/{repo_id}/bundle ile alınmış bundle'ı (ham gövde olarak) bu node'a
+    kurar: wiki dosyaları yazılır, index yeni bir snapshot olarak yayınlanır.
+    LLM / embedding çağrısı yapılmaz.
+    """
+    logger.info("POST /api/wiki/bundle client=%s", request.client)
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Bundle exceeds the maximum upload size of {BUNDLE_MAX_UPLOAD_BYTES} bytes",
+    )
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > BUNDLE_MAX_UPLOAD_BYTES:
+        raise too_large
+
+    BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+    upload_path = BUNDLE_DIR / f".upload-{uuid.uuid4().hex}.tmp"
+    try:
+        # Disk yazımları event loop'u bloklamasın diye thread'de yapılır
+        f = await asyncio.to_thread(upload_path.open, "wb")
+        try:
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                # Content-Length yoksa veya yanlışsa sınır akan byte sayısıyla da uygulanır
+                if received > BUNDLE_MAX_UPLOAD_BYTES:
+                    raise too_large
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        manifest = await asyncio.to_thread(import_wiki_bundle, upload_path)
+    except HTTPException:
+        raise
+    except WikiBundleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /api/wiki/bundle")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        upload_path.unlink(missing_ok=True)
+    return WikiBundleManifest(**manifest)
+
+
+def _get_ephemeral_wiki_or_404(wiki_id: str) -> Dict[str, Any]:
+    wiki = get_ephemeral_wiki(wiki_id)
+    if wiki is None:
+        raise HTTPException(status_code=404, detail="Ephemeral wiki not found or expired")
+    return wiki
+
+
+@app.get("/api/ephemeral_wiki/{wiki_id}/shell")
+def get_ephemeral_wiki_shell(wiki_id: str, request: Request):
+    """
+    /api/generate_ephemeral/stream ile üretilen wiki'nin lazy shell'i.
+    """
+    wiki = _get_ephemeral_wiki_or_404(wiki_id)
+    return _cached_html_response(
+        request,
+        wiki_id,
+        lambda: render_wiki_shell(
+            wiki["repo_id"],
+            wiki["sections"],
+            "sections/{section_id}",
+            export_links={"html": "html"},
+        ),
+    )
+
+
+@app.get("/api/ephemeral_wiki/{wiki_id}/sections/{section_id}")
+def get_ephemeral_wiki_section_fragment(wiki_id: str, section_id: str, request: Request):
+    wiki = _get_ephemeral_wiki_or_404(wiki_id)
+    fragment = wiki["fragments"].get(section_id)
+    if fragment is None:
+        raise HTTPException(status_code=404, detail="Section not found")
+    # Ephemeral wiki değişmez; ETag için wiki_id + section_id yeterli
+    return _cached_html_response(request, f"{wiki_id}/{section_id}", lambda: fragment)
+
+
+@app.get("/api/ephemeral_wiki/{wiki_id}/html")
+def get_ephemeral_wiki_html(wiki_id: str):
+    """
+    Ephemeral wiki'nin tek dosya HTML çıktısı (indirme için). Doküman bellekte
+    birleştirilmeden parça parça gönderilir.
+    """
+    wiki = _get_ephemeral_wiki_or_404(wiki_id)
+    fragments = [wiki["fragments"].get(s.id, "") for s in wiki["sections"]]
+    return StreamingResponse(
+        iter_full_wiki_html(wiki["repo_id"], wiki["sections"], fragments),
+        media_type="text/html",
+        headers={"Content-Disposition": f'attachment; filename="{wiki["repo_id"]}_wiki.html"'},
+    )
+
+
+def _resolve_conversation(req: AskRequest) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    /api/ask için (session_id, konuşma geçmişi):
+    - session_id verildiyse geçmiş sunucudaki oturumdan gelir (özet + son mesajlar);
+      oturum yoksa veya süresi dolduysa 404
+    - Aksi halde geçmiş conversation_history'den gelir (yoksa boş); oturum burada
+      açılmaz. start_session=True ise oturum cevap üretildikten sonra açılır
+      (bkz. rag_qa.ask_repo)
+    """
+    if req.session_id is not None:
+        history = get_session_history(req.session_id, req.repo_id)
+        if history is None:
+            raise HTTPException(status_code=404, detail="Conversation session not found or expired")
+        return req.session_id, history
+    return None, req.conversation_history or []
 
 
 @app.post("/api/ask", response_model=AskResponse)
-def ask(req: AskRequest, request: Request):
+async def ask(req: AskRequest, request: Request):
     """
     RAG ile "ask the repo" endpoint'i.
     """
     logger.info("POST /api/ask repo_id=%s client=%s", req.repo_id, request.client)
+    session_id, history = _resolve_conversation(req)
     try:
-        answer, used_paths = ask_repo(
+        answer, used_paths, token_usage, session_id = await ask_repo(
             repo_id=req.repo_id,
             question=req.question,
             llm=req.llm,
-            conversation_history=req.conversation_history or [],
+            conversation_history=history,
+            session_id=session_id,
+            start_session=req.start_session,
         )
         logger.info(
             "Ask completed for repo_id=%s, used_paths_count=%d",
@@ -225,12 +579,74 @@ def ask(req: AskRequest, request: Request):
         return AskResponse(
             answer=answer,
             used_section_ids=used_paths,
+            token_usage=token_usage,
+            session_id=session_id,
         )
     except Exception as e:
         logger.exception("Error in /api/ask for repo_id=%s", req.repo_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/ask/stream")
+async def ask_stream(req: AskRequest, request: Request):
+    """
+    /api/ask'in SSE sürümü: önce kaynaklar ("sources"), ardından cevap
+    token'ları ("token") geldikçe, en sonda tam cevap ("done") gönderilir.
+    """
+    logger.info("POST /api/ask/stream repo_id=%s client=%s", req.repo_id, request.client)
+    session_id, history = _resolve_conversation(req)
+    events = stream_ask_repo(
+        repo_id=req.repo_id,
+        question=req.question,
+        llm=req.llm,
+        conversation_history=history,
+        session_id=session_id,
+        start_session=req.start_session,
+    )
+    return _sse_response(events, f"/api/ask/stream repo_id={req.repo_id}")
+
+
+@app.post("/api/ask_multi", response_model=MultiRepoAskResponse)
+async def ask_multi(req: MultiRepoAskRequest, request: Request):
+    """
+    Birden fazla repo (veya tanımlı bir grup/tenant) üzerinde RAG soru-cevap.
+    Sorgu tüm repo index'lerinde paralel aranır, sonuçlar global top_k olarak birleştirilir.
+    """
+    logger.info(
+        "POST /api/ask_multi group=%s repo_ids=%s client=%s",
+        req.group,
+        req.repo_ids,
+        request.client,
+    )
+    if not req.repo_ids and not req.group:
+        raise HTTPException(status_code=400, detail="Either repo_ids or group is required")
+    try:
+        answer, sources, searched, token_usage = await ask_repos(
+            question=req.question,
+            llm=req.llm,
+            repo_ids=req.repo_ids,
+            group=req.group,
+            top_k=req.top_k,
+            conversation_history=req.conversation_history or [],
+        )
+        logger.info(
+            "Multi-repo ask completed shards=%d sources=%d",
+            len(searched),
+            len(sources),
+        )
+        return MultiRepoAskResponse(
+            answer=answer,
+            sources=sources,
+            searched_repo_ids=searched,
+            token_usage=token_usage,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /api/ask_multi")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/deep_research", response_model=DeepResearchResponse)
 def deep_research(req: DeepResearchRequest, request: Request):
     """
@@ -267,4 +683,27 @@ def deep_research(req: DeepResearchRequest, request: Request):
         )
     except Exception as e:
         logger.exception("Error in /api/deep_research for repo_id=%s", req.repo_id)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/deep_research/stream")
+def deep_research_stream(req: DeepResearchRequest, request: Request):
+    """
+    /api/deep_research'in SSE sürümü. Her iterasyon için "iteration_start",
+    token'lar için "token", iterasyon sonunda "iteration_end" ve en sonda
+    "done" olayı gönderilir.
+    """
+    logger.info(
+        "POST /api/deep_research/stream repo_id=%s max_iterations=%d client=%s",
+        req.repo_id,
+        req.max_iterations,
+        request.client,
+    )
+    events = iter_deep_research(
+        repo_id=req.repo_id,
+        question=req.question,
+        llm=req.llm,
+        max_iterations=req.max_iterations,
+        stream=True,
+    )
+    return _sse_response(events, f"/api/deep_research/stream repo_id={req.repo_id}")
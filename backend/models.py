@@ -2,6 +2,19 @@ from typing import List, Optional, Dict, Any, Literal
 from pydantic import BaseModel
 
 
+# LLM çağrılarının yapıldığı aşamalar; her aşama ayrı modele yönlendirilebilir
+LLMStage = Literal["outline", "page", "research_intermediate", "research_final", "ask", "conversation_summary"]
+
+
+class StageRoute(BaseModel):
+    """
+    Bir aşama için model / cevap uzunluğu override'ı.
+    None alanlar sunucu varsayılanına (config.LLM_STAGE_ROUTES) düşer.
+    """
+    chat_model: Optional[str] = None
+    max_tokens: Optional[int] = None
+
+
 class LLMConfig(BaseModel):
     """
     UI'dan gelen LLM konfigürasyonu.
@@ -13,6 +26,12 @@ class LLMConfig(BaseModel):
     embed_model: str       # Ör: "text-embedding-3-small"
     api_key: str           # UI'dan gelecek
     base_url: Optional[str] = None  # None -> varsayılan OpenAI URL'i
+    # Hedge isteği için opsiyonel ikincil OpenAI-compatible endpoint / model
+    # (None -> birincil base_url / chat_model kullanılır)
+    hedge_base_url: Optional[str] = None
+    hedge_chat_model: Optional[str] = None
+    # Aşama bazlı yönlendirme; ör. {"outline": {"chat_model": "gpt-4.1-nano"}}
+    stage_routes: Optional[Dict[LLMStage, StageRoute]] = None
 
 
 class GenerateWikiRequest(BaseModel):
@@ -51,6 +70,32 @@ class GenerateWikiEphemeralResponse(BaseModel):
     html: str
 
 
+class JobStage(BaseModel):
+    name: str                  # "clone" | "index" | "outline" | "pages" | "html"
+    started_at: float
+    finished_at: Optional[float] = None
+    seconds: Optional[float] = None
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Asenkron wiki üretim işinin durumu. Sonuç /api/jobs/{job_id}/result'tan alınır.
+    """
+    job_id: str
+    kind: str                  # "generate" | "generate_ephemeral"
+    status: Literal["queued", "running", "succeeded", "failed"]
+    stage: Optional[str] = None
+    percent: float
+    stage_percent: Optional[float] = None
+    stages: List[JobStage]
+    params: Dict[str, Any]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    has_result: bool = False
+
+
 class GetWikiPageRequest(BaseModel):
     repo_id: str
     section_id: str
@@ -67,18 +112,48 @@ class AskRequest(BaseModel):
     repo_id: str
     question: str
     llm: LLMConfig
+    # Sunucu tarafı konuşma oturumu (önceki cevaptaki session_id); verilirse geçmiş
+    # sunucuda tutulur ve conversation_history gönderilmez
+    session_id: Optional[str] = None
+    # session_id yokken True ise cevap başarıyla üretildikten sonra yeni oturum açılır
+    start_session: bool = False
     conversation_history: Optional[List[Dict[str, Any]]] = None
 
 
 class AskResponse(BaseModel):
     answer: str
     used_section_ids: List[str]  # Aslında file path'ler; isimlendirme sade bırakıldı
+    token_usage: Optional[Dict[str, int]] = None  # context_packer istatistikleri
+    session_id: Optional[str] = None  # Sonraki sorularda gönderilecek konuşma oturumu
+
+
+class MultiRepoAskRequest(BaseModel):
+    """
+    Birden fazla repo üzerinde soru sormak için.
+    repo_ids ve/veya group (tenant/grup adı, "*" = tüm repolar) verilmelidir.
+    """
+    question: str
+    llm: LLMConfig
+    repo_ids: Optional[List[str]] = None
+    group: Optional[str] = None
+    top_k: int = 12
+    conversation_history: Optional[List[Dict[str, Any]]] = None
+
+
+class MultiRepoAskResponse(BaseModel):
+    answer: str
+    sources: List[str]            # "repo_id:path"
+    searched_repo_ids: List[str]
+    token_usage: Optional[Dict[str, int]] = None
 
 
 class DeepResearchIteration(BaseModel):
     stage: str          # "first" | "intermediate" | "final"
     label: str          # Örn: "## Research Plan (iteration 1)"
     content: str        # LLM çıktısı
+    token_usage: Optional[Dict[str, int]] = None  # Bu iterasyonun prompt token istatistikleri
+    queries: Optional[List[str]] = None  # Bağlam için aranan sorgular (ilk iterasyonda soru)
+    new_contexts: Optional[int] = None  # Prompt'a giren, daha önce gösterilmemiş bağlam blokları
 
 
 class DeepResearchRequest(BaseModel):
@@ -90,4 +165,16 @@ class DeepResearchRequest(BaseModel):
 
 class DeepResearchResponse(BaseModel):
     final_answer: str
-    iterations: List[DeepResearchIteration]
\ No newline at end of file
+    iterations: List[DeepResearchIteration]
+
+
+class WikiBundleManifest(BaseModel):
+    format_version: int
+    repo_id: str
+    created_at: float
+    index_version: Optional[str] = None   # Import'ta: bu node'da yayınlanan yeni versiyon
+    renderer_version: int
+    dim: int
+    chunks: int
+    sections: int
+    pages: int
@@ -0,0 +1,97 @@
+import asyncio
+import heapq
+import json
+import logging
+from itertools import islice
+from typing import List, Dict, Any, Optional
+
+from .config import SHARD_GROUPS_PATH
+from .executors import run_search
+from .vector_store import acquire_index, list_indexed_repo_ids
+
+logger = logging.getLogger("deepwiki")
+
+
+def load_shard_groups() -> Dict[str, List[str]]:
+    """
+    SHARD_GROUPS_PATH'teki grup/tenant -> repo_id listesi eşlemesini okur.
+    Dosya yoksa boş sözlük döner.
+    """
+    if not SHARD_GROUPS_PATH.exists():
+        return {}
+    data = json.loads(SHARD_GROUPS_PATH.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid shard groups file: {SHARD_GROUPS_PATH}")
+    return {str(name): [str(r) for r in repos] for name, repos in data.items()}
+
+
+def resolve_shards(
+    repo_ids: Optional[List[str]] = None,
+    group: Optional[str] = None,
+) -> List[str]:
+    """
+    Aranacak repo listesini belirler: açıkça verilen repo_id'ler + grubun repoları.
+    Grup "*" ise (ve dosyada tanımlı değilse) index'i olan tüm repolar kullanılır.
+    """
+    shards: List[str] = list(repo_ids or [])
+    if group:
+        groups = load_shard_groups()
+        if group in groups:
+            shards.extend(groups[group])
+        elif group == "*":
+            shards.extend(list_indexed_repo_ids())
+        else:
+            raise ValueError(f"Unknown shard group: {group}")
+
+    # Sırayı koruyarak tekilleştir
+    return list(dict.fromkeys(shards))
+
+
+def _search_shard(repo_id: str, query_emb: List[float], top_k: int) -> List[Dict[str, Any]]:
+    try:
+        with acquire_index(repo_id) as index:
+            if index.dim != len(query_emb):
+                logger.warning(
+                    "Skipping shard repo_id=%s: dim %d != query dim %d",
+                    repo_id,
+                    index.dim,
+                    len(query_emb),
+                )
+                return []
+            results = index.search(query_emb, top_k=top_k)
+    except FileNotFoundError:
+        logger.warning("Skipping shard repo_id=%s: index not found", repo_id)
+        return []
+    for r in results:
+        r["repo_id"] = repo_id
+    return results
+
+
+async def search_shards(
+    repo_ids: List[str],
+    query_emb: List[float],
+    top_k: int = 12,
+) -> List[Dict[str, Any]]:
+    """
+    Tek bir sorgu embedding'ini verilen tüm repo index'lerinde (FAISS search
+    thread pool'unda) paralel arar ve shard'ların sonuçlarını L2 mesafesine
+    göre heap ile birleştirip global top_k döner.
+    """
+    if not repo_ids:
+        return []
+
+    results = await asyncio.gather(
+        *(run_search(_search_shard, repo_id, query_emb, top_k) for repo_id in repo_ids),
+        return_exceptions=True,
+    )
+
+    per_shard: List[List[Dict[str, Any]]] = []
+    for repo_id, result in zip(repo_ids, results):
+        if isinstance(result, BaseException):
+            logger.error("Shard search failed for repo_id=%s", repo_id, exc_info=result)
+            continue
+        per_shard.append(result)
+
+    # Her shard'ın sonucu zaten mesafeye göre sıralı; k-yollu heap merge yeterli
+    merged = heapq.merge(*per_shard, key=lambda r: r["score"])
+    return list(islice(merged, top_k))
@@ -120,7 +120,8 @@ Repository name: {repo_name}
 High-level description (if any):
 {description}
 
-File tree / key files (truncated for large repos):
+Repository structure (per-directory totals and main symbols, then files;
+deeper directories and files may be folded into their parent directory's totals):
 {file_tree}
 
 Please return ONLY a JSON array of section objects as described in the system
@@ -334,6 +335,9 @@ Guidelines:
 - Provide initial findings based on the current information
 - End with a short "## Next Steps" section describing what to investigate in the
   next iterations
+- After it, add a "## Follow-up Queries" section: up to {max_subqueries} short code search
+  queries (one per line, starting with "- ") naming the files, symbols or
+  behaviours the next iteration should look up
 - Do NOT provide a final conclusion yet
 """
 
@@ -355,6 +359,9 @@ Guidelines:
 - Focus on adding NEW information or clarifying open questions
 - Reference concrete files, modules, and flows where possible
 - Keep the scope narrow and precise for this iteration
+- End with a "## Follow-up Queries" section: up to {max_subqueries} short code search queries
+  (one per line, starting with "- ") for what is still unclear; leave it empty
+  if nothing remains to be looked up
 """
 
 
@@ -378,3 +385,69 @@ Guidelines:
 - Reference important files and modules explicitly
 - Do NOT introduce new speculative topics – stay grounded in previous findings
 """
+
+
+# -----------------------------------------------------------------------------
+# 5. High Level Architecture dokümanının commit değişince güncellenmesi
+# -----------------------------------------------------------------------------
+
+ARCHITECTURE_UPDATE_SYSTEM_PROMPT = """
+You are an expert code analyst maintaining the "High Level Architecture" page
+of a repository wiki.
+
+You receive the current version of the page, written for an earlier commit,
+and a summary of what changed in the repository since then.
+
+Your role:
+- Update the page so that it is accurate for the new commit
+- Keep everything the changes do not affect as it is (structure, wording,
+  headings and any Mermaid diagram)
+- Revise, add or remove only the components, flows and files affected by the
+  changes; do NOT restate the changes as a changelog
+
+Guidelines:
+- Return the COMPLETE updated page in Markdown, not a diff or a list of edits
+- Keep the existing H1 heading
+- If you change a Mermaid diagram, keep it in the same canonical template
+  form; if you are not sure it stays valid, leave the diagram unchanged
+- Do NOT include any front-matter (no YAML/JSON at the top)
+"""
+
+ARCHITECTURE_UPDATE_USER_TEMPLATE = """
+CURRENT PAGE (commit {old_commit}):
+{previous_markdown}
+
+REPOSITORY CHANGES (commit {old_commit} -> {new_commit}):
+{changes}
+
+Return the updated High Level Architecture page.
+"""
+
+
+# -----------------------------------------------------------------------------
+# 6. /api/ask konuşma oturumlarının rolling özeti
+# -----------------------------------------------------------------------------
+
+CONVERSATION_SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a conversation between a developer and an
+assistant about a software repository. The summary replaces the older part of
+the conversation in future prompts.
+
+Guidelines:
+- Merge the new messages into the existing summary; do not drop earlier
+  facts that are still relevant
+- Keep the developer's goals, the questions asked and the key facts from the
+  answers: file paths, modules, functions, configuration, decisions and open
+  questions
+- Leave out greetings, repetition and long code listings
+- Write concise bullet points, at most about 250 words
+- Return ONLY the updated summary
+"""
+
+CONVERSATION_SUMMARY_USER_TEMPLATE = """
+EXISTING SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{messages}
+"""
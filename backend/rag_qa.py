@@ -1,62 +1,288 @@
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator
 
-from .embeddings import EmbeddingClient
-from .chat_client import ChatClient
-from .vector_store import FaissIndex, get_index_paths
+from .embeddings import AsyncEmbeddingClient
+from .chat_client import AsyncChatClient
+from .executors import run_search
+from .vector_store import FaissIndex, load_current_index, acquire_index
+from .multi_repo_search import resolve_shards, search_shards
+from .retrieval import retrieve, merge_adjacent_chunks
+from .context_packer import pack_context
+from .semantic_cache import lookup_answer, store_answer
+from .conversations import create_session, record_turn
 from .prompts import RAG_SYSTEM_PROMPT, RAG_TEMPLATE
 from .models import LLMConfig
 
 
 def load_index_for_repo(repo_id: str) -> FaissIndex:
-    index_path, meta_path = get_index_paths(repo_id)
-    return FaissIndex.load(index_path, meta_path)
+    return load_current_index(repo_id)
 
 
-def create_rag_prompt(
+def build_rag_prompt(
     question: str,
     contexts: List[Dict[str, Any]],
     conversation_history: List[Dict[str, str]] | None,
-) -> str:
-    history_str = ""
+    model: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    RAG prompt'unu token bütçesine göre paketleyerek üretir.
+
+    Dönüş: {"prompt": str, "neighbors": prompt'a giren bloklar, "stats": token sayıları}
+    """
+    history_entries: List[str] = []
     if conversation_history:
         for turn in conversation_history:
             role = turn.get("role", "user")
             content = turn.get("content", "")
-            history_str += f"{role.upper()}: {content}\n"
+            # Oturumlarda eski mesajlar tek bir özet girdisi olarak gelir (bkz. conversations)
+            label = "SUMMARY OF EARLIER CONVERSATION" if role == "summary" else role.upper()
+            history_entries.append(f"{label}: {content}\n")
 
-    context_strs = []
-    for c in contexts:
-        context_strs.append(f"File: {c['path']}\n\n{c['text']}\n---")
-    contexts_joined = "\n\n".join(context_strs)
+    template_text = RAG_TEMPLATE.format(
+        system_prompt=RAG_SYSTEM_PROMPT,
+        input_str=question,
+        contexts="",
+        conversation_history="",
+    )
+    packed = pack_context(
+        fixed_texts=[RAG_SYSTEM_PROMPT, template_text],
+        neighbors=contexts,
+        history_entries=history_entries,
+        model=model,
+        history_separator="",
+    )
 
-    return RAG_TEMPLATE.format(
+    prompt = RAG_TEMPLATE.format(
         system_prompt=RAG_SYSTEM_PROMPT,
         input_str=question,
-        contexts=contexts_joined,
-        conversation_history=history_str,
+        contexts=packed["contexts"],
+        conversation_history=packed["history"],
     )
+    return {"prompt": prompt, "neighbors": packed["neighbors"], "stats": packed["stats"]}
+
+
+def create_rag_prompt(
+    question: str,
+    contexts: List[Dict[str, Any]],
+    conversation_history: List[Dict[str, str]] | None,
+    model: Optional[str] = None,
+) -> str:
+    return build_rag_prompt(question, contexts, conversation_history, model)["prompt"]
 
 
-def ask_repo(
+def _search_for_ask(
+    repo_id: str,
+    question: str,
+    q_emb: List[float],
+    model: str,
+    embed_model: str,
+    conversation_history: List[Dict[str, str]] | None,
+) -> Dict[str, Any]:
+    """
+    Semantik cache kontrolü + retrieval + prompt paketleme (CPU / FAISS kısmı).
+    FAISS search thread pool'unda çalışır; event loop'u bloklamaz.
+    """
+    prepared: Dict[str, Any] = {"q_emb": q_emb, "cached": None}
+
+    # İstek boyunca aynı snapshot kullanılır; arada yeni build yayınlansa bile
+    # index ve metadata tutarlı kalır.
+    with acquire_index(repo_id) as index:
+        prepared["version"] = index.version
+        # Konuşma geçmişine bağlı cevaplar semantik cache'e uygun değil
+        if not conversation_history:
+            cached = lookup_answer(repo_id, index.version, model, embed_model, q_emb)
+            if cached is not None:
+                prepared["cached"] = cached
+                return prepared
+        neighbors = retrieve(index, q_emb, top_k=10)
+
+    built = build_rag_prompt(question, neighbors, conversation_history, model=model)
+
+    prepared["messages"] = [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": built["prompt"]},
+    ]
+    prepared["used_paths"] = list({n["path"] for n in built["neighbors"]})
+    prepared["chunk_ids"] = [i for n in built["neighbors"] for i in n.get("ids", [])]
+    prepared["token_usage"] = built["stats"]
+    return prepared
+
+
+async def _prepare_ask(
     repo_id: str,
     question: str,
     llm: LLMConfig,
     conversation_history: List[Dict[str, str]] | None,
-) -> tuple[str, List[str]]:
-    index = load_index_for_repo(repo_id)
-    embed_client = EmbeddingClient(llm)
-    chat_client = ChatClient(llm)
+) -> Dict[str, Any]:
+    """
+    Soru için embedding + (semantik cache veya retrieval) + prompt paketlemeyi yapar.
+
+    Dönüş:
+        {
+          "q_emb", "version",          # soru embedding'i ve kullanılan snapshot
+          "cached": kayıt | None,      # semantik cache isabeti varsa önceki cevap
+          "chat_client",               # "ask" aşamasına yönlendirilmiş client
+          "messages", "used_paths", "chunk_ids", "token_usage",
+        }
+    """
+    embed_client = AsyncEmbeddingClient(llm)
+    chat_client = AsyncChatClient(llm, stage="ask")
+
+    q_emb = (await embed_client.embed_texts([question]))[0]
+    prepared = await run_search(
+        _search_for_ask, repo_id, question, q_emb, chat_client.model, llm.embed_model, conversation_history
+    )
+    prepared["chat_client"] = chat_client
+    return prepared
+
+
+def _store_answer(
+    repo_id: str,
+    question: str,
+    llm: LLMConfig,
+    conversation_history: List[Dict[str, str]] | None,
+    prepared: Dict[str, Any],
+    answer: str,
+    started: float,
+) -> None:
+    if conversation_history:
+        return
+    store_answer(
+        repo_id=repo_id,
+        version=prepared["version"],
+        model=prepared["chat_client"].model,
+        embed_model=llm.embed_model,
+        question=question,
+        question_emb=prepared["q_emb"],
+        answer=answer,
+        used_paths=prepared["used_paths"],
+        chunk_ids=prepared["chunk_ids"],
+        token_usage=prepared["token_usage"],
+        latency_seconds=time.perf_counter() - started,
+    )
+
+
+def _finish_turn(
+    session_id: Optional[str],
+    start_session: bool,
+    repo_id: str,
+    question: str,
+    answer: str,
+    llm: LLMConfig,
+) -> Optional[str]:
+    # Yeni oturum yalnızca istemci istediyse ve cevap üretildikten sonra açılır;
+    # tek seferlik sorular oturum LRU'sunu doldurmaz
+    if session_id is None and start_session:
+        session_id = create_session(repo_id)
+    if session_id is not None:
+        record_turn(session_id, repo_id, question, answer, llm)
+    return session_id
+
+
+async def ask_repo(
+    repo_id: str,
+    question: str,
+    llm: LLMConfig,
+    conversation_history: List[Dict[str, str]] | None,
+    session_id: Optional[str] = None,
+    start_session: bool = False,
+) -> tuple[str, List[str], Dict[str, int], Optional[str]]:
+    """
+    Tek repo üzerinde RAG cevabı üretir.
+
+    session_id verilirse conversation_history o oturumun geçmişidir
+    (conversations.get_session_history); soru ve cevap oturuma eklenir.
+    session_id yokken start_session=True ise cevap üretildikten sonra yeni bir
+    oturum açılır.
+
+    Dönüş: (answer, kullanılan dosya yolları, prompt token istatistikleri, session_id)
+    """
+    started = time.perf_counter()
+    prepared = await _prepare_ask(repo_id, question, llm, conversation_history)
+    cached = prepared["cached"]
+    if cached is not None:
+        session_id = _finish_turn(session_id, start_session, repo_id, question, cached["answer"], llm)
+        return cached["answer"], cached["used_paths"], cached["token_usage"], session_id
+
+    answer = await prepared["chat_client"].chat(prepared["messages"])
+    _store_answer(repo_id, question, llm, conversation_history, prepared, answer, started)
+    session_id = _finish_turn(session_id, start_session, repo_id, question, answer, llm)
+    return answer, prepared["used_paths"], prepared["token_usage"], session_id
+
+
+async def stream_ask_repo(
+    repo_id: str,
+    question: str,
+    llm: LLMConfig,
+    conversation_history: List[Dict[str, str]] | None,
+    session_id: Optional[str] = None,
+    start_session: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    ask_repo'nun stream eden sürümü. Olaylar:
+      {"event": "sources", "data": {"used_section_ids", "token_usage"}}
+      {"event": "token", "data": {"text"}}
+      {"event": "done", "data": {"answer", "session_id"}}
+    """
+    started = time.perf_counter()
+    prepared = await _prepare_ask(repo_id, question, llm, conversation_history)
+    cached = prepared["cached"]
+    if cached is not None:
+        yield {
+            "event": "sources",
+            "data": {"used_section_ids": cached["used_paths"], "token_usage": cached["token_usage"]},
+        }
+        yield {"event": "token", "data": {"text": cached["answer"]}}
+        session_id = _finish_turn(session_id, start_session, repo_id, question, cached["answer"], llm)
+        yield {"event": "done", "data": {"answer": cached["answer"], "session_id": session_id}}
+        return
+
+    yield {
+        "event": "sources",
+        "data": {"used_section_ids": prepared["used_paths"], "token_usage": prepared["token_usage"]},
+    }
+    parts: List[str] = []
+    async for delta in prepared["chat_client"].chat_stream(prepared["messages"]):
+        parts.append(delta)
+        yield {"event": "token", "data": {"text": delta}}
+    answer = "".join(parts)
+    _store_answer(repo_id, question, llm, conversation_history, prepared, answer, started)
+    session_id = _finish_turn(session_id, start_session, repo_id, question, answer, llm)
+    yield {"event": "done", "data": {"answer": answer, "session_id": session_id}}
+
+
+async def ask_repos(
+    question: str,
+    llm: LLMConfig,
+    repo_ids: List[str] | None = None,
+    group: str | None = None,
+    top_k: int = 12,
+    conversation_history: List[Dict[str, str]] | None = None,
+) -> tuple[str, List[str], List[str], Dict[str, int]]:
+    """
+    Birden fazla repo üzerinde tek bir soru cevaplar.
+    Soru bir kez embed edilir, tüm shard'larda paralel aranır ve
+    global top_k bağlam ile tek bir cevap üretilir.
+
+    Dönüş: (answer, "repo_id:path" kaynak listesi, aranan repo_id'ler, token istatistikleri)
+    """
+    shards = resolve_shards(repo_ids, group)
+    if not shards:
+        raise ValueError("No repositories to search")
 
-    q_emb = embed_client.embed_texts([question])[0]
-    neighbors = index.search(q_emb, top_k=10)
+    embed_client = AsyncEmbeddingClient(llm)
+    chat_client = AsyncChatClient(llm, stage="ask")
 
-    prompt = create_rag_prompt(question, neighbors, conversation_history)
+    q_emb = (await embed_client.embed_texts([question]))[0]
+    # Shard'lar arası vektörler ayrı index'lerde; burada sadece komşu chunk birleştirme yapılır
+    neighbors = merge_adjacent_chunks(await search_shards(shards, q_emb, top_k=top_k))
 
+    built = build_rag_prompt(question, neighbors, conversation_history, model=chat_client.model)
     messages = [
         {"role": "system", "content": RAG_SYSTEM_PROMPT},
-        {"role": "user", "content": prompt},
+        {"role": "user", "content": built["prompt"]},
     ]
-    answer = chat_client.chat(messages)
+    answer = await chat_client.chat(messages)
 
-    used_paths = list({n["path"] for n in neighbors})
-    return answer, used_paths
\ No newline at end of file
+    sources = list(dict.fromkeys(f"{n['repo_id']}:{n['path']}" for n in built["neighbors"]))
+    return answer, sources, shards, built["stats"]
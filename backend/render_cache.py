@@ -0,0 +1,64 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from .config import RENDER_CACHE_MAX_BYTES
+
+# Section markdown'ından üretilen HTML fragment'larının process içi LRU'su.
+# Key renderer versiyonunu da içerdiğinden render mantığı değiştiğinde eski
+# fragment'lar kendiliğinden kullanılmaz hale gelir.
+_entries: "OrderedDict[str, str]" = OrderedDict()
+_cached_bytes = 0
+_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+
+
+def render_cache_key(markdown_text: str, renderer_version: int) -> str:
+    digest = hashlib.blake2b(markdown_text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{renderer_version}:{digest}"
+
+
+def get_rendered(key: str) -> Optional[str]:
+    with _lock:
+        html = _entries.get(key)
+        if html is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return html
+
+
+def put_rendered(key: str, html: str) -> None:
+    """
+    Fragment'ı cache'e ekler; toplam boyut RENDER_CACHE_MAX_BYTES'ı aşarsa
+    en az yakın zamanda kullanılanlar düşer.
+    """
+    global _cached_bytes
+    size = len(html)
+    if size > RENDER_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _cached_bytes -= len(old)
+        _entries[key] = html
+        _cached_bytes += size
+        while _cached_bytes > RENDER_CACHE_MAX_BYTES:
+            _, evicted = _entries.popitem(last=False)
+            _cached_bytes -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def get_render_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["cached_bytes"] = _cached_bytes
+    stats["max_bytes"] = RENDER_CACHE_MAX_BYTES
+    return stats
@@ -1,10 +1,90 @@
+import json
+import logging
+import os
+import re
 import subprocess
 import tempfile
+from collections import Counter
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse, urlunparse
 
-from .config import REPO_DIR, INCLUDED_EXTENSIONS, EXCLUDED_DIRS
+from .config import (
+    REPO_DIR,
+    INCLUDED_EXTENSIONS,
+    EXCLUDED_DIRS,
+    REPO_SUMMARY_CACHE_DIR,
+    OUTLINE_STRUCTURE_TOKEN_BUDGET,
+    DIRECTORY_SUMMARY_TOP_SYMBOLS,
+)
+from .context_packer import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger("deepwiki")
+
+# Rollup formatı / sembol çıkarma kuralları değişince artırılır; eski cache'ler kullanılmaz
+ROLLUP_VERSION = 1
+
+# Sembol çıkarmak için dosyanın yalnızca başı okunur
+_SYMBOL_SCAN_BYTES = 64 * 1024
+# Tek bir dosyadan dizin özetine aday olabilecek en fazla sembol
+_SYMBOLS_PER_FILE = 4
+# render_repo_structure'da "Files:" ve "... (N more)" satırları için ayrılan pay
+_STRUCTURE_FOOTER_TOKENS = 40
+
+_LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".go": "Go",
+    ".cs": "C#",
+    ".cpp": "C++",
+    ".c": "C",
+    ".rs": "Rust",
+    ".php": "PHP",
+    ".rb": "Ruby",
+    ".md": "Markdown",
+    ".txt": "Text",
+    ".json": "JSON",
+    ".yml": "YAML",
+    ".yaml": "YAML",
+}
+
+# Dil -> üst seviye / public tanımları yakalayan regex (ilk dolu grup isimdir)
+_SYMBOL_PATTERNS = {
+    "Python": re.compile(r"^(?:async\s+)?(?:def|class)\s+([A-Za-z]\w*)", re.MULTILINE),
+    "JavaScript": re.compile(
+        r"^(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?|class|const)\s+([A-Za-z$][\w$]*)",
+        re.MULTILINE,
+    ),
+    "TypeScript": re.compile(
+        r"^(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(?:async\s+)?"
+        r"(?:function\*?|class|interface|type|enum|const)\s+([A-Za-z$][\w$]*)",
+        re.MULTILINE,
+    ),
+    "Java": re.compile(
+        r"^\s*public\s+(?:(?:abstract|final|static|sealed)\s+)*(?:class|interface|enum|record)\s+([A-Za-z]\w*)",
+        re.MULTILINE,
+    ),
+    "Kotlin": re.compile(
+        r"^(?:(?:abstract|open|data|sealed|enum|internal)\s+)*(?:class|interface|object|fun)\s+([A-Za-z]\w*)",
+        re.MULTILINE,
+    ),
+    "Go": re.compile(r"^(?:func\s+(?:\([^)]*\)\s*)?|type\s+)([A-Z]\w*)", re.MULTILINE),
+    "C#": re.compile(
+        r"^\s*public\s+(?:(?:abstract|sealed|static|partial)\s+)*(?:class|interface|enum|record|struct)\s+([A-Za-z]\w*)",
+        re.MULTILINE,
+    ),
+    "C++": re.compile(r"^(?:class|struct)\s+([A-Za-z]\w*)\s*(?:[:{]|$)", re.MULTILINE),
+    "Rust": re.compile(r"^pub\s+(?:fn|struct|enum|trait)\s+([A-Za-z]\w*)", re.MULTILINE),
+    "PHP": re.compile(
+        r"^(?:(?:abstract|final)\s+)?(?:class|interface|trait|function)\s+([A-Za-z]\w*)",
+        re.MULTILINE,
+    ),
+    "Ruby": re.compile(r"^\s*(?:class|module)\s+([A-Z]\w*)", re.MULTILINE),
+}
 
 
 def normalize_repo_id(repo_url: str) -> str:
@@ -113,4 +193,378 @@ def build_file_tree_summary(repo_path: Path, max_entries: int = 200) -> str:
         if count >= max_entries:
             lines.append("... (truncated)")
             break
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+
+def _git_tree_hash(repo_path: Path) -> Optional[str]:
+    """
+    repo_path dizininin HEAD'deki tree hash'i (üst dizindeki bir repo'nun alt
+    dizini ise o alt dizinin tree'si). Git değilse veya dizinde commit'lenmemiş
+    değişiklik varsa None döner; bu durumda rollup cache'lenmez.
+    """
+    try:
+        head = subprocess.run(
+            ["git", "-C", str(repo_path), "rev-parse", "HEAD:./"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "-C", str(repo_path), "status", "--porcelain", "--", "."],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head if head and not dirty else None
+
+
+def _extract_symbols(path: Path, language: str) -> List[str]:
+    pattern = _SYMBOL_PATTERNS.get(language)
+    if pattern is None:
+        return []
+    try:
+        with open(path, "rb") as f:
+            text = f.read(_SYMBOL_SCAN_BYTES).decode("utf-8", errors="ignore")
+    except OSError:
+        return []
+    symbols: List[str] = []
+    for match in pattern.finditer(text):
+        name = match.group(1)
+        if name.startswith("_") or name in symbols:
+            continue
+        symbols.append(name)
+        if len(symbols) >= _SYMBOLS_PER_FILE:
+            break
+    return symbols
+
+
+def _compute_directory_rollup(repo_path: Path) -> Dict[str, Any]:
+    """
+    Tek os.walk geçişiyle dizin bazında dosya sayısı, boyut, dil dağılımı ve
+    öne çıkan semboller. Alt dizinlerin toplamları üst dizinlere yansıtılır.
+    """
+    dirs: Dict[str, Dict[str, Any]] = {}
+    paths: List[str] = []
+
+    def _entry(rel_dir: str) -> Dict[str, Any]:
+        if rel_dir not in dirs:
+            dirs[rel_dir] = {
+                "files": 0,
+                "total_files": 0,
+                "bytes": 0,
+                "languages": Counter(),
+                "symbols": [],
+            }
+        return dirs[rel_dir]
+
+    for root, subdirs, filenames in os.walk(repo_path):
+        # Yerinde filtreleme os.walk'un bu dizinlere inmesini engeller
+        subdirs[:] = sorted(d for d in subdirs if d not in EXCLUDED_DIRS)
+        rel_dir = Path(root).relative_to(repo_path).as_posix()
+        rel_dir = "" if rel_dir == "." else rel_dir
+
+        # (boyut, semboller): dizin sembolleri büyük dosyalardan başlayarak seçilir
+        scored: List[Tuple[int, List[str]]] = []
+        for name in sorted(filenames):
+            suffix = os.path.splitext(name)[1].lower()
+            if suffix not in INCLUDED_EXTENSIONS:
+                continue
+            path = Path(root) / name
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            language = _LANGUAGES.get(suffix, suffix.lstrip("."))
+            paths.append(f"{rel_dir}/{name}" if rel_dir else name)
+            scored.append((size, _extract_symbols(path, language)))
+
+            # Toplamlar dosyanın tüm üst dizinlerine eklenir
+            parts = rel_dir.split("/") if rel_dir else []
+            for depth in range(len(parts) + 1):
+                ancestor = _entry("/".join(parts[:depth]))
+                ancestor["total_files"] += 1
+                ancestor["bytes"] += size
+                ancestor["languages"][language] += size
+
+        if not scored:
+            continue
+        entry = _entry(rel_dir)
+        entry["files"] = len(scored)
+        for _, symbols in sorted(scored, key=lambda item: -item[0]):
+            for symbol in symbols:
+                if symbol not in entry["symbols"]:
+                    entry["symbols"].append(symbol)
+        del entry["symbols"][DIRECTORY_SUMMARY_TOP_SYMBOLS:]
+
+    root_entry = _entry("")
+    return {
+        "version": ROLLUP_VERSION,
+        "total_files": root_entry["total_files"],
+        "bytes": root_entry["bytes"],
+        "dirs": {
+            rel_dir: {**entry, "languages": dict(entry["languages"].most_common())}
+            for rel_dir, entry in sorted(dirs.items())
+        },
+        "paths": sorted(paths),
+    }
+
+
+def build_directory_rollup(repo_path: Path, cache: bool = True) -> Dict[str, Any]:
+    """
+    Repo'nun dizin bazında deterministik özeti (bkz. _compute_directory_rollup).
+    cache=True ise sonuç git tree hash'ine göre REPO_SUMMARY_CACHE_DIR'de tutulur;
+    aynı commit'in tekrar analizi dosya sistemini gezmeden döner.
+    """
+    tree_hash = _git_tree_hash(repo_path) if cache else None
+    cache_path = REPO_SUMMARY_CACHE_DIR / f"{tree_hash}.v{ROLLUP_VERSION}.json" if tree_hash else None
+
+    if cache_path is not None and cache_path.exists():
+        try:
+            return json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable directory rollup cache %s", cache_path)
+
+    rollup = _compute_directory_rollup(repo_path)
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(rollup, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, cache_path)
+    return rollup
+
+
+def _format_size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _format_languages(languages: Dict[str, int], total: int, limit: int = 3) -> str:
+    if not total:
+        return ""
+    top = [(lang, round(100 * size / total)) for lang, size in list(languages.items())[:limit]]
+    return ", ".join(f"{lang} {pct}%" for lang, pct in top if pct) or ", ".join(lang for lang, _ in top)
+
+
+def _directory_line(rel_dir: str, entry: Dict[str, Any], with_symbols: bool) -> str:
+    depth = rel_dir.count("/")
+    line = (
+        f"{'  ' * depth}{rel_dir}/ - {entry['total_files']} files, {_format_size(entry['bytes'])}"
+        f" ({_format_languages(entry['languages'], entry['bytes'])})"
+    )
+    if with_symbols and entry["symbols"]:
+        line += f" | {', '.join(entry['symbols'])}"
+    return line
+
+
+def render_repo_structure(
+    rollup: Dict[str, Any],
+    token_budget: int = OUTLINE_STRUCTURE_TOKEN_BUDGET,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Rollup'ı outline prompt'u için token bütçesine sığan bir metne çevirir:
+
+    1. Repo toplamları ve kök dizindeki semboller her zaman girer
+    2. Dizin satırları sığana kadar eklenir (önce sığ, aynı derinlikte büyük dizinler);
+       sığmayan dizin sembolsüz denenir, o da sığmazsa üst dizinin toplamında kalır
+    3. Kalan bütçeyle dosya yolları (önce sığ olanlar) listelenir
+
+    Küçük repolarda tüm dizinler ve dosyalar girer; büyük repolarda her dosya
+    en azından bir üst dizinin toplamında görünür.
+    """
+    dirs = rollup["dirs"]
+    root = dirs.get("", {"files": 0, "symbols": []})
+    header = [
+        f"Repository: {rollup['total_files']} files, {_format_size(rollup['bytes'])}"
+        f" ({_format_languages(root.get('languages', {}), rollup['bytes'], limit=5)})",
+    ]
+    if root.get("symbols"):
+        header.append(f"Root files: {root['files']} | {', '.join(root['symbols'])}")
+    dirs_title = "Directories (files, size, languages | main symbols):"
+    candidates = sorted(
+        (d for d in dirs if d),
+        key=lambda d: (d.count("/"), -dirs[d]["bytes"], d),
+    )
+    # Başlıklar ve "... (N more)" satırları için bütçeden baştan pay ayrılır
+    used = count_tokens("\n".join(header), model) + _STRUCTURE_FOOTER_TOKENS
+    if candidates:
+        used += count_tokens(dirs_title, model) + 2
+
+    # --- Dizinler ---
+    chosen: Dict[str, str] = {}
+    for rel_dir in candidates:
+        # Üst dizini gösterilmeyen bir dizin ağaçta asılı kalacağı için atlanır
+        parent = rel_dir.rsplit("/", 1)[0] if "/" in rel_dir else ""
+        if parent and parent not in chosen:
+            continue
+        for with_symbols in (True, False):
+            line = _directory_line(rel_dir, dirs[rel_dir], with_symbols)
+            tokens = count_tokens(line, model) + 1
+            if used + tokens <= token_budget:
+                chosen[rel_dir] = line
+                used += tokens
+                break
+    hidden_dirs = len(candidates) - len(chosen)
+
+    lines = list(header)
+    if candidates:
+        lines.append("")
+        lines.append(dirs_title)
+        lines.extend(chosen[d] for d in sorted(chosen))
+        if hidden_dirs:
+            lines.append(f"... ({hidden_dirs} deeper directories counted in their parents)")
+
+    # --- Dosyalar ---
+    paths = rollup["paths"]
+    listed: List[str] = []
+    for path in sorted(paths, key=lambda p: (p.count("/"), p)):
+        tokens = count_tokens(path, model) + 1
+        if used + tokens > token_budget:
+            break
+        listed.append(path)
+        used += tokens
+    if listed:
+        lines.append("")
+        lines.append("Files:")
+        lines.extend(sorted(listed))
+        if len(listed) < len(paths):
+            lines.append(f"... ({len(paths) - len(listed)} more files, see directory totals above)")
+    return "\n".join(lines)
+
+
+def build_repo_structure_summary(
+    repo_path: Path,
+    model: Optional[str] = None,
+    token_budget: int = OUTLINE_STRUCTURE_TOKEN_BUDGET,
+    cache: bool = True,
+) -> str:
+    """
+    Outline prompt'u için repo yapısı: dizin rollup'ı + bütçeye sığan dosya listesi.
+    build_file_tree_summary'nin aksine büyük repolarda da tüm dizinleri kapsar.
+    """
+    rollup = build_directory_rollup(repo_path, cache=cache)
+    summary = render_repo_structure(rollup, token_budget=token_budget, model=model)
+    logger.info(
+        "Repo structure summary files=%d dirs=%d tokens=%d/%d",
+        rollup["total_files"],
+        len(rollup["dirs"]),
+        count_tokens(summary, model),
+        token_budget,
+    )
+    return summary
+
+
+def get_head_commit(repo_path: Path) -> Optional[str]:
+    """
+    repo_path'teki HEAD commit hash'i; git repo'su değilse None.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "-C", str(repo_path), "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit or None
+
+
+def list_tracked_files(repo_path: Path) -> Dict[str, str]:
+    """
+    HEAD'deki analiz kapsamındaki (INCLUDED_EXTENSIONS, EXCLUDED_DIRS dışı) dosyalar:
+    yol -> blob hash. Yalnızca HEAD tree'sini okuduğundan shallow clone'da da çalışır;
+    iki commit'in dosya listesi geçmiş olmadan karşılaştırılabilir.
+    """
+    try:
+        out = subprocess.run(
+            ["git", "-C", str(repo_path), "ls-tree", "-r", "-z", "HEAD"],
+            capture_output=True, check=True,
+        ).stdout.decode("utf-8", errors="replace")
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    files: Dict[str, str] = {}
+    for record in out.split("\0"):
+        if "\t" not in record:
+            continue
+        info, path = record.split("\t", 1)
+        parts = info.split()
+        if len(parts) != 3 or parts[1] != "blob":
+            continue
+        if os.path.splitext(path)[1].lower() not in INCLUDED_EXTENSIONS:
+            continue
+        if any(part in EXCLUDED_DIRS for part in path.split("/")[:-1]):
+            continue
+        files[path] = parts[2]
+    return files
+
+
+def _filter_diff_sections(diff: str, paths: Set[str]) -> str:
+    """
+    Unified diff'ten yalnızca verilen (repo içi) yollara ait dosya bölümlerini tutar.
+    --no-renames --relative ile her bölüm "diff --git a/<yol> b/<yol>" başlığıyla başlar.
+    """
+    headers = {f"diff --git a/{p} b/{p}" for p in paths}
+    kept: List[str] = []
+    keep = False
+    for line in diff.splitlines(keepends=True):
+        if line.startswith("diff --git "):
+            keep = line.rstrip("\n") in headers
+        if keep:
+            kept.append(line)
+    return "".join(kept)
+
+
+def summarize_repo_changes(
+    repo_path: Path,
+    old_commit: str,
+    old_files: Dict[str, str],
+    new_files: Dict[str, str],
+    token_budget: int,
+    model: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    old_commit'ten HEAD'e değişen dosyaların özeti (bkz. list_tracked_files).
+
+    Eklenen / değişen / silinen dosya listesi her zaman üretilir; old_commit yerelde
+    varsa (ör. kalıcı clone'da pull sonrası) bu dosyaların unified diff'i de eklenir.
+    Özet token_budget'a sığacak şekilde kırpılır.
+
+    Dönüş: {"summary": str, "changed": değişen dosya sayısı, "total": HEAD'deki dosya sayısı}
+    """
+    added = sorted(set(new_files) - set(old_files))
+    deleted = sorted(set(old_files) - set(new_files))
+    modified = sorted(p for p in new_files if p in old_files and old_files[p] != new_files[p])
+    changed = len(added) + len(deleted) + len(modified)
+
+    lines = [f"{len(added)} added, {len(modified)} modified, {len(deleted)} deleted files"]
+    for label, paths in (("Added", added), ("Modified", modified), ("Deleted", deleted)):
+        if paths:
+            lines.append(f"{label}:")
+            lines.extend(f"- {p}" for p in paths)
+    # Dosya listesi bütçenin en fazla yarısını kullanır; kalanı diff'e kalır
+    summary = truncate_to_tokens("\n".join(lines), token_budget // 2, model, keep_tail=False)
+
+    remaining = token_budget - count_tokens(summary, model)
+    if changed and remaining > 0:
+        try:
+            subprocess.run(
+                ["git", "-C", str(repo_path), "cat-file", "-e", f"{old_commit}^{{commit}}"],
+                capture_output=True, check=True,
+            )
+            # Yollar argv'ye verilmez (büyük repolarda ARG_MAX aşılır); tüm diff alınıp
+            # sadece analiz edilen dosyaların bölümleri tutulur
+            raw_diff = subprocess.run(
+                ["git", "-C", str(repo_path), "-c", "core.quotePath=false", "diff", "--no-color",
+                 "--no-renames", "--relative", "-U2", old_commit, "HEAD"],
+                capture_output=True, check=True,
+            ).stdout.decode("utf-8", errors="replace")
+            diff = _filter_diff_sections(raw_diff, set(added) | set(modified) | set(deleted))
+        except (OSError, subprocess.CalledProcessError):
+            # Eski commit bu clone'da yok (shallow / geçici clone); dosya listesi yeterli
+            diff = ""
+        if diff:
+            diff = truncate_to_tokens(diff, remaining, model, keep_tail=False)
+            summary += f"\n\nDiff (may be truncated):\n{diff}"
+
+    return {"summary": summary, "changed": changed, "total": len(new_files)}
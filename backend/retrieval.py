@@ -0,0 +1,141 @@
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .config import CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVAL_FETCH_MULTIPLIER, MMR_LAMBDA
+from .vector_store import FaissIndex
+
+
+def _unit_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def mmr_select(
+    query_emb: List[float],
+    candidates: List[Dict[str, Any]],
+    vectors: np.ndarray,
+    top_k: int,
+    lambda_: float = MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """
+    Maximal Marginal Relevance: sorguya yakın ama birbirine benzemeyen
+    top_k aday seçer. Benzerlik ölçüsü cosine similarity'dir.
+    Seçilenler, seçilme sırasıyla (önce en alakalı) döner.
+    """
+    if len(candidates) <= top_k:
+        return list(candidates)
+
+    docs = _unit_rows(np.asarray(vectors, dtype="float32"))
+    q = _unit_rows(np.asarray([query_emb], dtype="float32"))[0]
+    relevance = docs @ q
+    pairwise = docs @ docs.T
+
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+    # Seçilmiş kümeye olan en yüksek benzerlik; başta hiç seçim yok
+    max_sim = np.full(len(candidates), -np.inf, dtype="float32")
+
+    while remaining and len(selected) < top_k:
+        if selected:
+            scores = lambda_ * relevance[remaining] - (1 - lambda_) * max_sim[remaining]
+        else:
+            scores = relevance[remaining]
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+        max_sim = np.maximum(max_sim, pairwise[best])
+
+    return [candidates[i] for i in selected]
+
+
+def _chunk_span(item: Dict[str, Any]) -> Optional[int]:
+    if "start" in item:
+        return int(item["start"])
+    if "chunk_id" in item:
+        # Eski metadata'da offset yok; split_text'in sabit adımından hesaplanır
+        return int(item["chunk_id"]) * (CHUNK_SIZE - CHUNK_OVERLAP)
+    return None
+
+
+def merge_adjacent_chunks(neighbors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aynı dokümana ait komşu veya örtüşen chunk'ları tek, kesintisiz bir blokta
+    birleştirir; örtüşen metin yalnızca bir kez yer alır.
+    Blok skoru, içindeki en iyi (en küçük) mesafedir. Sonuç skora göre sıralıdır.
+    """
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    standalone: List[Dict[str, Any]] = []
+    for n in neighbors:
+        start = _chunk_span(n)
+        if start is None:
+            standalone.append(dict(n))
+            continue
+        item = dict(n)
+        item["start"] = start
+        item["end"] = start + len(item.get("text", ""))
+        item["ids"] = [n["id"]] if "id" in n else []
+        groups.setdefault((n.get("repo_id"), n["path"]), []).append(item)
+
+    merged: List[Dict[str, Any]] = []
+    for items in groups.values():
+        items.sort(key=lambda x: x["start"])
+        current = items[0]
+        for nxt in items[1:]:
+            if nxt["start"] <= current["end"]:
+                if nxt["end"] > current["end"]:
+                    current["text"] += nxt["text"][current["end"] - nxt["start"]:]
+                    current["end"] = nxt["end"]
+                current["score"] = min(current["score"], nxt["score"])
+                current["ids"].extend(nxt["ids"])
+            else:
+                merged.append(current)
+                current = nxt
+        merged.append(current)
+
+    merged.extend(standalone)
+    merged.sort(key=lambda x: x["score"])
+    return merged
+
+
+def retrieve(
+    index: FaissIndex,
+    query_emb: List[float],
+    top_k: int,
+    fetch_k: Optional[int] = None,
+    use_mmr: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Prompt'lara girecek bağlamları toplar:
+    1. fetch_k (varsayılan top_k * RETRIEVAL_FETCH_MULTIPLIER) aday çekilir
+    2. MMR ile çeşitlendirilerek top_k tanesi seçilir
+    3. Aynı dosyadaki komşu/örtüşen chunk'lar birleştirilir
+    """
+    return retrieve_many(index, [query_emb], top_k, fetch_k=fetch_k, use_mmr=use_mmr)[0]
+
+
+def retrieve_many(
+    index: FaissIndex,
+    query_embs: List[List[float]],
+    top_k: int,
+    fetch_k: Optional[int] = None,
+    use_mmr: bool = True,
+) -> List[List[Dict[str, Any]]]:
+    """
+    retrieve'ın çok sorgulu sürümü: adaylar tek bir batch FAISS aramasıyla
+    çekilir, MMR ve birleştirme her sorgu için ayrı yapılır.
+    Sonuçlar sorgu sırasıyla döner.
+    """
+    if fetch_k is None:
+        fetch_k = top_k * RETRIEVAL_FETCH_MULTIPLIER if use_mmr else top_k
+
+    results: List[List[Dict[str, Any]]] = []
+    for query_emb, candidates in zip(query_embs, index.search_batch(query_embs, top_k=fetch_k)):
+        if use_mmr and len(candidates) > top_k and all("id" in c for c in candidates):
+            vectors = index.reconstruct([c["id"] for c in candidates])
+            candidates = mmr_select(query_emb, candidates, vectors, top_k)
+        else:
+            candidates = candidates[:top_k]
+        results.append(merge_adjacent_chunks(candidates))
+    return results
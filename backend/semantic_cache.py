@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_REPO,
+)
+
+# repo_id -> {"version": str, "vectors": np.ndarray (n, dim), "entries": [...]}
+_repos: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_stats: Dict[str, float] = {
+    "lookups": 0,
+    "hits": 0,
+    "misses": 0,
+    "saved_latency_seconds": 0.0,
+}
+
+
+def _is_older(version: str, other: str) -> bool:
+    # Snapshot versiyonları zaman damgasıyla başlar; isim sırası = yayın sırası
+    return version < other
+
+
+def _unit(vec: List[float]) -> np.ndarray:
+    v = np.asarray(vec, dtype="float32")
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+def lookup_answer(
+    repo_id: str,
+    version: Optional[str],
+    model: str,
+    embed_model: str,
+    question_emb: List[float],
+) -> Optional[Dict[str, Any]]:
+    """
+    Aynı snapshot, aynı chat modeli ve aynı embedding modeli için, soruya
+    SEMANTIC_CACHE_THRESHOLD'dan daha benzer bir önceki soru varsa onun kaydını
+    döner; yoksa None. Daha yeni bir snapshot'a geçildiyse repo'nun cache'i
+    boşaltılır; eski snapshot'a sabitlenmiş bir istek yeni kayıtlara dokunmaz.
+    """
+    if not SEMANTIC_CACHE_ENABLED or version is None:
+        return None
+
+    started = time.perf_counter()
+    q = _unit(question_emb)
+    hit: Optional[Dict[str, Any]] = None
+    with _lock:
+        _stats["lookups"] += 1
+        repo = _repos.get(repo_id)
+        if repo is not None and repo["version"] != version:
+            if _is_older(repo["version"], version):
+                # Index yeniden build edildi; eski cevaplar geçersiz
+                del _repos[repo_id]
+            repo = None
+        if repo is not None and repo["vectors"].shape[1] == q.shape[0]:
+            sims = repo["vectors"] @ q
+            # Aynı chat / embedding modeliyle üretilmemiş kayıtları dışarıda bırak;
+            # aynı boyutlu iki embedding modelinin vektörleri karşılaştırılamaz
+            for idx in np.argsort(-sims):
+                if sims[idx] < SEMANTIC_CACHE_THRESHOLD:
+                    break
+                entry = repo["entries"][idx]
+                if entry["model"] == model and entry["embed_model"] == embed_model:
+                    hit = entry
+                    break
+
+        if hit is None:
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+        lookup_seconds = time.perf_counter() - started
+        _stats["saved_latency_seconds"] += max(hit["latency_seconds"] - lookup_seconds, 0.0)
+        return dict(hit)
+
+
+def store_answer(
+    repo_id: str,
+    version: Optional[str],
+    model: str,
+    embed_model: str,
+    question: str,
+    question_emb: List[float],
+    answer: str,
+    used_paths: List[str],
+    chunk_ids: List[int],
+    token_usage: Optional[Dict[str, int]],
+    latency_seconds: float,
+) -> None:
+    if not SEMANTIC_CACHE_ENABLED or version is None:
+        return
+
+    q = _unit(question_emb)
+    entry = {
+        "question": question,
+        "model": model,
+        "embed_model": embed_model,
+        "answer": answer,
+        "used_paths": used_paths,
+        "chunk_ids": chunk_ids,
+        "token_usage": token_usage,
+        "latency_seconds": latency_seconds,
+        "created_at": time.time(),
+    }
+    with _lock:
+        repo = _repos.get(repo_id)
+        if repo is not None and _is_older(version, repo["version"]):
+            # Eski snapshot'a sabitlenmiş yavaş bir istek; yeni snapshot'ın kayıtları silinmez
+            return
+        if repo is None or repo["version"] != version or repo["vectors"].shape[1] != q.shape[0]:
+            repo = {"version": version, "vectors": np.zeros((0, q.shape[0]), dtype="float32"), "entries": []}
+            _repos[repo_id] = repo
+        repo["vectors"] = np.vstack([repo["vectors"], q[None, :]])
+        repo["entries"].append(entry)
+        # En eski kayıtlar düşer
+        overflow = len(repo["entries"]) - SEMANTIC_CACHE_MAX_ENTRIES_PER_REPO
+        if overflow > 0:
+            repo["vectors"] = repo["vectors"][overflow:]
+            repo["entries"] = repo["entries"][overflow:]
+
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["repos"] = len(_repos)
+        stats["entries"] = sum(len(r["entries"]) for r in _repos.values())
+    stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+    stats["saved_latency_seconds"] = round(stats["saved_latency_seconds"], 3)
+    stats["enabled"] = SEMANTIC_CACHE_ENABLED
+    return stats
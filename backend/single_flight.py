@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, TypeVar
+
+from .config import BUILD_LOCK_DIR, BUILD_LOCK_TIMEOUT_SECONDS, BUILD_LOCK_POLL_SECONDS
+
+try:  # fcntl sadece POSIX'te var; yoksa yalnızca process içi koruma yapılır
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("deepwiki")
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+# key -> lider çağrının sonucunu taşıyan Future
+_inflight: Dict[str, Future] = {}
+_stats: Dict[str, int] = {
+    "leaders": 0,
+    "coalesced": 0,
+    "lock_waits": 0,
+}
+
+
+def run_single_flight(key: str, fn: Callable[[], T]) -> T:
+    """
+    Aynı key için process içinde aynı anda tek bir fn çalışmasını sağlar.
+    Sonradan gelen çağrılar devam eden çalışmaya bağlanır ve aynı sonucu
+    (veya aynı hatayı) alır.
+    """
+    with _lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+            _stats["leaders"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        logger.info("Attaching to in-flight build key=%s", key)
+        return future.result()
+
+    try:
+        result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+@contextmanager
+def repo_build_lock(repo_id: str) -> Iterator[None]:
+    """
+    BUILD_LOCK_DIR/{repo_id}.lock üzerinde exclusive flock alır; paylaşılan
+    storage'daki diğer uvicorn worker'ları / pod'lar aynı repo'yu aynı anda build edemez.
+    Kilit BUILD_LOCK_TIMEOUT_SECONDS içinde alınamazsa TimeoutError yükselir.
+    Kilit, process ölse bile kernel tarafından bırakılır.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    BUILD_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    path = BUILD_LOCK_DIR / f"{repo_id}.lock"
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + BUILD_LOCK_TIMEOUT_SECONDS
+        waited = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waited:
+                    waited = True
+                    with _lock:
+                        _stats["lock_waits"] += 1
+                    logger.info("Waiting for build lock repo_id=%s held by another process", repo_id)
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for build lock of repo {repo_id}")
+                time.sleep(BUILD_LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def get_single_flight_stats() -> Dict[str, int]:
+    with _lock:
+        stats = dict(_stats)
+        stats["in_flight"] = len(_inflight)
+    stats["file_lock"] = fcntl is not None
+    return stats
@@ -1,13 +1,13 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from pathlib import Path
 
 
-def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+def split_text_with_offsets(text: str, chunk_size: int, overlap: int) -> List[Tuple[int, str]]:
     """
-    Çok basit bir karakter bazlı splitter.
-    Lite versiyon için yeterli; ileride token-bazlı hale getirilebilir.
+    split_text ile aynı bölme; her chunk'ın dosya içindeki başlangıç
+    offset'ini de döner: [(start, chunk), ...]
     """
-    chunks: List[str] = []
+    chunks: List[Tuple[int, str]] = []
     start = 0
     n = len(text)
 
@@ -17,7 +17,7 @@ def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
     while start < n:
         end = min(start + chunk_size, n)
         chunk = text[start:end]
-        chunks.append(chunk)
+        chunks.append((start, chunk))
         if end == n:
             break
         start = end - overlap
@@ -27,6 +27,14 @@ def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
     return chunks
 
 
+def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Çok basit bir karakter bazlı splitter.
+    Lite versiyon için yeterli; ileride token-bazlı hale getirilebilir.
+    """
+    return [chunk for _, chunk in split_text_with_offsets(text, chunk_size, overlap)]
+
+
 def build_documents_from_files(files) -> List[Dict]:
     """
     Dosyalardan doküman listesi üretir:
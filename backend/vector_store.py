@@ -1,59 +1,594 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable, Iterator, Optional
 
 import faiss
 import numpy as np
 import json
 
-from .config import FAISS_DIR
+from .config import (
+    FAISS_DIR,
+    INDEX_COMPACTION_THRESHOLD,
+    INDEX_CACHE_SIZE,
+    INDEX_KEEP_VERSIONS,
+    INDEX_GC_GRACE_SECONDS,
+    INDEX_GC_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger("deepwiki")
+
+
+def make_chunk_id(path: str, chunk_index: int) -> int:
+    """
+    (dosya yolu, chunk sırası) ikilisinden stabil, pozitif bir int64 ID üretir.
+    Aynı chunk tekrar index'lendiğinde aynı ID'yi alır; böylece upsert/delete
+    liste pozisyonlarına bağlı kalmadan yapılabilir.
+    """
+    digest = hashlib.blake2b(f"{path}:{chunk_index}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+class _ReadWriteLock:
+    """
+    Çok okuyuculu / tek yazıcılı kilit. Aramalar okuma tarafını paylaşır,
+    index'i değiştiren işlemler yazma tarafını tek başına alır.
+
+    - Bekleyen bir yazıcı varken yeni okuyucu alınmaz; yazıcılar aç kalmaz.
+    - Yazma kilidini tutan thread kilidi (okuma ya da yazma) yeniden alabilir.
+    - Okuma kilidi yeniden girişli değildir; okuma içinde tekrar okuma alınmamalı.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            nested = self._writer == me
+            if nested:
+                self._write_depth += 1
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                if nested:
+                    self._write_depth -= 1
+                else:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                except BaseException:
+                    # Bekleyen yazıcı yüzünden duran okuyucuları serbest bırak
+                    self._writers_waiting -= 1
+                    self._cond.notify_all()
+                    raise
+                self._writers_waiting -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._writer = None
+                    self._cond.notify_all()
 
 
 class FaissIndex:
-    def __init__(self, dim: int, index_path: Path, meta_path: Path):
+    """
+    IndexIDMap2(IndexFlatL2) üzerine kurulu, stabil chunk ID'li FAISS index'i.
+
+    - metadata: {chunk_id: {...}} şeklinde tutulur
+    - delete() vektörü hemen silmez, metadata'da tombstone ("deleted": True) bırakır
+    - Silinmiş oran INDEX_COMPACTION_THRESHOLD'u geçince arka planda compaction yapılır
+    """
+
+    def __init__(self, dim: int, index_path: Optional[Path] = None, meta_path: Optional[Path] = None):
         self.dim = dim
         self.index_path = index_path
         self.meta_path = meta_path
-        self.index = faiss.IndexFlatL2(dim)
-        self.metadata: List[Dict] = []
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+        self.metadata: Dict[int, Dict] = {}
+        # Tombstone'lu kayıt sayısı; her aramada metadata taranmasın diye
+        # upsert/delete/compact ve yükleme sırasında güncel tutulur
+        self._deleted_count = 0
+        # Snapshot'tan yüklendiyse hangi versiyon olduğu (bkz. load_current_index)
+        self.version: Optional[str] = None
+        # Aramalar okuma, add/upsert/delete/compact yazma tarafını alır
+        self._lock = _ReadWriteLock()
+        self._compaction_thread: Optional[threading.Thread] = None
 
-    def add(self, embeddings: List[List[float]], metadatas: List[Dict]):
+    # ------------------------------------------------------------------
+    # Boyut / durum bilgileri
+    # ------------------------------------------------------------------
+
+    @property
+    def deleted_count(self) -> int:
+        return self._deleted_count
+
+    @property
+    def live_count(self) -> int:
+        return len(self.metadata) - self.deleted_count
+
+    @property
+    def deleted_fraction(self) -> float:
+        total = len(self.metadata)
+        if total == 0:
+            return 0.0
+        return self._deleted_count / total
+
+    def _set_metadata(self, metadata: Dict[int, Dict]) -> None:
+        # Yükleme yolları metadata'yı toptan değiştirir; sayaç bir kez hesaplanır
+        self.metadata = metadata
+        self._deleted_count = sum(1 for m in metadata.values() if m.get("deleted"))
+
+    # ------------------------------------------------------------------
+    # Yazma işlemleri
+    # ------------------------------------------------------------------
+
+    def _to_vectors(self, embeddings: List[List[float]]) -> np.ndarray:
         vecs = np.array(embeddings, dtype="float32")
-        if vecs.shape[1] != self.dim:
-            raise ValueError(f"Embedding dimension mismatch: {vecs.shape[1]} != {self.dim}")
-        self.index.add(vecs)
-        self.metadata.extend(metadatas)
+        if vecs.ndim != 2 or vecs.shape[1] != self.dim:
+            got = vecs.shape[1] if vecs.ndim == 2 else vecs.shape
+            raise ValueError(f"Embedding dimension mismatch: {got} != {self.dim}")
+        return vecs
+
+    def add(self, embeddings: List[List[float]], metadatas: List[Dict]):
+        """
+        Geriye dönük uyumlu ekleme. Metadata'da "id" varsa o kullanılır,
+        yoksa sıradaki boş ID'ler atanır.
+        """
+        with self._lock.write():
+            next_id = max(self.metadata.keys(), default=-1) + 1
+            ids: List[int] = []
+            for meta in metadatas:
+                if "id" in meta:
+                    ids.append(int(meta["id"]))
+                else:
+                    ids.append(next_id)
+                    next_id += 1
+            self.upsert(ids, embeddings, metadatas)
+
+    def upsert(self, ids: List[int], embeddings: List[List[float]], metadatas: List[Dict]):
+        """
+        Verilen ID'ler için vektör + metadata ekler; ID zaten varsa (tombstone'lu
+        olsa bile) eski vektörü çıkarıp yenisiyle değiştirir.
+        """
+        if not (len(ids) == len(embeddings) == len(metadatas)):
+            raise ValueError("ids, embeddings and metadatas must have the same length")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in upsert batch")
+        if not ids:
+            return
+
+        vecs = self._to_vectors(embeddings)
+        id_arr = np.array(ids, dtype="int64")
+
+        with self._lock.write():
+            existing = [i for i in ids if i in self.metadata]
+            if existing:
+                self.index.remove_ids(np.array(existing, dtype="int64"))
+                # Tombstone'lu bir ID yeniden eklenince canlı kayda döner
+                self._deleted_count -= sum(1 for i in existing if self.metadata[i].get("deleted"))
+            self.index.add_with_ids(vecs, id_arr)
+            for chunk_id, meta in zip(ids, metadatas):
+                item = dict(meta)
+                item["id"] = chunk_id
+                item.pop("deleted", None)
+                self.metadata[chunk_id] = item
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """
+        Verilen ID'leri tombstone'lar; aramalarda artık dönmezler.
+        Fiziksel silme compaction ile yapılır. Tombstone'lanan kayıt sayısını döner.
+        """
+        count = 0
+        with self._lock.write():
+            for chunk_id in ids:
+                meta = self.metadata.get(int(chunk_id))
+                if meta is None or meta.get("deleted"):
+                    continue
+                meta["deleted"] = True
+                count += 1
+            self._deleted_count += count
+        if count:
+            self.maybe_compact()
+        return count
+
+    def compact(self) -> int:
+        """
+        Tombstone'lu kayıtları FAISS index'inden ve metadata'dan fiziksel olarak siler.
+        Silinen kayıt sayısını döner.
+        """
+        with self._lock.write():
+            if not self._deleted_count:
+                return 0
+            dead = [i for i, m in self.metadata.items() if m.get("deleted")]
+            self.index.remove_ids(np.array(dead, dtype="int64"))
+            for chunk_id in dead:
+                del self.metadata[chunk_id]
+            self._deleted_count = 0
+        logger.info("FAISS index compacted: removed=%d live=%d", len(dead), len(self.metadata))
+        return len(dead)
+
+    def maybe_compact(self, background: bool = True) -> bool:
+        """
+        Silinmiş oran eşiği geçtiyse compaction başlatır.
+        background=True iken compaction ayrı bir thread'de çalışır.
+        """
+        if self.deleted_fraction < INDEX_COMPACTION_THRESHOLD:
+            return False
+        if not background:
+            self.compact()
+            return True
+        with self._lock.write():
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return False
+            self._compaction_thread = threading.Thread(
+                target=self.compact,
+                name="faiss-compaction",
+                daemon=True,
+            )
+            self._compaction_thread.start()
+        return True
+
+    # ------------------------------------------------------------------
+    # Kalıcılık
+    # ------------------------------------------------------------------
 
     def save(self):
+        if self.index_path is None or self.meta_path is None:
+            raise ValueError("FaissIndex has no index/meta path to save to")
         self.index_path.parent.mkdir(parents=True, exist_ok=True)
-        faiss.write_index(self.index, str(self.index_path))
+        with self._lock.read():
+            faiss.write_index(self.index, str(self.index_path))
+            entries = [self.metadata[i] for i in sorted(self.metadata)]
         with self.meta_path.open("w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+            json.dump(entries, f, ensure_ascii=False, indent=2)
 
     @classmethod
     def load(cls, index_path: Path, meta_path: Path) -> "FaissIndex":
         index = faiss.read_index(str(index_path))
         with meta_path.open("r", encoding="utf-8") as f:
-            metadata = json.load(f)
+            entries = json.load(f)
         dim = index.d
         obj = cls(dim=dim, index_path=index_path, meta_path=meta_path)
+
+        if isinstance(index, faiss.IndexIDMap2):
+            obj.index = index
+            obj._set_metadata({int(m["id"]): m for m in entries})
+        else:
+            # Eski format: düz IndexFlatL2 + pozisyonel metadata listesi.
+            # Vektörleri pozisyon = ID olacak şekilde IndexIDMap2'ye taşıyoruz.
+            vecs = index.reconstruct_n(0, index.ntotal) if index.ntotal else None
+            if vecs is not None:
+                obj.index.add_with_ids(vecs, np.arange(index.ntotal, dtype="int64"))
+            obj.metadata = {}
+            for pos, meta in enumerate(entries[: index.ntotal]):
+                item = dict(meta)
+                item["id"] = pos
+                obj.metadata[pos] = item
+        return obj
+
+    def serialize(self) -> Tuple[bytes, List[Dict]]:
+        """
+        Index'i (FAISS byte'ları, ID sırasına göre metadata listesi) olarak döner;
+        wiki bundle'ları dosya yazmadan index taşımak için kullanır.
+        """
+        with self._lock.read():
+            data = faiss.serialize_index(self.index).tobytes()
+            entries = [self.metadata[i] for i in sorted(self.metadata)]
+        return data, entries
+
+    @classmethod
+    def deserialize(cls, data: bytes, entries: List[Dict]) -> "FaissIndex":
+        index = faiss.deserialize_index(np.frombuffer(data, dtype="uint8"))
+        if not isinstance(index, faiss.IndexIDMap2):
+            raise ValueError("Serialized index is not an IndexIDMap2")
+        obj = cls(dim=index.d)
         obj.index = index
-        obj.metadata = metadata
+        obj._set_metadata({int(m["id"]): m for m in entries})
         return obj
 
-    def search(self, query_emb: List[float], top_k: int = 8) -> List[Dict]:
-        q = np.array([query_emb], dtype="float32")
-        distances, indices = self.index.search(q, top_k)
+    # ------------------------------------------------------------------
+    # Arama
+    # ------------------------------------------------------------------
+
+    def reconstruct(self, ids: List[int]) -> np.ndarray:
+        """
+        Verilen chunk ID'lerinin vektörlerini (len(ids), dim) dizisi olarak döner.
+        """
+        with self._lock.read():
+            if not ids:
+                return np.zeros((0, self.dim), dtype="float32")
+            return np.vstack([self.index.reconstruct(int(i)) for i in ids])
+
+    def _collect_hits(self, distances: np.ndarray, ids: np.ndarray, top_k: int) -> List[Dict]:
+        # self._lock okuma tarafı tutulurken çağrılır
         results: List[Dict] = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < 0 or idx >= len(self.metadata):
+        for dist, chunk_id in zip(distances, ids):
+            if chunk_id < 0:
+                continue
+            meta = self.metadata.get(int(chunk_id))
+            if meta is None or meta.get("deleted"):
                 continue
-            item = dict(self.metadata[idx])
+            item = dict(meta)
             item["score"] = float(dist)
             results.append(item)
+            if len(results) >= top_k:
+                break
         return results
 
+    def search(self, query_emb: List[float], top_k: int = 8) -> List[Dict]:
+        return self.search_batch([query_emb], top_k=top_k)[0]
+
+    def search_batch(self, query_embs: List[List[float]], top_k: int = 8) -> List[List[Dict]]:
+        """
+        Birden fazla sorguyu tek FAISS çağrısıyla arar; FAISS sorguları kendi
+        içinde paralel işler. Sonuçlar sorgu sırasıyla döner.
+        """
+        if not query_embs:
+            return []
+        q = np.array(query_embs, dtype="float32")
+        with self._lock.read():
+            # Tombstone'lu kayıtlar sonuçlardan düşeceği için o kadar fazlasını istiyoruz
+            k = min(top_k + self._deleted_count, self.index.ntotal)
+            if k <= 0:
+                return [[] for _ in query_embs]
+            distances, ids = self.index.search(q, k)
+            return [self._collect_hits(distances[row], ids[row], top_k) for row in range(len(query_embs))]
+
 
 def get_index_paths(repo_id: str) -> Tuple[Path, Path]:
+    """
+    Eski (versiyonsuz) düzendeki index yolları. Sadece geriye dönük uyumluluk
+    için okunur; yeni build'ler snapshot dizinlerine yazılır.
+    """
     index_path = FAISS_DIR / f"{repo_id}.index"
     meta_path = FAISS_DIR / f"{repo_id}.meta.json"
-    return index_path, meta_path
\ No newline at end of file
+    return index_path, meta_path
+
+
+# -----------------------------------------------------------------------------
+# Versiyonlu snapshot'lar
+#
+# FAISS_DIR/{repo_id}/
+#   CURRENT                      -> yayındaki versiyonun adı (atomic rename ile güncellenir)
+#   versions/{version}/index.faiss
+#   versions/{version}/meta.json
+#
+# Her build yeni bir versiyon dizinine yazılır ve ancak tamamen yazıldıktan
+# sonra CURRENT işaretçisi değiştirilir. Okuyucular ya eski ya da yeni
+# snapshot'ın tamamını görür; index ile metadata asla karışmaz.
+# -----------------------------------------------------------------------------
+
+_CURRENT_FILE = "CURRENT"
+_VERSIONS_DIR = "versions"
+
+_cache_lock = threading.Lock()
+_index_cache: "OrderedDict[Tuple[str, str], FaissIndex]" = OrderedDict()
+_pinned_versions: Dict[Tuple[str, str], int] = {}
+
+
+def _repo_snapshot_dir(repo_id: str) -> Path:
+    return FAISS_DIR / repo_id
+
+
+def _snapshot_paths(repo_id: str, version: str) -> Tuple[Path, Path]:
+    version_dir = _repo_snapshot_dir(repo_id) / _VERSIONS_DIR / version
+    return version_dir / "index.faiss", version_dir / "meta.json"
+
+
+def get_current_version(repo_id: str) -> Optional[str]:
+    current_path = _repo_snapshot_dir(repo_id) / _CURRENT_FILE
+    try:
+        version = current_path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def index_exists(repo_id: str) -> bool:
+    if get_current_version(repo_id):
+        return True
+    index_path, meta_path = get_index_paths(repo_id)
+    return index_path.exists() and meta_path.exists()
+
+
+def list_indexed_repo_ids() -> List[str]:
+    """
+    Yayında snapshot'ı (veya eski düzende index dosyası) bulunan tüm repo_id'ler.
+    """
+    if not FAISS_DIR.exists():
+        return []
+    repo_ids = set()
+    for entry in FAISS_DIR.iterdir():
+        if entry.is_dir() and (entry / _CURRENT_FILE).exists():
+            repo_ids.add(entry.name)
+        elif entry.is_file() and entry.name.endswith(".index"):
+            repo_ids.add(entry.name[: -len(".index")])
+    return sorted(repo_ids)
+
+
+def publish_index(repo_id: str, index: FaissIndex) -> str:
+    """
+    Index'i yeni bir versiyon dizinine yazar ve CURRENT işaretçisini atomik
+    olarak bu versiyona çevirir. Yayınlanan versiyon adını döner.
+    """
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    index_path, meta_path = _snapshot_paths(repo_id, version)
+    index.index_path = index_path
+    index.meta_path = meta_path
+    index.save()
+
+    repo_dir = _repo_snapshot_dir(repo_id)
+    tmp_path = repo_dir / f".{_CURRENT_FILE}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    with tmp_path.open("w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, repo_dir / _CURRENT_FILE)
+
+    index.version = version
+    # Yayınlayan process index'i diskten tekrar okumasın
+    _cache_index(repo_id, index)
+    logger.info("Published FAISS snapshot repo_id=%s version=%s", repo_id, version)
+    return version
+
+
+def _cache_index(repo_id: str, index: FaissIndex) -> None:
+    key = (repo_id, index.version)
+    with _cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def load_current_index(repo_id: str) -> FaissIndex:
+    """
+    Yayındaki snapshot'ı döner. Aynı versiyon process içinde cache'lenir;
+    böylece her istek index'i diskten tekrar okumaz.
+    Snapshot yoksa eski düzendeki {repo_id}.index dosyalarına düşer.
+    """
+    version = get_current_version(repo_id)
+    if version is None:
+        index_path, meta_path = get_index_paths(repo_id)
+        if not index_path.exists() or not meta_path.exists():
+            raise FileNotFoundError(f"Index not found for repo: {repo_id}")
+        return FaissIndex.load(index_path, meta_path)
+
+    key = (repo_id, version)
+    with _cache_lock:
+        cached = _index_cache.get(key)
+        if cached is not None:
+            _index_cache.move_to_end(key)
+            return cached
+
+    index_path, meta_path = _snapshot_paths(repo_id, version)
+    index = FaissIndex.load(index_path, meta_path)
+    index.version = version
+    _cache_index(repo_id, index)
+    return index
+
+
+@contextmanager
+def acquire_index(repo_id: str) -> Iterator[FaissIndex]:
+    """
+    İstek süresince tek bir snapshot'ı sabitler. Bu sırada yeni bir versiyon
+    yayınlansa bile istek aynı index ile tamamlanır ve GC bu versiyonu silmez.
+    """
+    index = load_current_index(repo_id)
+    key = (repo_id, index.version) if index.version else None
+    if key is not None:
+        with _cache_lock:
+            _pinned_versions[key] = _pinned_versions.get(key, 0) + 1
+    try:
+        yield index
+    finally:
+        if key is not None:
+            with _cache_lock:
+                remaining = _pinned_versions.get(key, 1) - 1
+                if remaining <= 0:
+                    _pinned_versions.pop(key, None)
+                else:
+                    _pinned_versions[key] = remaining
+
+
+def gc_index_snapshots(
+    keep: int = INDEX_KEEP_VERSIONS,
+    grace_seconds: float = INDEX_GC_GRACE_SECONDS,
+) -> int:
+    """
+    Her repo için CURRENT + en yeni `keep` versiyon dışındaki snapshot'ları siler.
+    Yeni yazılmış (grace süresinden genç) veya bu process'te kullanımda olan
+    versiyonlara dokunulmaz. Silinen versiyon sayısını döner.
+    """
+    if not FAISS_DIR.exists():
+        return 0
+
+    removed = 0
+    now = time.time()
+    for repo_dir in FAISS_DIR.iterdir():
+        versions_dir = repo_dir / _VERSIONS_DIR
+        if not versions_dir.is_dir():
+            continue
+        repo_id = repo_dir.name
+        current = get_current_version(repo_id)
+
+        # Versiyon adları zaman damgasıyla başladığı için isim sırası = zaman sırası
+        candidates = sorted(
+            (p for p in versions_dir.iterdir() if p.is_dir() and p.name != current),
+            key=lambda p: p.name,
+            reverse=True,
+        )
+        for version_dir in candidates[keep:]:
+            key = (repo_id, version_dir.name)
+            try:
+                if now - version_dir.stat().st_mtime < grace_seconds:
+                    continue
+            except FileNotFoundError:
+                continue
+            with _cache_lock:
+                if _pinned_versions.get(key):
+                    continue
+                # Cache'ten yalnızca gerçekten silinecek versiyon çıkarılır
+                _index_cache.pop(key, None)
+            shutil.rmtree(version_dir, ignore_errors=True)
+            removed += 1
+            logger.info("GC removed FAISS snapshot repo_id=%s version=%s", repo_id, version_dir.name)
+    return removed
+
+
+_gc_thread: Optional[threading.Thread] = None
+
+
+def start_snapshot_gc(interval_seconds: float = INDEX_GC_INTERVAL_SECONDS) -> None:
+    """
+    Eski snapshot'ları periyodik olarak temizleyen daemon thread'i başlatır.
+    Birden fazla çağrılırsa tek thread çalışır.
+    """
+    global _gc_thread
+    if _gc_thread is not None and _gc_thread.is_alive():
+        return
+
+    def _loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                gc_index_snapshots()
+            except Exception:
+                logger.exception("FAISS snapshot GC failed")
+
+    _gc_thread = threading.Thread(target=_loop, name="faiss-snapshot-gc", daemon=True)
+    _gc_thread.start()
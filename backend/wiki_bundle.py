@@ -0,0 +1,385 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import BUNDLE_DIR, BUNDLE_MAX_ENTRY_BYTES, BUNDLE_MAX_TOTAL_BYTES, WIKI_DIR
+from .models import WikiSection
+from .vector_store import FaissIndex, acquire_index, index_exists, publish_index
+from .wiki_generator import (
+    WIKI_RENDERER_VERSION,
+    iter_full_wiki_html,
+    page_deps_path,
+    render_section_fragments,
+)
+from .html_cache import write_html_stream
+from .render_cache import render_cache_key, put_rendered
+from .single_flight import repo_build_lock
+
+logger = logging.getLogger("deepwiki")
+
+# Tek dosyalık wiki bundle formatı (little-endian):
+#
+#   header: magic (8 byte) | format versiyonu (u32) | TOC uzunluğu (u64)
+#   TOC:    JSON {"entries": [{"name", "offset", "length", "codec", "hash"}]}
+#   data:   entry'lerin byte'ları art arda; offset data bölümünün başına göredir
+#
+# TOC başta olduğundan her entry'ye (ör. yalnızca manifest) seek ile doğrudan
+# erişilebilir; import dosyayı entry entry okur (bkz. BundleReader).
+#
+# Entry'ler:
+#   manifest.json, outline.json, metadata.json (kompakt JSON)
+#   index.faiss                     FAISS IndexIDMap2 byte'ları
+#   pages/{section_id}.md           sayfa markdown'u
+#   deps/{section_id}.json          artımlı üretim bağımlılık kaydı (varsa)
+#   fragments/{section_id}.html     render edilmiş section HTML'i
+BUNDLE_MAGIC = b"DWBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIQ")
+
+# Vektörler neredeyse sıkıştırılamadığından index ham yazılır; metin entry'leri zlib'lenir
+_RAW_ENTRIES = ("index.faiss",)
+
+# repo_id ve section id'leri dosya adlarına girer; bundle'dan gelen değerler yalnızca
+# normalize_repo_id'nin ürettiği karakterlerden oluşabilir ("/", "..", NUL yok)
+_SAFE_ID_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,199}")
+
+
+class WikiBundleError(ValueError):
+    """Bundle dosyası bozuk, eksik veya desteklenmeyen bir formatta."""
+
+
+def _check_safe_id(kind: str, value: Any) -> str:
+    if not isinstance(value, str) or not _SAFE_ID_RE.fullmatch(value) or ".." in value:
+        raise WikiBundleError(f"Bundle has an invalid {kind}: {value!r}")
+    return value
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _compact_json(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_bundle(path: Path, entries: List[Tuple[str, bytes]]) -> None:
+    """
+    (ad, byte'lar) listesini bundle olarak atomik yazar. Her entry'nin hash'i
+    sıkıştırılmamış içerik üzerinden TOC'a yazılır.
+    """
+    toc: List[Dict[str, Any]] = []
+    blobs: List[bytes] = []
+    offset = 0
+    for name, data in entries:
+        codec = "raw" if name in _RAW_ENTRIES else "zlib"
+        blob = data if codec == "raw" else zlib.compress(data, 6)
+        toc.append({"name": name, "offset": offset, "length": len(blob), "codec": codec, "hash": _hash(data)})
+        blobs.append(blob)
+        offset += len(blob)
+    toc_bytes = _compact_json({"entries": toc})
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.parent / f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(toc_bytes)))
+            f.write(toc_bytes)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _parse_header(header: bytes) -> int:
+    if len(header) < _HEADER.size:
+        raise WikiBundleError("File is too short to be a wiki bundle")
+    magic, version, toc_length = _HEADER.unpack(header[: _HEADER.size])
+    if magic != BUNDLE_MAGIC:
+        raise WikiBundleError("Not a wiki bundle (bad magic)")
+    if version != BUNDLE_FORMAT_VERSION:
+        raise WikiBundleError(f"Unsupported wiki bundle format version {version}")
+    return toc_length
+
+
+def _decode_entry(entry: Dict[str, Any], blob: bytes, max_bytes: int) -> bytes:
+    """
+    Entry'yi açar ve hash'ini doğrular. Açılmış boyut max_bytes'ı aşarsa (ör.
+    küçük ama çok iyi sıkışan, bellek şişirmeye yönelik bir entry) hata verir.
+    """
+    if len(blob) != entry["length"]:
+        raise WikiBundleError(f"Truncated bundle entry {entry['name']}")
+    if entry["codec"] == "zlib":
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(blob, max_bytes)
+        except zlib.error as e:
+            raise WikiBundleError(f"Corrupt bundle entry {entry['name']}: {e}")
+        if decompressor.unconsumed_tail:
+            raise WikiBundleError(f"Bundle entry {entry['name']} exceeds the size limit")
+        if not decompressor.eof:
+            raise WikiBundleError(f"Truncated bundle entry {entry['name']}")
+    elif entry["codec"] == "raw":
+        if len(blob) > max_bytes:
+            raise WikiBundleError(f"Bundle entry {entry['name']} exceeds the size limit")
+        data = bytes(blob)
+    else:
+        raise WikiBundleError(f"Unknown codec for bundle entry {entry['name']}")
+    if _hash(data) != entry["hash"]:
+        raise WikiBundleError(f"Checksum mismatch for bundle entry {entry['name']}")
+    return data
+
+
+def _read_toc(f) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    # (data bölümünün başlangıcı, ad -> TOC kaydı); kayıtlar şekil olarak doğrulanır
+    toc_length = _parse_header(f.read(_HEADER.size))
+    try:
+        entries = json.loads(f.read(toc_length))["entries"]
+        toc = {e["name"]: e for e in entries}
+    except (ValueError, KeyError, TypeError) as e:
+        raise WikiBundleError(f"Corrupt bundle table of contents: {e}")
+    for entry in toc.values():
+        if not (
+            isinstance(entry.get("offset"), int)
+            and isinstance(entry.get("length"), int)
+            and entry["offset"] >= 0
+            and entry["length"] >= 0
+        ):
+            raise WikiBundleError(f"Corrupt bundle table of contents entry {entry.get('name')!r}")
+    return _HEADER.size + toc_length, toc
+
+
+def read_bundle_toc(path: Path) -> List[Dict[str, Any]]:
+    with path.open("rb") as f:
+        return list(_read_toc(f)[1].values())
+
+
+class BundleReader:
+    """
+    Bundle'daki entry'leri TOC üzerinden tek tek (seek ile) okur; dosyanın
+    tamamı belleğe alınmaz. Açılmış boyut entry başına BUNDLE_MAX_ENTRY_BYTES,
+    toplamda BUNDLE_MAX_TOTAL_BYTES ile sınırlıdır.
+
+        with BundleReader(path) as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+    """
+
+    def __init__(self, path: Path):
+        self._file = path.open("rb")
+        try:
+            self._data_start, self._toc = _read_toc(self._file)
+        except BaseException:
+            self._file.close()
+            raise
+        self._decoded_bytes = 0
+
+    def __enter__(self) -> "BundleReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._toc
+
+    def read(self, name: str) -> bytes:
+        entry = self._toc.get(name)
+        if entry is None:
+            raise KeyError(name)
+        remaining = BUNDLE_MAX_TOTAL_BYTES - self._decoded_bytes
+        self._file.seek(self._data_start + entry["offset"])
+        data = _decode_entry(entry, self._file.read(entry["length"]), min(BUNDLE_MAX_ENTRY_BYTES, remaining))
+        self._decoded_bytes += len(data)
+        return data
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self.read(name) if name in self._toc else None
+
+
+def read_bundle_entry(path: Path, name: str) -> bytes:
+    """
+    TOC üzerinden tek bir entry'yi okur; dosyanın geri kalanı okunmaz.
+    """
+    with BundleReader(path) as bundle:
+        return bundle.read(name)
+
+
+def bundle_path(repo_id: str) -> Path:
+    return BUNDLE_DIR / f"{repo_id}.dwb"
+
+
+def export_wiki_bundle(repo_id: str, path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Repo'nun kalıcı wiki'sini (outline, sayfalar, bağımlılık kayıtları, render
+    edilmiş fragment'lar) ve yayındaki FAISS snapshot'ını tek bir bundle dosyasına
+    yazar. Diskte olmayan (üretilememiş) sayfalar bundle'a girmez. Build kilidi
+    alınamazsa TimeoutError yükselir. Manifest'i döner.
+    """
+    path = path or bundle_path(repo_id)
+    outline_path = WIKI_DIR / f"{repo_id}_outline.json"
+    # Sayfalar, bağımlılık kayıtları ve index aynı build'e ait olsun diye
+    # toplama boyunca build kilidi tutulur; bundle dosyası kilit dışında yazılır
+    with repo_build_lock(repo_id):
+        if not outline_path.exists() or not index_exists(repo_id):
+            raise FileNotFoundError(f"Wiki or index not found for repo: {repo_id}")
+        outline = json.loads(outline_path.read_text(encoding="utf-8"))
+        sections = [WikiSection(**s) for s in outline]
+
+        pages: List[Tuple[WikiSection, str]] = []
+        deps: Dict[str, bytes] = {}
+        for section in sections:
+            page_path = WIKI_DIR / f"{repo_id}_{section.id}.md"
+            if page_path.exists():
+                pages.append((section, page_path.read_text(encoding="utf-8")))
+                deps_path = page_deps_path(repo_id, section.id)
+                if deps_path.exists():
+                    deps[section.id] = deps_path.read_bytes()
+
+        with acquire_index(repo_id) as index:
+            index_bytes, metadata = index.serialize()
+            index_version = index.version
+            dim = index.dim
+
+    fragments = render_section_fragments([markdown_text for _, markdown_text in pages])
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "repo_id": repo_id,
+        "created_at": time.time(),
+        "index_version": index_version,
+        "renderer_version": WIKI_RENDERER_VERSION,
+        "dim": dim,
+        "chunks": len(metadata),
+        "sections": len(sections),
+        "pages": len(pages),
+    }
+    entries: List[Tuple[str, bytes]] = [
+        ("manifest.json", _compact_json(manifest)),
+        ("outline.json", _compact_json(outline)),
+    ]
+    for (section, markdown_text), fragment in zip(pages, fragments):
+        entries.append((f"pages/{section.id}.md", markdown_text.encode("utf-8")))
+        entries.append((f"fragments/{section.id}.html", fragment.encode("utf-8")))
+        if section.id in deps:
+            entries.append((f"deps/{section.id}.json", deps[section.id]))
+    entries.append(("metadata.json", _compact_json(metadata)))
+    entries.append(("index.faiss", index_bytes))
+
+    write_bundle(path, entries)
+    logger.info(
+        "Exported wiki bundle repo_id=%s pages=%d chunks=%d bytes=%d",
+        repo_id,
+        len(pages),
+        len(metadata),
+        path.stat().st_size,
+    )
+    return manifest
+
+
+def import_wiki_bundle(path: Path) -> Dict[str, Any]:
+    """
+    Bundle'ı entry entry okuyup bu node'a kurar:
+    outline / sayfa / bağımlılık dosyalarını WIKI_DIR'e yazar, tam HTML'i
+    fragment'lardan üretir, index'i yeni bir snapshot olarak yayınlar (ve
+    process cache'ine koyar). Hiçbir LLM / embedding çağrısı yapılmaz.
+    Aynı repo'nun build'iyle çakışmaması için repo build kilidi alınır.
+    Yayınlanan index versiyonunu içeren manifest'i döner.
+    """
+    with BundleReader(path) as bundle:
+        return _import_from_reader(bundle)
+
+
+def _import_from_reader(bundle: BundleReader) -> Dict[str, Any]:
+    try:
+        manifest = json.loads(bundle.read("manifest.json"))
+        outline = json.loads(bundle.read("outline.json"))
+        metadata = json.loads(bundle.read("metadata.json"))
+        index_bytes = bundle.read("index.faiss")
+    except KeyError as e:
+        raise WikiBundleError(f"Bundle is missing required entry {e}")
+    except ValueError as e:
+        raise WikiBundleError(f"Corrupt bundle entry: {e}")
+    if not isinstance(manifest, dict) or not isinstance(outline, list) or not isinstance(metadata, list):
+        raise WikiBundleError("Bundle manifest, outline or metadata has an unexpected shape")
+    # Dosya yollarına girecek her şey kilit alınmadan ve diske dokunmadan doğrulanır
+    repo_id = _check_safe_id("repo_id", manifest.get("repo_id"))
+    try:
+        sections = [WikiSection(**s) for s in outline]
+    except (TypeError, ValueError) as e:
+        raise WikiBundleError(f"Bundle outline is invalid: {e}")
+    for section in sections:
+        _check_safe_id("section id", section.id)
+    # Render mantığı değiştiyse fragment'lara güvenilmez, markdown'dan yeniden üretilir
+    fragments_usable = manifest.get("renderer_version") == WIKI_RENDERER_VERSION
+
+    try:
+        index = FaissIndex.deserialize(index_bytes, metadata)
+    except (RuntimeError, ValueError, KeyError, TypeError) as e:
+        # FAISS bozuk byte'larda RuntimeError yükseltir
+        raise WikiBundleError(f"Bundle index is invalid: {e}")
+    if manifest.get("dim") != index.dim:
+        raise WikiBundleError(
+            f"Bundle index dimension {index.dim} does not match manifest dim {manifest.get('dim')!r}"
+        )
+    del index_bytes
+    # Sayfa entry'leri de yazmaya başlamadan okunup doğrulanır; bozuk bir entry
+    # yarım kalmış bir import bırakmaz
+    page_entries: Dict[str, bytes] = {}
+    for section in sections:
+        for name in (f"pages/{section.id}.md", f"deps/{section.id}.json", f"fragments/{section.id}.html"):
+            data = bundle.get(name)
+            if data is None:
+                continue
+            try:
+                data.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise WikiBundleError(f"Bundle entry {name} is not valid UTF-8: {e}")
+            page_entries[name] = data
+
+    with repo_build_lock(repo_id):
+        WIKI_DIR.mkdir(parents=True, exist_ok=True)
+        (WIKI_DIR / f"{repo_id}_outline.json").write_text(
+            json.dumps(outline, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        fragments: List[str] = []
+        for section in sections:
+            page = page_entries.get(f"pages/{section.id}.md")
+            if page is None:
+                fragments.append('<p class="dw-pending">This page is not included in the bundle.</p>')
+                continue
+            markdown_text = page.decode("utf-8")
+            (WIKI_DIR / f"{repo_id}_{section.id}.md").write_text(markdown_text, encoding="utf-8")
+            deps = page_entries.get(f"deps/{section.id}.json")
+            if deps is not None:
+                page_deps_path(repo_id, section.id).write_bytes(deps)
+            fragment = page_entries.get(f"fragments/{section.id}.html")
+            if fragments_usable and fragment is not None:
+                fragment_html = fragment.decode("utf-8")
+                put_rendered(render_cache_key(markdown_text, WIKI_RENDERER_VERSION), fragment_html)
+            else:
+                fragment_html = render_section_fragments([markdown_text])[0]
+            fragments.append(fragment_html)
+
+        write_html_stream(
+            WIKI_DIR / f"{repo_id}_wiki.html",
+            iter_full_wiki_html(repo_id, sections, fragments),
+        )
+        version = publish_index(repo_id, index)
+
+    logger.info(
+        "Imported wiki bundle repo_id=%s pages=%d chunks=%d as index version %s",
+        repo_id,
+        manifest.get("pages", 0),
+        len(metadata),
+        version,
+    )
+    return {**manifest, "index_version": version}
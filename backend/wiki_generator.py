@@ -1,18 +1,43 @@
 # backend/wiki_generator.py
 
+import hashlib
 import json
+import logging
 import re
+import shutil
+import threading
+import time
 import html as html_lib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable, Iterator, Optional
 
 import markdown as md
-import faiss
-import numpy as np
 
-from .config import WIKI_DIR, CHUNK_SIZE, CHUNK_OVERLAP
-from .repo_analyzer import build_file_tree_summary, iter_repo_files
-from .text_splitter import build_documents_from_files, split_text
+from .config import (
+    WIKI_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    WIKI_PAGE_CONCURRENCY,
+    WIKI_PAGE_MAX_RETRIES,
+    WIKI_PAGE_RETRY_BACKOFF_SECONDS,
+    WIKI_PAGE_MIN_DEP_OVERLAP,
+    WIKI_RENDER_PARALLEL_MIN_SECTIONS,
+    REPO_DIR,
+    ARCHITECTURE_UPDATE_MAX_CHANGED_FRACTION,
+    ARCHITECTURE_DIFF_TOKEN_BUDGET,
+)
+from .repo_analyzer import (
+    build_repo_structure_summary,
+    iter_repo_files,
+    clone_or_update_repo,
+    clone_repo_temp,
+    normalize_repo_id,
+    get_head_commit,
+    list_tracked_files,
+    summarize_repo_changes,
+)
+from .text_splitter import build_documents_from_files, split_text_with_offsets
 from .embeddings import EmbeddingClient
 from .chat_client import ChatClient
 from .prompts import (
@@ -20,15 +45,57 @@ from .prompts import (
     WIKI_OUTLINE_USER_TEMPLATE,
     WIKI_PAGE_SYSTEM_PROMPT,
     WIKI_PAGE_USER_TEMPLATE,
+    ARCHITECTURE_UPDATE_SYSTEM_PROMPT,
+    ARCHITECTURE_UPDATE_USER_TEMPLATE,
 )
 from .models import WikiSection, WikiPage, LLMConfig
-from .vector_store import FaissIndex, get_index_paths
+from .vector_store import FaissIndex, acquire_index, index_exists, make_chunk_id, publish_index
 from .deep_research import run_deep_research
+from .retrieval import retrieve
+from .context_packer import pack_context
+from .single_flight import run_single_flight, repo_build_lock
+from .executors import run_cpu, map_cpu
+from .ephemeral_wikis import store_ephemeral_wiki
+from .html_cache import write_html_stream
+from .render_cache import render_cache_key, get_rendered, put_rendered
+from .architecture_cache import (
+    load_architecture_doc,
+    save_architecture_doc,
+    record_architecture_outcome,
+)
 
+logger = logging.getLogger("deepwiki")
 
-def prepare_repo_index(repo_id: str, repo_path: Path, llm: LLMConfig) -> None:
+# Pipeline ilerleme bildirimi: (aşama adı, aşama içi tamamlanma oranı 0..1)
+ProgressCallback = Callable[[str, float], None]
+
+HIGH_LEVEL_ARCHITECTURE_QUESTION = (
+    "Provide a high-level architecture overview of this repository. Describe "
+    "the main components, services, data flows and how they interact. "
+    "If helpful, include a single Mermaid diagram (flow chart or sequence "
+    "diagram) using the allowed templates to visualise the overall architecture."
+)
+
+
+# Section render çıktısını değiştiren her değişiklikte (markdown extension'ları,
+# mermaid dönüşümü, fragment yapısı) artırılır; render cache'ini geçersiz kılar
+WIKI_RENDERER_VERSION = 1
+
+_MERMAID_CODE_BLOCK_RE = re.compile(r"<pre><code[^>]*>(.*?)</code></pre>", re.DOTALL)
+
+# Markdown örnekleri thread-safe değil; her thread (ve pool process'i) kendi
+# converter'ını bir kez kurup reset() ile yeniden kullanır
+_markdown_local = threading.local()
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _build_chunks(repo_path: Path) -> Tuple[List[str], List[Dict[str, Any]]]:
     """
-    Repo dosyalarını okuyup chunk'lar, embedding üretir ve FAISS index kaydeder.
+    Repo dosyalarını okuyup chunk'lar; chunk metinleri ve metadata listesini döner.
+    Metadata'da stabil chunk ID'si ve chunk'ın dosya içindeki [start, end) aralığı bulunur.
     """
     files = iter_repo_files(repo_path)
     docs = build_documents_from_files(files)
@@ -36,64 +103,121 @@ def prepare_repo_index(repo_id: str, repo_path: Path, llm: LLMConfig) -> None:
         raise ValueError("No documents found in repository")
 
     chunks: List[str] = []
-    metadatas: List[Dict] = []
+    metadatas: List[Dict[str, Any]] = []
 
     for doc in docs:
-        doc_chunks = split_text(doc["text"], CHUNK_SIZE, CHUNK_OVERLAP)
-        for i, ch in enumerate(doc_chunks):
+        rel_path = Path(doc["path"]).relative_to(repo_path).as_posix()
+        doc_chunks = split_text_with_offsets(doc["text"], CHUNK_SIZE, CHUNK_OVERLAP)
+        for i, (start, ch) in enumerate(doc_chunks):
             chunks.append(ch)
             metadatas.append(
                 {
+                    # Repo içi yol + chunk sırasından türeyen stabil ID
+                    "id": make_chunk_id(rel_path, i),
                     "doc_id": doc["id"],
                     "chunk_id": i,
                     "path": doc["path"],
+                    "start": start,
+                    "end": start + len(ch),
+                    # Sayfa bağımlılık takibi için chunk içeriğinin hash'i
+                    "hash": _content_hash(ch),
                     "text": ch[:5000],
                 }
             )
 
+    return chunks, metadatas
+
+
+def _copy_published_index(repo_id: str) -> Optional[FaissIndex]:
+    """
+    Yayındaki snapshot'ın değiştirilebilir bir kopyasını döner; yoksa None.
+    Yayındaki index'in kendisi okuyucularla paylaşıldığı için değiştirilmez.
+    """
+    if not index_exists(repo_id):
+        return None
+    try:
+        with acquire_index(repo_id) as current:
+            data, entries = current.serialize()
+        return FaissIndex.deserialize(data, entries)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.warning("Could not copy published index repo_id=%s: %s", repo_id, e)
+        return None
+
+
+def prepare_repo_index(repo_id: str, repo_path: Path, llm: LLMConfig) -> None:
+    """
+    Repo dosyalarını okuyup chunk'lar, embedding üretir ve FAISS index kaydeder.
+
+    Yayında bir snapshot varsa artımlı çalışır: ID'si ve içerik hash'i aynı kalan
+    (ve aynı embedding modeliyle üretilmiş) chunk'ların vektörleri yeniden
+    kullanılır, sadece yeni/değişen chunk'lar embed edilip upsert edilir, repoda
+    artık olmayan chunk'lar silinip compaction yapılır.
+    """
+    # Dosya okuma + chunking saf Python CPU işi; GIL'i tutmaması için process pool'da
+    chunks, metadatas = run_cpu(_build_chunks, repo_path)
+    for meta in metadatas:
+        meta["embed_model"] = llm.embed_model
+
+    index = _copy_published_index(repo_id)
+    reused_ids: List[int] = []
+    to_embed: List[int] = []
+    for pos, meta in enumerate(metadatas):
+        old = index.metadata.get(meta["id"]) if index is not None else None
+        if (
+            old is not None
+            and not old.get("deleted")
+            and old.get("hash") == meta["hash"]
+            and old.get("embed_model") == llm.embed_model
+        ):
+            reused_ids.append(meta["id"])
+        else:
+            to_embed.append(pos)
+
     embed_client = EmbeddingClient(llm)
-    embeddings = embed_client.embed_texts(chunks)
-    if not embeddings:
+    embeddings = embed_client.embed_texts([chunks[pos] for pos in to_embed])
+    if not embeddings and not reused_ids:
         raise ValueError("No embeddings created for repository")
 
-    dim = len(embeddings[0])
+    if index is None or not reused_ids:
+        # Yeniden kullanılacak vektör yok (ilk build ya da embedding modeli değişti)
+        index = FaissIndex(dim=len(embeddings[0]))
+        index.add(embeddings, metadatas)
+    else:
+        live_ids = {meta["id"] for meta in metadatas}
+        removed = index.delete([i for i in index.metadata if i not in live_ids])
+        # Değişmeyen chunk'ların offset/path bilgisi de güncel metadata ile yazılır
+        reused_vecs = index.reconstruct(reused_ids)
+        reused_meta = {meta["id"]: meta for meta in metadatas}
+        index.upsert(
+            reused_ids + [metadatas[pos]["id"] for pos in to_embed],
+            reused_vecs.tolist() + embeddings,
+            [reused_meta[i] for i in reused_ids] + [metadatas[pos] for pos in to_embed],
+        )
+        index.compact()
+        logger.info(
+            "Incremental index update repo_id=%s reused=%d embedded=%d removed=%d",
+            repo_id,
+            len(reused_ids),
+            len(to_embed),
+            removed,
+        )
 
-    index_path, meta_path = get_index_paths(repo_id)
-    index = FaissIndex(dim=dim, index_path=index_path, meta_path=meta_path)
-    index.add(embeddings, metadatas)
-    index.save()
+    # Yeni versiyon dizinine yazılır, CURRENT işaretçisi atomik olarak güncellenir
+    publish_index(repo_id, index)
 
 
 def build_in_memory_index(
     repo_path: Path,
     llm: LLMConfig,
-) -> Tuple[faiss.IndexFlatL2, List[Dict[str, Any]]]:
+) -> FaissIndex:
     """
     Stateless / in-memory MVP için:
     - Repo dosyalarını okuyup chunk'lar
     - Embedding üretir
-    - FAISS index'i sadece memory'de kurar ve metadata listesiyle birlikte döner.
+    - FAISS index'i sadece memory'de kurar (diske yazılmaz).
     """
-    files = iter_repo_files(repo_path)
-    docs = build_documents_from_files(files)
-    if not docs:
-        raise ValueError("No documents found in repository")
-
-    chunks: List[str] = []
-    metadatas: List[Dict[str, Any]] = []
-
-    for doc in docs:
-        doc_chunks = split_text(doc["text"], CHUNK_SIZE, CHUNK_OVERLAP)
-        for i, ch in enumerate(doc_chunks):
-            chunks.append(ch)
-            metadatas.append(
-                {
-                    "doc_id": doc["id"],
-                    "chunk_id": i,
-                    "path": doc["path"],
-                    "text": ch[:5000],
-                }
-            )
+    # Dosya okuma + chunking saf Python CPU işi; GIL'i tutmaması için process pool'da
+    chunks, metadatas = run_cpu(_build_chunks, repo_path)
 
     embed_client = EmbeddingClient(llm)
     embeddings = embed_client.embed_texts(chunks)
@@ -101,12 +225,10 @@ def build_in_memory_index(
         raise ValueError("No embeddings created for repository")
 
     dim = len(embeddings[0])
-    vecs = np.array(embeddings, dtype="float32")
-
-    index = faiss.IndexFlatL2(dim)
-    index.add(vecs)
 
-    return index, metadatas
+    index = FaissIndex(dim=dim)
+    index.add(embeddings, metadatas)
+    return index
 
 
 def _ensure_high_level_architecture_section(
@@ -179,9 +301,11 @@ def generate_wiki_outline(
     llm: LLMConfig,
 ) -> List[WikiSection]:
     """
-    Repo dosya ağacını kullanarak LLM'den wiki outline (section listesi) üretir.
+    Repo yapı özetini (dizin rollup'ı + dosyalar) kullanarak LLM'den
+    wiki outline (section listesi) üretir.
     """
-    file_tree = build_file_tree_summary(repo_path)
+    chat_client = ChatClient(llm, stage="outline")
+    file_tree = build_repo_structure_summary(repo_path, model=chat_client.model)
     repo_name = repo_path.name
 
     user_prompt = WIKI_OUTLINE_USER_TEMPLATE.format(
@@ -190,8 +314,6 @@ def generate_wiki_outline(
         file_tree=file_tree,
     )
 
-    chat_client = ChatClient(llm)
-
     messages = [
         {"role": "system", "content": WIKI_OUTLINE_SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt},
@@ -220,7 +342,8 @@ def generate_wiki_outline_ephemeral(
     Stateless / in-memory kullanım için outline üretir.
     Disk'e herhangi bir cache yazmaz.
     """
-    file_tree = build_file_tree_summary(repo_path)
+    chat_client = ChatClient(llm, stage="outline")
+    file_tree = build_repo_structure_summary(repo_path, model=chat_client.model, cache=False)
     repo_name = repo_path.name
 
     user_prompt = WIKI_OUTLINE_USER_TEMPLATE.format(
@@ -229,8 +352,6 @@ def generate_wiki_outline_ephemeral(
         file_tree=file_tree,
     )
 
-    chat_client = ChatClient(llm)
-
     messages = [
         {"role": "system", "content": WIKI_OUTLINE_SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt},
@@ -244,88 +365,190 @@ def generate_wiki_outline_ephemeral(
     return sections
 
 
-def generate_wiki_page(
-    repo_id: str,
+def _build_page_messages(
     section: WikiSection,
-    llm: LLMConfig,
-    index: FaissIndex,
-) -> WikiPage:
+    neighbors: List[Dict[str, Any]],
+    model: str,
+) -> List[Dict[str, str]]:
     """
-    Tek bir wiki section için markdown sayfası üretir.
+    Wiki sayfası için chat mesajlarını hazırlar; bağlamlar token bütçesine göre paketlenir.
     """
-    embed_client = EmbeddingClient(llm)
-    chat_client = ChatClient(llm)
+    section_json = json.dumps(section.model_dump(), ensure_ascii=False)
+    template_text = WIKI_PAGE_USER_TEMPLATE.format(section_json=section_json, contexts="")
+    packed = pack_context(
+        fixed_texts=[WIKI_PAGE_SYSTEM_PROMPT, template_text],
+        neighbors=neighbors,
+        model=model,
+    )
+
+    user_prompt = WIKI_PAGE_USER_TEMPLATE.format(
+        section_json=section_json,
+        contexts=packed["contexts"],
+    )
+    return [
+        {"role": "system", "content": WIKI_PAGE_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _retrieve_neighbors(query: str, llm: LLMConfig, index: FaissIndex) -> List[Dict[str, Any]]:
+    q_emb = EmbeddingClient(llm).embed_texts([query])[0]
+    return retrieve(index, q_emb, top_k=12)
+
+
+def _section_query(section: WikiSection) -> str:
+    return " ".join([section.title] + section.keywords)
+
+
+def page_deps_path(repo_id: str, section_id: str) -> Path:
+    return WIKI_DIR / f"{repo_id}_{section_id}.deps.json"
 
-    query = " ".join([section.title] + section.keywords)
-    q_emb = embed_client.embed_texts([query])[0]
-    neighbors = index.search(q_emb, top_k=12)
 
-    context_blocks = []
+def _neighbor_chunk_ids(neighbors: List[Dict[str, Any]]) -> List[int]:
+    ids: List[int] = []
     for n in neighbors:
-        context_blocks.append(f"File: {n['path']}\n\n{n['text']}\n---")
+        if "ids" in n:
+            ids.extend(n["ids"])
+        elif "id" in n:
+            ids.append(n["id"])
+    return ids
 
-    contexts = "\n\n".join(context_blocks)
 
-    user_prompt = WIKI_PAGE_USER_TEMPLATE.format(
-        section_json=json.dumps(section.model_dump(), ensure_ascii=False),
-        contexts=contexts,
+def _index_fingerprint(index: FaissIndex) -> str:
+    """
+    Index'teki canlı chunk kümesinin (ID, içerik hash'i, embedding modeli) özetini döner.
+    Özet aynıysa vektörler de aynıdır; dolayısıyla aynı sorgunun retrieval sonucu
+    değişemez. İçerik değişmeden yeniden yayınlanan snapshot'lar da aynı özeti verir.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for chunk_id in sorted(index.metadata):
+        meta = index.metadata[chunk_id]
+        if meta.get("deleted"):
+            continue
+        h.update(f"{chunk_id}:{meta.get('hash', '')}:{meta.get('embed_model', '')}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _write_page_deps(
+    repo_id: str,
+    section: WikiSection,
+    index: FaissIndex,
+    neighbors: List[Dict[str, Any]],
+    fingerprint: Optional[str] = None,
+) -> None:
+    """
+    Sayfanın üretildiği chunk'ların ID -> içerik hash'i eşlemesini ve index'in
+    özetini (bkz. _index_fingerprint) sayfanın yanına yazar.
+    """
+    chunks = {
+        str(i): index.metadata.get(i, {}).get("hash", "")
+        for i in _neighbor_chunk_ids(neighbors)
+    }
+    data = {
+        "section": section.model_dump(),
+        "index_version": index.version,
+        "index_fingerprint": fingerprint if fingerprint is not None else _index_fingerprint(index),
+        "generated_at": time.time(),
+        "chunks": chunks,
+    }
+    page_deps_path(repo_id, section.id).write_text(
+        json.dumps(data, ensure_ascii=False), encoding="utf-8"
     )
 
-    messages = [
-        {"role": "system", "content": WIKI_PAGE_SYSTEM_PROMPT},
-        {"role": "user", "content": user_prompt},
-    ]
+
+def _read_page_deps(repo_id: str, section_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(page_deps_path(repo_id, section_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _deps_stale_reason(
+    deps: Optional[Dict[str, Any]],
+    section: WikiSection,
+    index: FaissIndex,
+) -> Optional[str]:
+    """
+    Bağımlılık kaydına göre sayfa eskidiyse sebebini, değilse None döner.
+    Embedding/retrieval yapmaz; sadece kayıt ile index metadata'sı karşılaştırılır:
+    - bağımlılık kaydı yok (eski sürümde üretilmiş sayfa)
+    - section tanımı (başlık, açıklama, anahtar kelimeler) değişmiş
+    - bağımlı chunk'lardan biri silinmiş veya içeriği değişmiş
+    """
+    if deps is None:
+        return "no dependency record"
+
+    if deps.get("section") != section.model_dump():
+        return "section definition changed"
+
+    for chunk_id, chunk_hash in deps.get("chunks", {}).items():
+        meta = index.metadata.get(int(chunk_id))
+        if meta is None or meta.get("deleted"):
+            return f"chunk {chunk_id} removed"
+        if meta.get("hash", "") != chunk_hash:
+            return f"chunk {chunk_id} changed ({meta.get('path')})"
+    return None
+
+
+def _retrieval_stale_reason(
+    deps: Dict[str, Any],
+    neighbors: List[Dict[str, Any]],
+) -> Optional[str]:
+    """
+    Bugünkü retrieval sonucu kayıtlı chunk kümesiyle yeterince örtüşmüyorsa
+    sebebini döner (index'e yeni chunk'lar eklenip sonuç belirgin şekilde kaydıysa).
+    """
+    recorded = set(deps.get("chunks", {}))
+    current = {str(i) for i in _neighbor_chunk_ids(neighbors)}
+    union = current | recorded
+    overlap = len(current & recorded) / len(union) if union else 1.0
+    if overlap < WIKI_PAGE_MIN_DEP_OVERLAP:
+        return f"retrieval changed (overlap {overlap:.2f})"
+    return None
+
+
+def generate_wiki_page(
+    repo_id: str,
+    section: WikiSection,
+    llm: LLMConfig,
+    index: FaissIndex,
+    neighbors: Optional[List[Dict[str, Any]]] = None,
+    fingerprint: Optional[str] = None,
+) -> WikiPage:
+    """
+    Tek bir wiki section için markdown sayfası üretir; sayfanın yanına
+    kullandığı chunk'ların bağımlılık kaydını yazar.
+    neighbors verilmezse section başlığı + anahtar kelimelerle retrieval yapılır;
+    fingerprint verilmezse index özeti burada hesaplanır.
+    """
+    chat_client = ChatClient(llm, stage="page")
+
+    if neighbors is None:
+        neighbors = _retrieve_neighbors(_section_query(section), llm, index)
+
+    messages = _build_page_messages(section, neighbors, chat_client.model)
     markdown = chat_client.chat(messages)
 
     page = WikiPage(section=section, markdown=markdown)
     cache_path = WIKI_DIR / f"{repo_id}_{section.id}.md"
     cache_path.write_text(markdown, encoding="utf-8")
+    _write_page_deps(repo_id, section, index, neighbors, fingerprint=fingerprint)
     return page
 
 
 def generate_wiki_page_ephemeral(
     section: WikiSection,
     llm: LLMConfig,
-    index: faiss.IndexFlatL2,
-    metadatas: List[Dict[str, Any]],
+    index: FaissIndex,
 ) -> WikiPage:
     """
     Stateless / in-memory kullanım için tek bir wiki section üretir.
     Disk'e markdown yazmaz.
     """
-    embed_client = EmbeddingClient(llm)
-    chat_client = ChatClient(llm)
-
-    query = " ".join([section.title] + section.keywords)
-    q_emb = embed_client.embed_texts([query])[0]
-
-    q = np.array([q_emb], dtype="float32")
-    # FAISS Python API: search(x, k) -> (distances, indices)
-    distances, indices = index.search(q, 12)
-
-    neighbors: List[Dict[str, Any]] = []
-    for dist, idx in zip(distances[0], indices[0]):
-        if idx < 0 or idx >= len(metadatas):
-            continue
-        item = dict(metadatas[idx])
-        item["score"] = float(dist)
-        neighbors.append(item)
-
-    context_blocks = []
-    for n in neighbors:
-        context_blocks.append(f"File: {n['path']}\n\n{n['text']}\n---")
-
-    contexts = "\n\n".join(context_blocks)
+    chat_client = ChatClient(llm, stage="page")
+    neighbors = _retrieve_neighbors(_section_query(section), llm, index)
 
-    user_prompt = WIKI_PAGE_USER_TEMPLATE.format(
-        section_json=json.dumps(section.model_dump(), ensure_ascii=False),
-        contexts=contexts,
-    )
-
-    messages = [
-        {"role": "system", "content": WIKI_PAGE_SYSTEM_PROMPT},
-        {"role": "user", "content": user_prompt},
-    ]
+    messages = _build_page_messages(section, neighbors, chat_client.model)
     markdown = chat_client.chat(messages)
 
     page = WikiPage(section=section, markdown=markdown)
@@ -340,21 +563,222 @@ def _generate_high_level_architecture_markdown(
     Deep research benzeri çok turlu bir süreçle, repo'nun high-level mimarisini
     çıkaran özel bir içerik üretir.
     """
-    question = (
-        "Provide a high-level architecture overview of this repository. Describe "
-        "the main components, services, data flows and how they interact. "
-        "If helpful, include a single Mermaid diagram (flow chart or sequence "
-        "diagram) using the allowed templates to visualise the overall architecture."
-    )
     final_answer, _ = run_deep_research(
         repo_id=repo_id,
-        question=question,
+        question=HIGH_LEVEL_ARCHITECTURE_QUESTION,
         llm=llm,
         max_iterations=3,
     )
     return final_answer
 
 
+def _update_architecture_markdown(
+    previous: Dict[str, Any],
+    new_commit: str,
+    changes: str,
+    llm: LLMConfig,
+) -> str:
+    chat_client = ChatClient(llm, stage="research_final")
+    user_prompt = ARCHITECTURE_UPDATE_USER_TEMPLATE.format(
+        old_commit=previous["commit"][:12],
+        new_commit=new_commit[:12],
+        previous_markdown=previous["markdown"],
+        changes=changes,
+    )
+    messages = [
+        {"role": "system", "content": ARCHITECTURE_UPDATE_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    return chat_client.chat(messages)
+
+
+def _cached_high_level_architecture_markdown(
+    repo_id: str,
+    repo_path: Optional[Path],
+    llm: LLMConfig,
+    generate: Callable[[], str],
+    persist_generated: bool = True,
+) -> str:
+    """
+    High Level Architecture içeriğini (repo, commit, model) ile cache'ten çözer:
+
+    - Aynı commit ve model için doküman varsa olduğu gibi döner
+    - Commit değiştiyse ama analiz edilen dosyalar aynıysa önceki doküman kullanılır
+    - Dosyaların en fazla ARCHITECTURE_UPDATE_MAX_CHANGED_FRACTION kadarı değiştiyse
+      önceki doküman + değişiklik özetiyle tek bir güncelleme çağrısı yapılır
+    - Diğer durumlarda generate() çağrılır
+
+    Sonuç (repo, commit, model) anahtarıyla atomik olarak cache'e yazılır. Sıfırdan
+    generate() ile üretilen doküman ise yalnızca persist_generated=True iken yazılır:
+    ephemeral yolun generate()'i deep research yerine düz sayfa prompt'unu kullandığından
+    onun çıktısı kalıcı build'lerin temel alacağı dokümanın yerine geçmemeli.
+    repo_path git repo'su değilse cache kullanılmaz.
+    """
+    commit = get_head_commit(repo_path) if repo_path is not None else None
+    if commit is None:
+        return generate()
+
+    # Son cevabı deep research'ün final aşaması ürettiğinden anahtar o modeldir
+    model = ChatClient(llm, stage="research_final").model
+    cached = load_architecture_doc(repo_id, model)
+    if cached is not None and cached["commit"] == commit:
+        record_architecture_outcome("hits")
+        logger.info("Reusing cached architecture page repo_id=%s commit=%s", repo_id, commit[:12])
+        return cached["markdown"]
+
+    files = list_tracked_files(repo_path)
+    markdown_text: Optional[str] = None
+    if cached is not None:
+        changes = summarize_repo_changes(
+            repo_path,
+            cached["commit"],
+            cached.get("files", {}),
+            files,
+            token_budget=ARCHITECTURE_DIFF_TOKEN_BUDGET,
+            model=model,
+        )
+        if changes["changed"] == 0:
+            record_architecture_outcome("unchanged")
+            markdown_text = cached["markdown"]
+        elif changes["changed"] <= ARCHITECTURE_UPDATE_MAX_CHANGED_FRACTION * max(changes["total"], 1):
+            record_architecture_outcome("updates")
+            logger.info(
+                "Updating architecture page repo_id=%s %s -> %s (%d/%d files changed)",
+                repo_id,
+                cached["commit"][:12],
+                commit[:12],
+                changes["changed"],
+                changes["total"],
+            )
+            markdown_text = _update_architecture_markdown(cached, commit, changes["summary"], llm)
+
+    generated = markdown_text is None
+    if generated:
+        record_architecture_outcome("misses")
+        markdown_text = generate()
+
+    if persist_generated or not generated:
+        save_architecture_doc(repo_id, model, commit, markdown_text, files)
+    return markdown_text
+
+
+def _failed_page_markdown(section: WikiSection, error: Exception) -> str:
+    return (
+        f"# {section.title}\n\n"
+        f"> This page could not be generated: {error}\n"
+    )
+
+
+def _iter_pages_concurrently(
+    sections: List[WikiSection],
+    generate_page: Callable[[WikiSection], str],
+) -> Iterator[Tuple[int, str]]:
+    """
+    Section sayfalarını paralel üretir ve her sayfayı bittiği anda
+    (outline'daki sırası, markdown) olarak verir; sıra tamamlanma sırasıdır.
+
+    - En fazla WIKI_PAGE_CONCURRENCY sayfa aynı anda işlenir; process genelindeki
+      LLM çağrısı sınırı ChatClient'ın "page" aşaması semaforuyla uygulanır
+    - Her sayfa WIKI_PAGE_MAX_RETRIES kez, artan beklemeyle tekrar denenir
+    - Yine de başarısız olan sayfalar için hata notu içeren bir placeholder döner;
+      diğer sayfalar kaybolmaz
+    - Tüketici erken bırakırsa (ör. stream'i kapatan istemci) kuyruktaki sayfalar iptal edilir
+    """
+    if not sections:
+        return
+
+    def _run_with_retries(section: WikiSection) -> str:
+        attempt = 0
+        while True:
+            try:
+                return generate_page(section)
+            except Exception as e:
+                if attempt >= WIKI_PAGE_MAX_RETRIES:
+                    logger.exception("Wiki page generation failed section_id=%s", section.id)
+                    return _failed_page_markdown(section, e)
+                delay = WIKI_PAGE_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(
+                    "Wiki page generation failed section_id=%s attempt=%d, retrying in %.1fs: %s",
+                    section.id,
+                    attempt + 1,
+                    delay,
+                    e,
+                )
+                time.sleep(delay)
+                attempt += 1
+
+    workers = min(WIKI_PAGE_CONCURRENCY, len(sections))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wiki-page")
+    try:
+        futures = {pool.submit(_run_with_retries, section): i for i, section in enumerate(sections)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _generate_pages_concurrently(
+    sections: List[WikiSection],
+    generate_page: Callable[[WikiSection], str],
+    on_page_done: Optional[Callable[[int, int], None]] = None,
+) -> List[str]:
+    """
+    _iter_pages_concurrently'nin toplu sürümü: outline sırasıyla markdown listesi döner.
+    on_page_done(biten, toplam) her sayfa bittiğinde (başarılı ya da değil) çağrılır.
+    """
+    pages_md = [""] * len(sections)
+    done = 0
+    for i, markdown_text in _iter_pages_concurrently(sections, generate_page):
+        pages_md[i] = markdown_text
+        done += 1
+        if on_page_done is not None:
+            on_page_done(done, len(sections))
+    return pages_md
+
+
+def _ephemeral_page_markdown(
+    section: WikiSection,
+    llm: LLMConfig,
+    index: FaissIndex,
+    repo_id: Optional[str] = None,
+    repo_path: Optional[Path] = None,
+) -> str:
+    """
+    Stateless sayfa üretimi. High Level Architecture sayfası, kalıcı build'lerin
+    (repo, commit, model) cache'inde varsa oradan gelir veya tek çağrıyla güncellenir;
+    yoksa diğer sayfalar gibi üretilir. Güncellenen doküman cache'e yazılır, böylece
+    aynı commit için sonraki çalıştırmalar güncelleme çağrısını tekrar ödemez.
+    """
+    def _generate() -> str:
+        return generate_wiki_page_ephemeral(section, llm, index).markdown
+
+    if section.id == "high-level-architecture" and repo_id is not None:
+        return _cached_high_level_architecture_markdown(
+            repo_id, repo_path, llm, generate=_generate, persist_generated=False
+        )
+    return _generate()
+
+
+def generate_wiki_pages_ephemeral(
+    sections: List[WikiSection],
+    llm: LLMConfig,
+    index: FaissIndex,
+    on_page_done: Optional[Callable[[int, int], None]] = None,
+    repo_id: Optional[str] = None,
+    repo_path: Optional[Path] = None,
+) -> List[str]:
+    """
+    Stateless kullanım için tüm section sayfalarını paralel üretir.
+    Dönen liste outline sırasındadır. repo_id / repo_path verilirse High Level
+    Architecture sayfası cache'ten kullanılabilir (bkz. _ephemeral_page_markdown).
+    """
+    return _generate_pages_concurrently(
+        sections,
+        lambda section: _ephemeral_page_markdown(section, llm, index, repo_id, repo_path),
+        on_page_done=on_page_done,
+    )
+
+
 def _nav_dot_class(section: WikiSection) -> str:
     """
     DeepWiki'deki gibi farklı page tipleri için farklı renkler.
@@ -380,7 +804,8 @@ def _convert_mermaid_code_blocks(html_text: str) -> str:
 
     Ayrıca code içindeki HTML entity'lerini (örn. &gt;) unescape eder.
     """
-    pattern = re.compile(r"<pre><code[^>]*>(.*?)</code></pre>", re.DOTALL)
+    if "<pre><code" not in html_text:
+        return html_text
 
     def repl(match: re.Match) -> str:
         raw_code = match.group(1)
@@ -408,56 +833,112 @@ def _convert_mermaid_code_blocks(html_text: str) -> str:
             )
         return match.group(0)
 
-    return pattern.sub(repl, html_text)
+    return _MERMAID_CODE_BLOCK_RE.sub(repl, html_text)
 
 
 def build_full_wiki_html(
     repo_id: str,
     sections: List[WikiSection],
     llm: LLMConfig,
-) -> str:
+    on_page_done: Optional[Callable[[int, int], None]] = None,
+    repo_path: Optional[Path] = None,
+) -> Path:
     """
     Tüm section'lar için wiki sayfalarını üretir (gerekirse) ve
     DeepWiki tarzı bir layout ile tek bir HTML dosyası halinde birleştirir.
+    Yazılan dosyanın yolunu döner.
 
     Sol menüde "Pages" listesi vardır, her satıra tıklayınca sadece o section
     sağ tarafta görünür (tek sayfa görünümü).
     Mermaid diagram blokları otomatik olarak görsel olarak render edilir.
-    """
-    index_path, meta_path = get_index_paths(repo_id)
-    if not index_path.exists() or not meta_path.exists():
-        raise ValueError("Index not found for repo while building full HTML")
 
-    index = FaissIndex.load(index_path, meta_path)
+    Artımlı üretim: cache'teki bir sayfa, bağımlı olduğu chunk'lar değişmediyse
+    yeniden kullanılır (bkz. _deps_stale_reason); bu kontrol embedding gerektirmez.
+    Bağımlılıklar aynı kalıp index'in geri kalanı değiştiyse retrieval tekrarlanır ve
+    sonuç kayda göre belirgin şekilde kaydıysa sayfa yenilenir (bkz. _retrieval_stale_reason).
+    Değişmeyen bir repo için hiç embedding çağrısı yapılmaz; yalnızca eskiyen
+    sayfalar için LLM çağrısı yapılır.
 
-    pages_md: List[str] = []
-    for section in sections:
-        page_path = WIKI_DIR / f"{repo_id}_{section.id}.md"
-        if page_path.exists():
-            markdown_text = page_path.read_text(encoding="utf-8")
-        else:
+    repo_path: repo'nun clone'u (varsayılan REPO_DIR/repo_id); High Level Architecture
+    sayfası bunun commit'iyle cache'lenir (bkz. _cached_high_level_architecture_markdown).
+    """
+    if not index_exists(repo_id):
+        raise ValueError("Index not found for repo while building full HTML")
+    if repo_path is None and (REPO_DIR / repo_id).exists():
+        repo_path = REPO_DIR / repo_id
+
+    counts_lock = threading.Lock()
+    counts = {"reused": 0, "regenerated": 0}
+
+    def _count(key: str) -> None:
+        with counts_lock:
+            counts[key] += 1
+
+    with acquire_index(repo_id) as index:
+
+        fingerprint = _index_fingerprint(index)
+
+        def _page(section: WikiSection) -> str:
+            page_path = WIKI_DIR / f"{repo_id}_{section.id}.md"
+            is_hla = section.id == "high-level-architecture"
+            # Deep research de aynı soruyla aynı retrieval'ı yaptığından HLA bağımlılıkları
+            # bu soru üzerinden takip edilir
+            query = HIGH_LEVEL_ARCHITECTURE_QUESTION if is_hla else _section_query(section)
+            neighbors: Optional[List[Dict[str, Any]]] = None
+
+            if page_path.exists():
+                deps = _read_page_deps(repo_id, section.id)
+                reason = _deps_stale_reason(deps, section, index)
+                if reason is None and deps.get("index_fingerprint") != fingerprint:
+                    # Bağımlı chunk'lar aynı ama index'in geri kalanı değişmiş;
+                    # retrieval sonucu kayabileceği için yalnızca bu durumda sorgu embed edilir
+                    neighbors = _retrieve_neighbors(query, llm, index)
+                    reason = _retrieval_stale_reason(deps, neighbors)
+                if reason is None:
+                    _count("reused")
+                    return page_path.read_text(encoding="utf-8")
+                logger.info("Regenerating wiki page repo_id=%s section_id=%s: %s", repo_id, section.id, reason)
+
+            if neighbors is None:
+                neighbors = _retrieve_neighbors(query, llm, index)
+            _count("regenerated")
             # High Level Architecture için özel, deep-research tabanlı içerik
-            if section.id == "high-level-architecture":
-                markdown_text = _generate_high_level_architecture_markdown(
-                    repo_id, llm
+            if is_hla:
+                markdown_text = _cached_high_level_architecture_markdown(
+                    repo_id,
+                    repo_path,
+                    llm,
+                    generate=lambda: _generate_high_level_architecture_markdown(repo_id, llm),
                 )
-                page = WikiPage(section=section, markdown=markdown_text)
                 page_path.write_text(markdown_text, encoding="utf-8")
-            else:
-                page = generate_wiki_page(repo_id, section, llm, index)
-                markdown_text = page.markdown
-        pages_md.append(markdown_text)
+                _write_page_deps(repo_id, section, index, neighbors, fingerprint=fingerprint)
+                return markdown_text
+            return generate_wiki_page(
+                repo_id, section, llm, index, neighbors=neighbors, fingerprint=fingerprint
+            ).markdown
+
+        # Sayfalar paralel üretilir; başarısız olanlar placeholder ile gelir ve
+        # cache'e yazılmadığı için bir sonraki build'de tekrar denenir.
+        pages_md = _generate_pages_concurrently(sections, _page, on_page_done=on_page_done)
+
+    logger.info(
+        "Wiki pages for repo_id=%s: reused=%d regenerated=%d",
+        repo_id,
+        counts["reused"],
+        counts["regenerated"],
+    )
 
     if not pages_md:
         raise ValueError("No wiki pages generated to build HTML")
 
-    full_html = _render_full_wiki_html(repo_id, sections, pages_md)
+    fragments = render_section_fragments(pages_md)
 
-    # Stateful sürüm için HTML'i diske yazıyoruz
+    # Stateful sürüm için HTML'i (gzip / brotli kopyalarıyla birlikte) parça parça
+    # diske yazıyoruz; tam doküman bellekte hiç birleştirilmez
     html_path = WIKI_DIR / f"{repo_id}_wiki.html"
-    html_path.write_text(full_html, encoding="utf-8")
+    write_html_stream(html_path, iter_full_wiki_html(repo_id, sections, fragments))
 
-    return full_html
+    return html_path
 
 
 def _render_full_wiki_html(
@@ -469,6 +950,136 @@ def _render_full_wiki_html(
     Verilen section listesi ve markdown içeriklerinden tek bir HTML wiki çıktısı üretir.
     Bu fonksiyon disk erişimi yapmaz; sadece HTML string döner.
     """
+    return "".join(iter_full_wiki_html(repo_id, sections, render_section_fragments(pages_md)))
+
+
+def iter_full_wiki_html(
+    repo_id: str,
+    sections: List[WikiSection],
+    fragments: List[str],
+) -> Iterator[str]:
+    """
+    Tam HTML wiki'yi parça parça üretir (head, section'lar, tail); dosyaya veya
+    sokete yazarken dokümanın bellekte birleştirilmiş kopyası oluşmaz.
+    "".join(...) sonucu _render_full_wiki_html ile aynıdır.
+    """
+    head, tail = _render_wiki_frame(repo_id, sections)
+    yield head
+    for i, (section, fragment) in enumerate(zip(sections, fragments)):
+        if i:
+            yield "\n"
+        yield _wrap_section_html(section, fragment)
+    yield tail
+
+
+def _markdown_converter() -> md.Markdown:
+    converter = getattr(_markdown_local, "converter", None)
+    if converter is None:
+        converter = md.Markdown(extensions=["fenced_code", "tables"])
+        _markdown_local.converter = converter
+    return converter
+
+
+def _render_fragment_uncached(markdown_text: str) -> str:
+    converter = _markdown_converter()
+    converter.reset()
+    return _convert_mermaid_code_blocks(converter.convert(markdown_text))
+
+
+def render_section_fragments(pages_md: List[str]) -> List[str]:
+    """
+    Section markdown'larını HTML fragment'larına çevirir; sonuç girdi sırasındadır.
+
+    - Her fragment (markdown hash, WIKI_RENDERER_VERSION) ile cache'lenir; değişmeyen
+      sayfalar yeniden render edilmez (bkz. render_cache)
+    - Cache'te olmayan sayfa sayısı WIKI_RENDER_PARALLEL_MIN_SECTIONS ve üstündeyse
+      render CPU process pool'unda paralel yapılır, değilse çağıran thread'de
+    """
+    keys = [render_cache_key(markdown_text, WIKI_RENDERER_VERSION) for markdown_text in pages_md]
+    fragments: List[Optional[str]] = [get_rendered(key) for key in keys]
+    missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+    if missing:
+        texts = [pages_md[i] for i in missing]
+        if len(missing) >= WIKI_RENDER_PARALLEL_MIN_SECTIONS:
+            rendered = map_cpu(_render_fragment_uncached, texts)
+        else:
+            rendered = [_render_fragment_uncached(text) for text in texts]
+        for i, fragment in zip(missing, rendered):
+            fragments[i] = fragment
+            put_rendered(keys[i], fragment)
+    return fragments
+
+
+def render_section_fragment(markdown_text: str) -> str:
+    """
+    Tek bir section'ın markdown'unu HTML'e çevirir ve Mermaid bloklarını dönüştürür.
+    Lazy shell'in section başına çektiği fragment budur.
+    """
+    return render_section_fragments([markdown_text])[0]
+
+
+def _wrap_section_html(section: WikiSection, inner_html: str, attrs: str = "") -> str:
+    return f"""
+<section id="section-{section.id}" class="dw-section"{attrs}>
+  <div class="dw-section-inner">
+    {inner_html}
+  </div>
+</section>
+"""
+
+
+def _render_pending_section_html(
+    section: WikiSection,
+    text: str = "Generating this page...",
+    attrs: str = "",
+) -> str:
+    """
+    İçeriği henüz olmayan section için yer tutucu (stream ve lazy modları).
+    Aynı id'yi taşır; içerik hazır olduğunda yerine geçer.
+    """
+    return _wrap_section_html(
+        section,
+        f'<h1>{html_lib.escape(section.title)}</h1>\n    <p class="dw-pending">{text}</p>',
+        attrs=attrs,
+    )
+
+
+def render_wiki_shell(
+    repo_id: str,
+    sections: List[WikiSection],
+    fragment_url_template: str,
+    export_links: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Section içeriklerini taşımayan küçük bir wiki sayfası üretir: layout, sidebar,
+    CSS ve script'in yanında her section için yalnızca data-src'li bir yer tutucu.
+    showSection bir section'ı ilk kez açtığında içeriği data-src'den çeker;
+    böylece ilk yük ve tarayıcının parse süresi sayfa sayısıyla büyümez.
+
+    fragment_url_template: "{section_id}" içeren URL kalıbı (ör. "sections/{section_id}").
+    export_links: sidebar'daki export butonlarının hedefleri (bkz. _render_wiki_frame).
+    """
+    head, tail = _render_wiki_frame(repo_id, sections, export_links)
+    placeholders = []
+    for section in sections:
+        src = html_lib.escape(fragment_url_template.format(section_id=section.id), quote=True)
+        placeholders.append(_render_pending_section_html(section, "Loading...", attrs=f' data-src="{src}"'))
+    return head + "\n".join(placeholders) + tail
+
+
+def _render_wiki_frame(
+    repo_id: str,
+    sections: List[WikiSection],
+    export_links: Optional[Dict[str, str]] = None,
+) -> Tuple[str, str]:
+    """
+    Wiki HTML'inin section'lar dışındaki kısmını (head, tail) olarak döner:
+    tam HTML = head + section blokları + tail. Layout, sidebar ve script
+    sayfalardan bağımsız olduğundan stream modunda ilk olarak gönderilir.
+
+    export_links: {"html": url, "bundle": url}; verilen hedefler sidebar'da indirme
+    linki olur. Verilmezse (tek dosya HTML) export alanı bilgi amaçlı kalır.
+    """
     # Header tarafında kullanmak için proje adı
     if "_" in repo_id:
         owner, repo_name = repo_id.split("_", 1)
@@ -477,24 +1088,8 @@ def _render_full_wiki_html(
     project_title = f"{repo_name} Wiki"
     project_desc = "powered by ai"
 
-    # Her section için markdown'u ayrı HTML'e çevirip Mermaid bloklarını dönüştürüyoruz
-    section_html_blocks: List[str] = []
-    for section, markdown_text in zip(sections, pages_md):
-        section_body = md.markdown(
-            markdown_text,
-            extensions=["fenced_code", "tables"],
-        )
-        section_body = _convert_mermaid_code_blocks(section_body)
-        section_html = f"""
-<section id="section-{section.id}" class="dw-section">
-  <div class="dw-section-inner">
-    {section_body}
-  </div>
-</section>
-"""
-        section_html_blocks.append(section_html)
-
-    body_html = "\n".join(section_html_blocks)
+    # Section gövdesinin yerine geçecek işaret; head / tail buradan bölünür
+    body_html = "<!--dw-sections-->"
 
     # Sol taraftaki Pages listesi
     nav_items = []
@@ -510,6 +1105,24 @@ def _render_full_wiki_html(
         )
     nav_items_html = "\n".join(nav_items)
 
+    if export_links is None:
+        export_actions_html = (
+            '<div class="dw-export-btn dw-export-primary">Export as HTML</div>\n'
+            '      <div class="dw-export-btn dw-export-secondary">Export as JSON</div>'
+        )
+    else:
+        export_actions = []
+        for key, label, css_class in (
+            ("html", "Export as HTML", "dw-export-primary"),
+            ("bundle", "Export wiki bundle", "dw-export-secondary"),
+        ):
+            if key in export_links:
+                href = html_lib.escape(export_links[key], quote=True)
+                export_actions.append(
+                    f'<a class="dw-export-btn {css_class}" href="{href}" target="_blank" download>{label}</a>'
+                )
+        export_actions_html = "\n      ".join(export_actions)
+
     sidebar_html = f"""
 <aside class="dw-sidebar">
   <div class="dw-sidebar-header">
@@ -527,8 +1140,7 @@ def _render_full_wiki_html(
   <div class="dw-sidebar-export">
     <div class="dw-export-title">Export Wiki</div>
     <div class="dw-export-actions">
-      <div class="dw-export-btn dw-export-primary">Export as HTML</div>
-      <div class="dw-export-btn dw-export-secondary">Export as JSON</div>
+      {export_actions_html}
     </div>
   </div>
   <div class="dw-sidebar-pages">
@@ -695,6 +1307,12 @@ body {
   user-select: none;
 }
 
+a.dw-export-btn {
+  display: block;
+  cursor: pointer;
+  text-decoration: none;
+}
+
 .dw-export-primary {
   background: linear-gradient(135deg, #a855f7, #ec4899);
   color: white;
@@ -822,6 +1440,11 @@ body {
   padding-bottom: 4px;
 }
 
+.dw-pending {
+  color: var(--dw-text-muted);
+  font-style: italic;
+}
+
 /* Mermaid wrapper */
 
 .dw-mermaid-wrapper {
@@ -979,12 +1602,37 @@ body {
 <body>
 {layout_html}
 <script>
+function loadSection(sec) {{
+  // Lazy shell: içerik ilk açılışta data-src'den çekilir
+  var src = sec.getAttribute('data-src');
+  if (!src || sec.getAttribute('data-loaded')) {{
+    return;
+  }}
+  sec.setAttribute('data-loaded', '1');
+  var inner = sec.querySelector('.dw-section-inner');
+  fetch(src).then(function(resp) {{
+    if (!resp.ok) {{
+      throw new Error('HTTP ' + resp.status);
+    }}
+    return resp.text();
+  }}).then(function(fragment) {{
+    inner.innerHTML = fragment;
+    if (window.mermaid) {{
+      mermaid.run({{ nodes: inner.querySelectorAll('.mermaid') }});
+    }}
+  }}).catch(function(err) {{
+    sec.removeAttribute('data-loaded');
+    inner.innerHTML = '<p class="dw-pending">This page could not be loaded (' + err.message + '). Select it again to retry.</p>';
+  }});
+}}
+
 function showSection(id) {{
   // Section görünürlüğü
   var sections = document.querySelectorAll('.dw-section');
   sections.forEach(function(sec) {{
     if (sec.id === id) {{
       sec.classList.add('dw-section-active');
+      loadSection(sec);
     }} else {{
       sec.classList.remove('dw-section-active');
     }}
@@ -1015,7 +1663,8 @@ document.addEventListener('DOMContentLoaded', function() {{
 </html>
 """
 
-    return full_html
+    head, tail = full_html.split(body_html, 1)
+    return head, tail
 
 
 def build_full_wiki_html_ephemeral(
@@ -1027,4 +1676,232 @@ def build_full_wiki_html_ephemeral(
     Stateless / in-memory kullanım için HTML wiki çıktısı üretir.
     Disk'e hiçbir şey yazmaz.
     """
-    return _render_full_wiki_html(repo_id, sections, pages_md)
\ No newline at end of file
+    return _render_full_wiki_html(repo_id, sections, pages_md)
+
+
+def _noop_progress(stage: str, fraction: float) -> None:
+    pass
+
+
+def _build_marker_path(repo_id: str) -> Path:
+    return WIKI_DIR / f"{repo_id}_build.json"
+
+
+def _load_build_since(repo_id: str, since: float) -> Optional[Dict[str, Any]]:
+    """
+    since'ten sonra (başka bir process'te) tamamlanmış bir build varsa sonucunu döner.
+    """
+    path = _build_marker_path(repo_id)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("finished_at", 0) < since:
+        return None
+    return {
+        "repo_id": repo_id,
+        "sections": [WikiSection(**s) for s in data.get("sections", [])],
+    }
+
+
+def _write_build_marker(repo_id: str, sections: List[WikiSection]) -> None:
+    path = _build_marker_path(repo_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"finished_at": time.time(), "sections": [s.model_dump() for s in sections]},
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(path)
+
+
+def run_generation_pipeline(
+    repo_url: str,
+    llm: LLMConfig,
+    git_token: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Kalıcı wiki üretim pipeline'ı: clone/update -> index -> outline -> sayfalar + HTML.
+    Aşamalar sırasıyla progress("clone" | "index" | "outline" | "pages" | "html", oran)
+    ile bildirilir.
+
+    Aynı repo için eşzamanlı çağrılar tek bir build'e indirgenir:
+    - Process içinde sonradan gelenler devam eden build'e bağlanır (single-flight)
+    - Process'ler arasında repo başına file lock alınır; kilidi bekleyen taraf,
+      beklerken tamamlanan build'in sonucunu yeniden build etmeden kullanır
+
+    Dönüş: {"repo_id", "sections"}
+    """
+    repo_id = normalize_repo_id(repo_url)
+    requested_at = time.time()
+
+    def _build() -> Dict[str, Any]:
+        with repo_build_lock(repo_id):
+            reused = _load_build_since(repo_id, requested_at)
+            if reused is not None:
+                logger.info("Reusing wiki build finished by another worker for repo_id=%s", repo_id)
+                return reused
+            result = _run_generation_pipeline(repo_id, repo_url, llm, git_token, progress)
+            _write_build_marker(repo_id, result["sections"])
+            return result
+
+    return run_single_flight(repo_id, _build)
+
+
+def _run_generation_pipeline(
+    repo_id: str,
+    repo_url: str,
+    llm: LLMConfig,
+    git_token: Optional[str],
+    progress: Optional[ProgressCallback],
+) -> Dict[str, Any]:
+    progress = progress or _noop_progress
+
+    progress("clone", 0.0)
+    repo_path = clone_or_update_repo(repo_url, git_token=git_token)
+
+    progress("index", 0.0)
+    prepare_repo_index(repo_id, repo_path, llm)
+
+    progress("outline", 0.0)
+    sections = generate_wiki_outline(repo_id, repo_path, llm)
+
+    progress("pages", 0.0)
+    build_full_wiki_html(
+        repo_id,
+        sections,
+        llm,
+        on_page_done=lambda done, total: progress("pages", done / total),
+        repo_path=repo_path,
+    )
+    # Kalıcı sürümde HTML, sayfalarla birlikte build_full_wiki_html içinde yazılır
+    progress("html", 1.0)
+
+    logger.info("Wiki generated successfully for repo_id=%s", repo_id)
+    return {"repo_id": repo_id, "sections": sections}
+
+
+def run_generation_pipeline_ephemeral(
+    repo_url: str,
+    llm: LLMConfig,
+    git_token: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Stateless pipeline: geçici clone -> in-memory index -> outline -> sayfalar -> HTML.
+    Geçici repo dizini her durumda silinir.
+
+    Dönüş: {"repo_id", "sections", "html"}
+    """
+    progress = progress or _noop_progress
+    tmp_repo = None
+    try:
+        progress("clone", 0.0)
+        tmp_repo = clone_repo_temp(repo_url, git_token=git_token)
+        repo_id = normalize_repo_id(repo_url)
+
+        progress("index", 0.0)
+        index = build_in_memory_index(tmp_repo, llm)
+
+        progress("outline", 0.0)
+        sections = generate_wiki_outline_ephemeral(tmp_repo, llm)
+
+        progress("pages", 0.0)
+        pages_md = generate_wiki_pages_ephemeral(
+            sections,
+            llm,
+            index,
+            on_page_done=lambda done, total: progress("pages", done / total),
+            repo_id=repo_id,
+            repo_path=tmp_repo,
+        )
+
+        progress("html", 0.0)
+        html = build_full_wiki_html_ephemeral(repo_id, sections, pages_md)
+
+        logger.info("Ephemeral wiki generated successfully for repo_id=%s", repo_id)
+        return {"repo_id": repo_id, "sections": sections, "html": html}
+    finally:
+        _cleanup_temp_repo(tmp_repo)
+
+
+def iter_generation_pipeline_ephemeral(
+    repo_url: str,
+    llm: LLMConfig,
+    git_token: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    run_generation_pipeline_ephemeral'ın stream sürümü; SSE'ye uygun
+    {"event": ..., "data": ...} olayları üretir:
+
+    - "progress": {"stage"} her aşama başında
+    - "shell": {"repo_id", "sections", "head", "tail", "pending"} outline hazır olunca;
+      head + section blokları + tail tam HTML'dir, pending her section'ın yer tutucusudur
+    - "section": {"index", "section_id", "html", "done", "total"} her sayfa bittiği anda
+      (tamamlanma sırasıyla); index'teki yer tutucunun yerine geçer
+    - "done": {"repo_id", "wiki_id"}; wiki_id ile section fragment'ları bellekten
+      lazy shell olarak servis edilir (bkz. ephemeral_wikis)
+
+    İlk içerik tüm wiki yerine tek bir sayfanın süresinden sonra görünür.
+    """
+    tmp_repo = None
+    try:
+        yield {"event": "progress", "data": {"stage": "clone"}}
+        tmp_repo = clone_repo_temp(repo_url, git_token=git_token)
+        repo_id = normalize_repo_id(repo_url)
+
+        yield {"event": "progress", "data": {"stage": "index"}}
+        index = build_in_memory_index(tmp_repo, llm)
+
+        yield {"event": "progress", "data": {"stage": "outline"}}
+        sections = generate_wiki_outline_ephemeral(tmp_repo, llm)
+
+        head, tail = _render_wiki_frame(repo_id, sections)
+        yield {
+            "event": "shell",
+            "data": {
+                "repo_id": repo_id,
+                "sections": [s.model_dump() for s in sections],
+                "head": head,
+                "tail": tail,
+                "pending": [_render_pending_section_html(s) for s in sections],
+            },
+        }
+
+        yield {"event": "progress", "data": {"stage": "pages"}}
+        pages = _iter_pages_concurrently(
+            sections,
+            lambda section: _ephemeral_page_markdown(section, llm, index, repo_id, tmp_repo),
+        )
+        fragments: Dict[str, str] = {}
+        for done, (i, markdown_text) in enumerate(pages, start=1):
+            fragment = render_section_fragment(markdown_text)
+            fragments[sections[i].id] = fragment
+            yield {
+                "event": "section",
+                "data": {
+                    "index": i,
+                    "section_id": sections[i].id,
+                    "html": _wrap_section_html(sections[i], fragment),
+                    "done": done,
+                    "total": len(sections),
+                },
+            }
+
+        wiki_id = store_ephemeral_wiki(repo_id, sections, fragments)
+        logger.info("Ephemeral wiki streamed successfully for repo_id=%s wiki_id=%s", repo_id, wiki_id)
+        yield {"event": "done", "data": {"repo_id": repo_id, "wiki_id": wiki_id}}
+    finally:
+        _cleanup_temp_repo(tmp_repo)
+
+
+def _cleanup_temp_repo(tmp_repo: Optional[Path]) -> None:
+    if tmp_repo and tmp_repo.exists():
+        try:
+            shutil.rmtree(tmp_repo, ignore_errors=True)
+        except Exception:
+            logger.warning("Failed to cleanup temp repo at %s", tmp_repo)
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import openai
+import pytest
+
+from backend import llm_resilience
+from backend.llm_resilience import acall_llm_with_winner, call_llm, call_llm_with_winner, record_latency
+
+
+@pytest.fixture(autouse=True)
+def fast_resilience(monkeypatch):
+    monkeypatch.setattr(llm_resilience, "LLM_CALL_RETRY_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(llm_resilience, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(llm_resilience, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(llm_resilience, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.0)
+    monkeypatch.setattr(llm_resilience, "LLM_HEDGE_DEFAULT_DELAY_SECONDS", 10.0)
+
+
+def _connection_error():
+    # Hata yalnızca tipine göre sınıflandırılır; gerçek bir HTTP isteği gerekmez
+    return openai.APIConnectionError(request=None)
+
+
+def test_deadline_expiry_raises_timeout():
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        call_llm("test-deadline", lambda timeout: time.sleep(0.5) or "late", timeout=0.1, max_retries=0)
+    assert time.monotonic() - started < 0.4
+
+
+def test_retryable_error_is_retried():
+    calls = []
+
+    def primary(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            raise _connection_error()
+        return "ok"
+
+    assert call_llm("test-retry", primary, timeout=5, max_retries=2) == "ok"
+    assert len(calls) == 2
+
+
+def test_non_retryable_error_is_not_retried():
+    calls = []
+
+    def primary(timeout):
+        calls.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_llm("test-no-retry", primary, timeout=5, max_retries=2)
+    assert len(calls) == 1
+
+
+def test_hedge_fires_after_p95_delay():
+    key = "test-hedge-delay"
+    for _ in range(10):
+        record_latency(key, 0.2)
+    started = time.monotonic()
+    hedge_started = []
+    release = threading.Event()
+
+    def primary(timeout):
+        release.wait(2)
+        return "primary"
+
+    def hedge(timeout):
+        hedge_started.append(time.monotonic() - started)
+        return "hedge"
+
+    try:
+        result, winner = call_llm_with_winner(key, primary, hedge=hedge, timeout=5, max_retries=0)
+    finally:
+        release.set()
+    assert (result, winner) == ("hedge", "hedge")
+    assert 0.15 <= hedge_started[0] < 1.0
+
+
+def test_hedge_not_fired_when_primary_is_fast():
+    key = "test-hedge-fast"
+    for _ in range(10):
+        record_latency(key, 0.5)
+    hedged = []
+
+    result, winner = call_llm_with_winner(
+        key, lambda timeout: "primary", hedge=lambda timeout: hedged.append(1) or "hedge", timeout=5
+    )
+    assert (result, winner) == ("primary", "primary")
+    assert not hedged
+
+
+def test_async_losing_attempt_is_cancelled():
+    key = "test-async-cancel"
+    for _ in range(10):
+        record_latency(key, 0.05)
+    cancelled = []
+
+    async def primary(timeout):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def hedge(timeout):
+        return "hedge"
+
+    async def run():
+        result = await acall_llm_with_winner(key, primary, hedge=hedge, timeout=5, max_retries=0)
+        # İptal edilen görevin CancelledError'ı işlemesi için loop'a bir tur ver
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == ("hedge", "hedge")
+    assert cancelled == [True]
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from backend import single_flight, vector_store, wiki_bundle, wiki_generator
+from backend.models import WikiSection
+from backend.vector_store import FaissIndex, acquire_index, publish_index
+from backend.wiki_bundle import WikiBundleError, export_wiki_bundle, import_wiki_bundle, write_bundle
+
+
+def _use_storage(monkeypatch, root):
+    """Bundle'ın okuyup yazdığı tüm dizinleri root altına yönlendirir (ayrı bir node gibi)."""
+    wiki_dir = root / "wiki"
+    wiki_dir.mkdir(parents=True)
+    monkeypatch.setattr(wiki_bundle, "WIKI_DIR", wiki_dir)
+    monkeypatch.setattr(wiki_generator, "WIKI_DIR", wiki_dir)
+    monkeypatch.setattr(wiki_bundle, "BUNDLE_DIR", root / "bundles")
+    monkeypatch.setattr(single_flight, "BUILD_LOCK_DIR", root / "locks")
+    monkeypatch.setattr(vector_store, "FAISS_DIR", root / "faiss")
+    return wiki_dir
+
+
+@pytest.fixture
+def wiki_dir(tmp_path, monkeypatch):
+    return _use_storage(monkeypatch, tmp_path / "node")
+
+
+def _write_crafted_bundle(path, repo_id, section_id="overview", page=b"# Overview\n", index_bytes=b"", dim=4):
+    manifest = {"format_version": 1, "repo_id": repo_id, "renderer_version": 1, "dim": dim}
+    outline = [{"id": section_id, "title": "Overview", "description": "", "keywords": []}]
+    write_bundle(
+        path,
+        [
+            ("manifest.json", json.dumps(manifest).encode("utf-8")),
+            ("outline.json", json.dumps(outline).encode("utf-8")),
+            ("metadata.json", b"[]"),
+            ("index.faiss", index_bytes),
+            (f"pages/{section_id}.md", page),
+        ],
+    )
+
+
+def _empty_index_bytes(dim):
+    return FaissIndex(dim=dim).serialize()[0]
+
+
+@pytest.mark.parametrize("repo_id", ["../../x", "owner/repo", "..", "a\x00b", "", 42])
+def test_import_rejects_unsafe_repo_id(tmp_path, wiki_dir, repo_id):
+    bundle = tmp_path / "crafted.dwb"
+    _write_crafted_bundle(bundle, repo_id)
+
+    with pytest.raises(WikiBundleError):
+        import_wiki_bundle(bundle)
+    assert not (wiki_dir.parent.parent / "x_outline.json").exists()
+    assert not any(tmp_path.rglob("*_outline.json"))
+
+
+@pytest.mark.parametrize("section_id", ["../../../escape", "a/b", "..hidden"])
+def test_import_rejects_unsafe_section_id(tmp_path, wiki_dir, section_id):
+    bundle = tmp_path / "crafted.dwb"
+    _write_crafted_bundle(bundle, "owner_repo", section_id)
+
+    with pytest.raises(WikiBundleError):
+        import_wiki_bundle(bundle)
+    assert not (wiki_dir / "owner_repo_outline.json").exists()
+
+
+def test_import_rejects_decompression_bomb(tmp_path, wiki_dir, monkeypatch):
+    monkeypatch.setattr(wiki_bundle, "BUNDLE_MAX_ENTRY_BYTES", 1024 * 1024)
+    bundle = tmp_path / "bomb.dwb"
+    _write_crafted_bundle(bundle, "owner_repo", page=b"\0" * (8 * 1024 * 1024), index_bytes=_empty_index_bytes(4))
+    assert bundle.stat().st_size < 64 * 1024
+
+    with pytest.raises(WikiBundleError, match="size limit"):
+        import_wiki_bundle(bundle)
+    assert not (wiki_dir / "owner_repo_outline.json").exists()
+
+
+def test_import_rejects_corrupt_index(tmp_path, wiki_dir):
+    bundle = tmp_path / "corrupt.dwb"
+    _write_crafted_bundle(bundle, "owner_repo", index_bytes=b"not a faiss index")
+
+    with pytest.raises(WikiBundleError, match="index"):
+        import_wiki_bundle(bundle)
+    assert not (wiki_dir / "owner_repo_outline.json").exists()
+
+
+def test_import_rejects_index_dim_mismatch(tmp_path, wiki_dir):
+    bundle = tmp_path / "dim.dwb"
+    _write_crafted_bundle(bundle, "owner_repo", index_bytes=_empty_index_bytes(4), dim=8)
+
+    with pytest.raises(WikiBundleError, match="dimension"):
+        import_wiki_bundle(bundle)
+    assert not (wiki_dir / "owner_repo_outline.json").exists()
+
+
+def test_export_import_round_trip(tmp_path, wiki_dir, monkeypatch):
+    repo_id = "owner_repo"
+    section = WikiSection(id="overview", title="Overview", description="Repo overview", keywords=["intro"])
+    index = FaissIndex(dim=4)
+    index.add(
+        [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]],
+        [
+            {"id": 1, "path": "a.py", "hash": "h1", "text": "alpha"},
+            {"id": 2, "path": "b.py", "hash": "h2", "text": "beta"},
+        ],
+    )
+    publish_index(repo_id, index)
+    (wiki_dir / f"{repo_id}_outline.json").write_text(json.dumps([section.model_dump()]), encoding="utf-8")
+    (wiki_dir / f"{repo_id}_overview.md").write_text("# Overview\n\nRound trip body.\n", encoding="utf-8")
+
+    bundle = tmp_path / "export.dwb"
+    exported = export_wiki_bundle(repo_id, bundle)
+    assert exported["pages"] == 1 and exported["chunks"] == 2
+
+    # Import'u boş bir storage'a sahip başka bir node gibi yap
+    other_dir = _use_storage(monkeypatch, tmp_path / "other")
+    imported = import_wiki_bundle(bundle)
+
+    assert imported["index_version"] != exported["index_version"]
+    assert (other_dir / f"{repo_id}_overview.md").read_text(encoding="utf-8").startswith("# Overview")
+    html = (other_dir / f"{repo_id}_wiki.html").read_text(encoding="utf-8")
+    assert "Round trip body." in html
+    with acquire_index(repo_id) as served:
+        assert served.version == imported["index_version"]
+        hits = served.search([0.0, 1.0, 0.0, 0.0], top_k=1)
+    assert hits[0]["path"] == "b.py"
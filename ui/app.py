@@ -1,10 +1,18 @@
 # ui/app.py
 
+import json
+import os
+
 import streamlit as st
 import streamlit.components.v1 as components
 import requests
 
 API_BASE = "http://localhost:8001"
+# Tarayıcının backend'e ulaştığı adres (API_BASE Streamlit sunucusunun adresidir ve
+# docker / k8s kurulumlarında tarayıcıdan erişilemez). Verilirse preview, backend'deki
+# lazy shell'den yüklenir; verilmezse ya da wiki backend'de artık yoksa (TTL, başka
+# worker/pod) stream'den toplanan HTML gösterilir.
+API_PUBLIC_BASE = os.environ.get("API_PUBLIC_BASE", "").rstrip("/")
 
 st.set_page_config(page_title="Orion Wiki", layout="wide")
 
@@ -24,12 +32,49 @@ def get_llm_payload():
     """
     Sidebar'dan girilen LLM konfigürasyonunu tek noktadan üretir.
     """
-    return {
+    payload = {
         "provider": st.session_state.get("provider", "openai"),
         "chat_model": st.session_state.get("chat_model", "gpt-4-turbo"),
         "embed_model": st.session_state.get("embed_model", "text-embedding-3-small"),
         "api_key": st.session_state.get("api_key", ""),
     }
+    # Outline ve ara araştırma adımları için opsiyonel hızlı model
+    fast_model = st.session_state.get("fast_chat_model", "").strip()
+    if fast_model:
+        payload["stage_routes"] = {
+            "outline": {"chat_model": fast_model},
+            "research_intermediate": {"chat_model": fast_model},
+        }
+    return payload
+
+
+def iter_sse_events(resp):
+    """
+    Server-sent events cevabını (event, data) çiftleri olarak okur.
+    """
+    event, data_lines = None, []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if event and data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = None, []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+
+def ephemeral_wiki_available(wiki_id):
+    """
+    Ephemeral wiki backend'de hâlâ duruyor mu (TTL dolmamış, bu worker'da)?
+    """
+    try:
+        resp = requests.get(f"{API_BASE}/api/ephemeral_wiki/{wiki_id}/shell", timeout=5)
+    except requests.RequestException:
+        return False
+    return resp.status_code == 200
 
 
 # === Sidebar ===
@@ -87,6 +132,11 @@ with st.sidebar:
         value=st.session_state.get("chat_model", "gpt-4.1-mini"),
         key="chat_model",
     )
+    fast_chat_model = st.text_input(
+        "Fast Model (optional, outline & intermediate steps)",
+        value=st.session_state.get("fast_chat_model", ""),
+        key="fast_chat_model",
+    )
     embed_model = st.text_input(
         "Embedding Model",
         value=st.session_state.get("embed_model", "text-embedding-3-small"),
@@ -136,19 +186,62 @@ if generate_btn:
             # Private repo'lar için opsiyonel git access token
             "git_token": git_token or None,
         }
-        with st.spinner("Generating wiki (analysis, embeddings, outline, HTML)..."):
-            try:
-                # Stateless / in-memory MVP: yeni endpoint kullanılıyor
-                resp = requests.post(f"{API_BASE}/api/generate_ephemeral", json=payload)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    st.session_state["repo_id"] = data["repo_id"]
-                    st.session_state["full_html"] = data.get("html", "")
-                    st.success("Wiki generated.")
+        try:
+            # Stateless / in-memory MVP: outline önce gelir, sayfalar bittikçe işaretlenir
+            resp = requests.post(
+                f"{API_BASE}/api/generate_ephemeral/stream", json=payload, stream=True
+            )
+            if resp.status_code != 200:
+                st.error(f"Error: {resp.status_code} - {resp.text}")
+            else:
+                progress_bar = st.progress(0, text="Cloning repository...")
+                # Üretim sırasında yalnızca section durumları güncellenir; tam HTML
+                # her sayfada yeniden gönderilmez, bittiğinde preview'da bir kez gösterilir
+                section_status = st.empty()
+                slots, titles = [], []
+                head, tail, blocks = "", "", []
+                error, finished = None, False
+                for event, data in iter_sse_events(resp):
+                    if event == "progress":
+                        progress_bar.progress(0, text=f"Generating wiki: {data['stage']}...")
+                    elif event == "shell":
+                        head, tail, blocks = data["head"], data["tail"], list(data["pending"])
+                        st.session_state["repo_id"] = data["repo_id"]
+                        st.session_state.pop("wiki_id", None)
+                        st.session_state.pop("full_html", None)
+                        titles = [s["title"] for s in data["sections"]]
+                        with section_status.container():
+                            slots = [st.empty() for _ in titles]
+                        for slot, title in zip(slots, titles):
+                            slot.markdown(f"- {title} — *pending*")
+                    elif event == "section":
+                        blocks[data["index"]] = data["html"]
+                        slots[data["index"]].markdown(f"- {titles[data['index']]} — done")
+                        progress_bar.progress(
+                            int(100 * data["done"] / data["total"]),
+                            text=f"Generated {data['done']}/{data['total']} pages",
+                        )
+                    elif event == "done":
+                        finished = True
+                        st.session_state["wiki_id"] = data["wiki_id"]
+                    elif event == "error":
+                        error = data.get("detail")
+                        break
+
+                # Son hali aşağıdaki preview bölümünde gösterilir
+                section_status.empty()
+                if not finished and error is None:
+                    error = "Stream ended before the wiki was complete."
+                if error:
+                    progress_bar.empty()
+                    st.error(f"Error: {error}")
                 else:
-                    st.error(f"Error: {resp.status_code} - {resp.text}")
-            except Exception as e:
-                st.error(f"Request error: {e}")
+                    progress_bar.progress(100, text="Done")
+                    # Backend'deki ephemeral wiki TTL ile düşer; preview ve download bu kopyaya düşer
+                    st.session_state["full_html"] = head + "\n".join(blocks) + tail
+                    st.success("Wiki generated.")
+        except Exception as e:
+            st.error(f"Request error: {e}")
 
 repo_id = st.session_state.get("repo_id")
 
@@ -158,9 +251,17 @@ with st.container():
 
     if repo_id:
         full_html = st.session_state.get("full_html")
+        wiki_id = st.session_state.get("wiki_id")
         if full_html:
-            # iFrame benzeri HTML preview
-            components.html(full_html, height=800, scrolling=True)
+            if API_PUBLIC_BASE and wiki_id and ephemeral_wiki_available(wiki_id):
+                # Küçük shell yüklenir; section'lar tıklandıkça backend'den çekilir
+                components.iframe(
+                    f"{API_PUBLIC_BASE}/api/ephemeral_wiki/{wiki_id}/shell",
+                    height=800,
+                    scrolling=True,
+                )
+            else:
+                components.html(full_html, height=800, scrolling=True)
 
             st.markdown("---")
             st.subheader("Download")
@@ -173,4 +274,4 @@ with st.container():
         else:
             st.info("HTML wiki is not available yet. Please try regenerating the wiki.")
     else:
-        st.info("Enter a repository URL and click *Generate Wiki* to create the wiki.")
\ No newline at end of file
+        st.info("Enter a repository URL and click *Generate Wiki* to create the wiki.")